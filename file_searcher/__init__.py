@@ -1,2 +1,5 @@
 ﻿# Mark package and expose main for convenience
-from .app import main  # noqa: F401
+def main():
+    # Imported on call so the Qt-free engine (file_searcher.engine) loads without Qt
+    from .app import main as _main
+    return _main()
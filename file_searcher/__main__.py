@@ -1,4 +1,24 @@
-﻿from .app import main
+﻿import os
+import sys
+
+# Run both as a package module and as a standalone script
+if __package__:
+    from . import cli  # type: ignore
+else:
+    sys.path.append(os.path.dirname(__file__))
+    import cli  # type: ignore
+
+
+def main():
+    # Subcommands run headless; anything else opens the window
+    if cli.is_cli(sys.argv[1:]):
+        sys.exit(cli.main(sys.argv[1:]))
+    if __package__:
+        from .app import main as app_main  # type: ignore
+    else:
+        from app import main as app_main  # type: ignore
+    app_main()
+
 
 if __name__ == '__main__':
     main()
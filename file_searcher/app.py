@@ -1,24 +1,123 @@
 ﻿import os
+import re
 import sys
-import csv
-import subprocess
-from datetime import datetime
+import time
 
 # Try PySide6 first, fallback to PyQt5
 try:
     from PySide6 import QtCore, QtGui, QtWidgets
+    Signal = QtCore.Signal
     USING_PYSIDE = True
 except ImportError:  # pragma: no cover
     from PyQt5 import QtCore, QtGui, QtWidgets  # type: ignore
+    Signal = QtCore.pyqtSignal  # type: ignore
     USING_PYSIDE = False
 
 # Imports that work both as package and as script
+# The search engine is only imported when the first search starts
 try:
-    from .utils import list_windows_drives, human_size, parse_size
-    from .search import SearchParams, SearchThread
+    from .utils import human_size, parse_size
+    from .roots import discover_roots, cached_roots, cached_probe, probe_roots
+    from .traversal import default_workers
+    from .scheduling import ORDERS, ORDER_LABELS
+    from .ranking import TOP_KEYS, TOP_LABELS
+    from .results_model import ResultsModel, COL_SIZE, COL_MTIME
+    from .usage_model import UsageModel, COL_SIZE as USAGE_COL_SIZE
+    from .refine import is_refinement_of, record_filter
 except Exception:
-    from utils import list_windows_drives, human_size, parse_size  # type: ignore
-    from search import SearchParams, SearchThread  # type: ignore
+    from utils import human_size, parse_size  # type: ignore
+    from roots import discover_roots, cached_roots, cached_probe, probe_roots  # type: ignore
+    from traversal import default_workers  # type: ignore
+    from scheduling import ORDERS, ORDER_LABELS  # type: ignore
+    from ranking import TOP_KEYS, TOP_LABELS  # type: ignore
+    from results_model import ResultsModel, COL_SIZE, COL_MTIME  # type: ignore
+    from usage_model import UsageModel, COL_SIZE as USAGE_COL_SIZE  # type: ignore
+    from refine import is_refinement_of, record_filter  # type: ignore
+
+EXPORT_FILTERS = "CSV (*.csv);;NDJSON (*.ndjson);;TSV (*.tsv)"
+LIVE_DEBOUNCE_MS = 300
+
+
+def _search_api():
+    try:
+        from .search import SearchParams, SearchThread
+    except Exception:
+        from search import SearchParams, SearchThread  # type: ignore
+    return SearchParams, SearchThread
+
+
+def _export_api():
+    # csv and json stay off the startup path until the first export
+    try:
+        from .export import export_records, format_from_path, open_output, ResultWriter
+    except Exception:
+        from export import export_records, format_from_path, open_output, ResultWriter  # type: ignore
+    return export_records, format_from_path, open_output, ResultWriter
+
+
+def _watch_api():
+    try:
+        from .search import WatchBridge
+    except Exception:
+        from search import WatchBridge  # type: ignore
+    return WatchBridge
+
+
+# Lists and probes the drives off the UI thread so a slow or disconnected
+# network drive never delays the window. Given the custom folders, it then
+# probes them too and sends (drives, reachable folders) through `probed`.
+class RootsThread(QtCore.QThread):
+    discovered = Signal(list)
+    probed = Signal(list, list)
+
+    def __init__(self, refresh: bool = False, custom=None, parent=None):
+        super().__init__(parent)
+        self._refresh = refresh
+        self._custom = custom
+
+    def run(self):
+        try:
+            roots = discover_roots(refresh=self._refresh)
+        except Exception:
+            roots = []
+        self.discovered.emit(roots)
+        if self._custom is None:
+            return
+        try:
+            folders = probe_roots(self._custom)
+        except Exception:
+            folders = []
+        self.probed.emit(roots, folders)
+
+
+# Writes the table's rows to a file on a worker thread, straight from the
+# model's columns (see ResultsModel.iter_records)
+class ExportThread(QtCore.QThread):
+    progress = Signal(int, int)
+    finished_export = Signal(str)
+
+    def __init__(self, records, total: int, path: str, fmt: str, formatted: bool, parent=None):
+        super().__init__(parent)
+        self._records = records
+        self._total = total
+        self.path = path
+        self.fmt = fmt
+        self.formatted = formatted
+        self.rows: int | None = None
+        self._cancel = False
+
+    def cancel(self):
+        self._cancel = True
+
+    def run(self):
+        error = ''
+        try:
+            export_records, _, _, _ = _export_api()
+            self.rows = export_records(self._records, self.path, self.fmt, self.formatted, total=self._total,
+                                       on_progress=self.progress.emit, is_cancelled=lambda: self._cancel)
+        except Exception as e:
+            error = str(e)
+        self.finished_export.emit(error)
 
 
 class MainWindow(QtWidgets.QMainWindow):
@@ -27,6 +126,18 @@ class MainWindow(QtWidgets.QMainWindow):
         self.setWindowTitle("Buscador Rápido de Archivos (Windows)")
         self.resize(1100, 700)
         self._thread = None
+        self._roots_thread = None
+        # Called with the search roots once a RootsThread has probed them
+        self._roots_waiting = None
+        self._export_thread = None
+        # Parameters of the last complete search shown in the table
+        self._last_params = None
+        self._live_restart = False
+        self._usage_rows = None
+        # Keeps the rows of the last complete search current (see WatchBridge)
+        self._watch = None
+        self._search_started_at: float | None = None
+        self._drives: list[str] | None = None
         self._build_ui()
         icon_path = os.path.join(os.path.dirname(__file__), 'assets', 'icon.ico')
         if os.path.exists(icon_path):
@@ -40,7 +151,7 @@ class MainWindow(QtWidgets.QMainWindow):
         # Search controls
         row1 = QtWidgets.QHBoxLayout()
         self.input_pattern = QtWidgets.QLineEdit()
-        self.input_pattern.setPlaceholderText("Nombre a buscar (ej. *.pdf o reporte)")
+        self.input_pattern.setPlaceholderText("Nombre a buscar (ej. *.pdf o reporte; varios separados por ;)")
         self.mode_combo = QtWidgets.QComboBox()
         self.mode_combo.addItems(["contains", "startswith", "endswith", "equals"])
         self.chk_case = QtWidgets.QCheckBox("Distinguir mayúsculas/minúsculas")
@@ -48,6 +159,11 @@ class MainWindow(QtWidgets.QMainWindow):
         self.chk_wildcard = QtWidgets.QCheckBox("Wildcard (*, ?)")
         self.chk_dirs = QtWidgets.QCheckBox("Incluir carpetas")
         self.chk_dirs.setChecked(False)
+        self.chk_live = QtWidgets.QCheckBox("Buscar al escribir")
+        self.chk_live.setToolTip("Busca al dejar de escribir; si la consulta se vuelve más estricta, filtra los resultados actuales sin recorrer el disco")
+        self._live_timer = QtCore.QTimer(self)
+        self._live_timer.setSingleShot(True)
+        self._live_timer.setInterval(LIVE_DEBOUNCE_MS)
         row1.addWidget(QtWidgets.QLabel("Patrón:"))
         row1.addWidget(self.input_pattern, 1)
         row1.addWidget(QtWidgets.QLabel("Modo:"))
@@ -56,6 +172,7 @@ class MainWindow(QtWidgets.QMainWindow):
         row1.addWidget(self.chk_regex)
         row1.addWidget(self.chk_wildcard)
         row1.addWidget(self.chk_dirs)
+        row1.addWidget(self.chk_live)
         layout.addLayout(row1)
 
         # Drives and roots selection
@@ -106,6 +223,28 @@ class MainWindow(QtWidgets.QMainWindow):
         f_layout.addWidget(self.date_from, 2, 1)
         f_layout.addWidget(self.chk_date_to, 2, 2)
         f_layout.addWidget(self.date_to, 2, 3)
+        self.input_content = QtWidgets.QLineEdit()
+        self.input_content.setPlaceholderText("Texto dentro del archivo (vacío = no leer contenido)")
+        self.chk_content_regex = QtWidgets.QCheckBox("Regex")
+        f_layout.addWidget(QtWidgets.QLabel("Contenido:"), 3, 0)
+        f_layout.addWidget(self.input_content, 3, 1, 1, 2)
+        f_layout.addWidget(self.chk_content_regex, 3, 3)
+        self.spin_max_results = QtWidgets.QSpinBox()
+        self.spin_max_results.setRange(0, 10_000_000)
+        self.spin_max_results.setSpecialValueText("Sin límite")
+        self.spin_max_results.setToolTip("Detiene la búsqueda al llegar a esta cantidad de resultados")
+        self.spin_top = QtWidgets.QSpinBox()
+        self.spin_top.setRange(0, 100_000)
+        self.spin_top.setSpecialValueText("Todos")
+        self.spin_top.setPrefix("Top ")
+        self.spin_top.setToolTip("Recorre todo pero muestra solo los N primeros según el criterio, ordenados, al terminar")
+        self.top_by_combo = QtWidgets.QComboBox()
+        for key in TOP_KEYS:
+            self.top_by_combo.addItem(TOP_LABELS[key], key)
+        f_layout.addWidget(QtWidgets.QLabel("Resultados:"), 4, 0)
+        f_layout.addWidget(self.spin_max_results, 4, 1)
+        f_layout.addWidget(self.spin_top, 4, 2)
+        f_layout.addWidget(self.top_by_combo, 4, 3)
         layout.addWidget(filters_box)
 
         # Exclusions
@@ -118,6 +257,8 @@ class MainWindow(QtWidgets.QMainWindow):
         self.ex_list.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
         self.btn_ex_add = QtWidgets.QPushButton("Agregar exclusión…")
         self.btn_ex_del = QtWidgets.QPushButton("Quitar")
+        self.input_ex_names = QtWidgets.QLineEdit()
+        self.input_ex_names.setPlaceholderText("Nombres a excluir (ej: node_modules;.git;*.tmp.d)")
         ex_layout.addWidget(self.chk_ex_system, 0, 0)
         ex_layout.addWidget(self.chk_ex_hidden, 0, 1)
         ex_layout.addWidget(self.chk_ex_offline, 0, 2)
@@ -125,6 +266,8 @@ class MainWindow(QtWidgets.QMainWindow):
         ex_layout.addWidget(self.ex_list, 2, 0, 1, 3)
         ex_layout.addWidget(self.btn_ex_add, 3, 1)
         ex_layout.addWidget(self.btn_ex_del, 3, 2)
+        ex_layout.addWidget(QtWidgets.QLabel("Nombres a excluir:"), 4, 0)
+        ex_layout.addWidget(self.input_ex_names, 4, 1, 1, 2)
         layout.addWidget(ex_box)
 
         # Actions
@@ -132,13 +275,53 @@ class MainWindow(QtWidgets.QMainWindow):
         self.btn_search = QtWidgets.QPushButton("Buscar")
         self.btn_stop = QtWidgets.QPushButton("Detener")
         self.btn_clear = QtWidgets.QPushButton("Limpiar")
-        self.btn_export = QtWidgets.QPushButton("Exportar CSV")
+        self.btn_export = QtWidgets.QPushButton("Exportar…")
+        self.btn_search_to_file = QtWidgets.QPushButton("Buscar a archivo…")
+        self.btn_search_to_file.setToolTip("Escribe los resultados directamente en un archivo sin mostrarlos en la tabla")
+        self.chk_export_formatted = QtWidgets.QCheckBox("Exportar formateado")
+        self.chk_export_formatted.setToolTip("Tamaños y fechas como en la tabla en lugar de bytes y segundos epoch")
+        self.chk_use_index = QtWidgets.QCheckBox("Usar índice")
+        self.chk_query_cache = QtWidgets.QCheckBox("Caché de consultas")
+        self.chk_query_cache.setChecked(True)
+        self.chk_query_cache.setToolTip("Repite al instante una búsqueda ya hecha y luego la revalida en segundo plano")
+        self.chk_watch = QtWidgets.QCheckBox("Vigilar cambios")
+        self.chk_watch.setToolTip("Tras buscar, aplica a los resultados (y al índice, si se usó) los archivos creados, "
+                                  "borrados o modificados, sin volver a recorrer el disco")
+        self.chk_duplicates = QtWidgets.QCheckBox("Solo duplicados")
+        self.chk_duplicates.setToolTip("Muestra solo archivos idénticos a otro, agrupados por contenido")
+        self.chk_rollup = QtWidgets.QCheckBox("Uso de disco")
+        self.chk_rollup.setToolTip("Muestra el tamaño total de cada carpeta (de los archivos que pasan los filtros) "
+                                   "en un árbol en lugar de los archivos. Con el índice, al actualizarlo solo se "
+                                   "vuelven a listar las carpetas que cambiaron")
+        self.chk_use_index.setToolTip("Responde desde el índice en disco si tiene menos de una hora; si no, lo reconstruye al buscar")
+        self.spin_workers = QtWidgets.QSpinBox()
+        self.spin_workers.setRange(1, 64)
+        self.spin_workers.setValue(default_workers())
+        self.spin_workers.setToolTip("Hilos que listan carpetas en paralelo")
+        self.traversal_combo = QtWidgets.QComboBox()
+        for name in ORDERS:
+            self.traversal_combo.addItem(ORDER_LABELS[name], name)
+        self.traversal_combo.setCurrentIndex(ORDERS.index('priority'))
+        self.traversal_combo.setToolTip("Orden en que se recorren las carpetas. Prioridad visita primero las carpetas "
+                                        "del usuario, las modificadas hace poco y las que tuvieron resultados antes; "
+                                        "Profundidad termina antes el recorrido completo")
         self.btn_stop.setEnabled(False)
         actions.addWidget(self.btn_search)
         actions.addWidget(self.btn_stop)
         actions.addWidget(self.btn_clear)
         actions.addWidget(self.btn_export)
+        actions.addWidget(self.btn_search_to_file)
+        actions.addWidget(self.chk_export_formatted)
         actions.addStretch(1)
+        actions.addWidget(QtWidgets.QLabel("Hilos:"))
+        actions.addWidget(self.spin_workers)
+        actions.addWidget(QtWidgets.QLabel("Orden:"))
+        actions.addWidget(self.traversal_combo)
+        actions.addWidget(self.chk_use_index)
+        actions.addWidget(self.chk_query_cache)
+        actions.addWidget(self.chk_watch)
+        actions.addWidget(self.chk_duplicates)
+        actions.addWidget(self.chk_rollup)
         layout.addLayout(actions)
 
         # Status/progress
@@ -152,32 +335,62 @@ class MainWindow(QtWidgets.QMainWindow):
         layout.addLayout(status_row)
 
         # Results table
-        self.table = QtWidgets.QTableWidget(0, 5)
-        self.table.setHorizontalHeaderLabels(["Nombre", "Ruta", "Tamaño", "Modificado", "Tipo"])
-        self.table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.ResizeToContents)
+        # Virtual view: only visible rows are formatted, so ResizeToContents
+        # (which samples rows on every insert) is avoided in favour of fixed widths
+        self.model = ResultsModel(self)
+        self.table = QtWidgets.QTableView()
+        self.table.setModel(self.model)
+        self.table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.Interactive)
         self.table.horizontalHeader().setSectionResizeMode(1, QtWidgets.QHeaderView.Stretch)
-        self.table.horizontalHeader().setSectionResizeMode(2, QtWidgets.QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(3, QtWidgets.QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(4, QtWidgets.QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(2, QtWidgets.QHeaderView.Interactive)
+        self.table.horizontalHeader().setSectionResizeMode(3, QtWidgets.QHeaderView.Interactive)
+        self.table.horizontalHeader().setSectionResizeMode(4, QtWidgets.QHeaderView.Interactive)
+        self.table.setColumnWidth(0, 260)
+        self.table.setColumnWidth(2, 90)
+        self.table.setColumnWidth(3, 120)
+        self.table.setColumnWidth(4, 70)
+        self.table.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
         self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
         self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
         self.table.setSortingEnabled(True)
-        layout.addWidget(self.table, 1)
+
+        # Disk usage tree, shown instead of the table after a "Uso de disco" search
+        self.usage_model = UsageModel(self)
+        self.tree = QtWidgets.QTreeView()
+        self.tree.setModel(self.usage_model)
+        self.tree.setUniformRowHeights(True)
+        self.tree.header().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        self.tree.header().setStretchLastSection(False)
+        self.tree.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.tree.setSortingEnabled(True)
+        self.tree.sortByColumn(USAGE_COL_SIZE, QtCore.Qt.DescendingOrder)
+        self.results_stack = QtWidgets.QStackedWidget()
+        self.results_stack.addWidget(self.table)
+        self.results_stack.addWidget(self.tree)
+        layout.addWidget(self.results_stack, 1)
 
         # Context menu
         self.table.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
         self.table.customContextMenuRequested.connect(self._show_context_menu)
-        self.table.itemDoubleClicked.connect(lambda _: self._open_current())
+        self.table.doubleClicked.connect(lambda _: self._open_current())
+        self.tree.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
+        self.tree.customContextMenuRequested.connect(self._show_tree_context_menu)
+        self.tree.doubleClicked.connect(lambda index: self._open_in_explorer(self.usage_model.path_at(index)))
 
         # Wire up
-        self.btn_refresh_drives.clicked.connect(self._populate_drives)
+        self.btn_refresh_drives.clicked.connect(lambda: self._populate_drives(refresh=True))
         self.btn_add_folder.clicked.connect(self._add_custom_folder)
-        self.btn_search.clicked.connect(self._start_search)
+        self.btn_search.clicked.connect(self._search_clicked)
         self.btn_stop.clicked.connect(self._stop_search)
         self.btn_clear.clicked.connect(self._clear_results)
-        self.btn_export.clicked.connect(self._export_csv)
+        self.btn_export.clicked.connect(self._export_results)
+        self.btn_search_to_file.clicked.connect(self._search_to_file)
         self.btn_ex_add.clicked.connect(self._add_exclusion)
         self.btn_ex_del.clicked.connect(self._remove_exclusion)
+        self._live_timer.timeout.connect(self._live_search)
+        self.chk_watch.toggled.connect(self._toggle_watch)
+        for edit in (self.input_pattern, self.input_ext, self.input_min, self.input_max):
+            edit.textEdited.connect(self._schedule_live_search)
 
         self._populate_drives()
         self._load_settings()
@@ -190,10 +403,10 @@ class MainWindow(QtWidgets.QMainWindow):
         action = menu.exec(self.table.viewport().mapToGlobal(pos)) if USING_PYSIDE else menu.exec_(self.table.viewport().mapToGlobal(pos))
         if not action:
             return
-        row = self.table.currentRow()
+        row = self.table.currentIndex().row()
         if row < 0:
             return
-        path = self.table.item(row, 1).text()
+        path = self.model.path_at(row)
         if action == act_open:
             self._open_current()
         elif action == act_open_folder:
@@ -202,6 +415,19 @@ class MainWindow(QtWidgets.QMainWindow):
             cb = QtWidgets.QApplication.clipboard()
             cb.setText(path)
 
+    def _show_tree_context_menu(self, pos):
+        path = self.usage_model.path_at(self.tree.currentIndex())
+        if not path:
+            return
+        menu = QtWidgets.QMenu(self)
+        act_open_folder = menu.addAction("Abrir ubicación")
+        act_copy_path = menu.addAction("Copiar ruta")
+        action = menu.exec(self.tree.viewport().mapToGlobal(pos)) if USING_PYSIDE else menu.exec_(self.tree.viewport().mapToGlobal(pos))
+        if action == act_open_folder:
+            self._open_in_explorer(path)
+        elif action == act_copy_path:
+            QtWidgets.QApplication.clipboard().setText(path)
+
     def _open_path(self, path: str):
         try:
             os.startfile(path)  # type: ignore[attr-defined]
@@ -210,6 +436,7 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def _open_in_explorer(self, path: str):
         try:
+            import subprocess
             if os.path.isdir(path):
                 subprocess.Popen(["explorer", path])
             else:
@@ -218,23 +445,54 @@ class MainWindow(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.warning(self, "Explorador", "No se pudo abrir el explorador.")
 
     def _open_current(self):
-        row = self.table.currentRow()
+        row = self.table.currentIndex().row()
         if row < 0:
             return
-        path = self.table.item(row, 1).text()
+        path = self.model.path_at(row)
         self._open_path(path)
 
-    def _populate_drives(self):
+    def _populate_drives(self, refresh: bool = False):
+        roots = None if refresh else cached_roots()
+        if roots is not None:
+            self._set_drives(roots)
+            return
+        if self._roots_thread and self._roots_thread.isRunning():
+            return
+        self._clear_drives()
+        self.drives_layout.addWidget(QtWidgets.QLabel("Buscando unidades…"))
+        self.drives_layout.addStretch(1)
+        self.btn_refresh_drives.setEnabled(False)
+        self._roots_thread = RootsThread(refresh, parent=self)
+        self._roots_thread.discovered.connect(self._set_drives)
+        self._roots_thread.finished.connect(self._on_roots_thread_finished)
+        self._roots_thread.start()
+
+    def _clear_drives(self):
         while self.drives_layout.count():
             item = self.drives_layout.takeAt(0)
             w = item.widget()
             if w:
                 w.deleteLater()
-        for drv in list_windows_drives():
+
+    def _set_drives(self, roots: list):
+        # Keep the user's unchecked drives across refreshes
+        unchecked = {chk.text() for chk in self._drive_checks() if not chk.isChecked()}
+        self._drives = list(roots)
+        self._clear_drives()
+        for drv in self._drives:
             chk = QtWidgets.QCheckBox(drv)
-            chk.setChecked(True)
+            chk.setChecked(drv not in unchecked)
             self.drives_layout.addWidget(chk)
         self.drives_layout.addStretch(1)
+        self.btn_refresh_drives.setEnabled(True)
+
+    def _drive_checks(self) -> list:
+        checks = []
+        for i in range(self.drives_layout.count()):
+            w = self.drives_layout.itemAt(i).widget()
+            if isinstance(w, QtWidgets.QCheckBox):
+                checks.append(w)
+        return checks
 
     def _add_custom_folder(self):
         dlg = QtWidgets.QFileDialog(self, "Seleccionar carpeta")
@@ -261,25 +519,49 @@ class MainWindow(QtWidgets.QMainWindow):
             row = self.ex_list.row(it)
             self.ex_list.takeItem(row)
 
-    def _gather_roots(self) -> list[str]:
-        roots: list[str] = []
-        if self.chk_all_drives.isChecked():
-            roots.extend(list_windows_drives())
-        else:
-            for i in range(self.drives_layout.count()):
-                item = self.drives_layout.itemAt(i)
-                w = item.widget()
-                if isinstance(w, QtWidgets.QCheckBox) and w.isChecked():
-                    roots.append(w.text())
-        for i in range(self.custom_roots_list.count()):
-            roots.append(self.custom_roots_list.item(i).text())
-        norm: list[str] = []
-        for r in roots:
-            try:
-                if os.path.exists(r):
-                    norm.append(os.path.normpath(r))
-            except Exception:
-                pass
+    def _custom_roots(self) -> list[str]:
+        return [self.custom_roots_list.item(i).text() for i in range(self.custom_roots_list.count())]
+
+    def _resolve_roots(self, then):
+        # then(roots) right away when the drives and the custom folders were
+        # probed recently, else once a RootsThread has probed them: custom
+        # folders may live on network shares and never block the window
+        custom = self._custom_roots()
+        drives = cached_roots() if self.chk_all_drives.isChecked() else []
+        if drives is None:
+            drives = self._drives
+        folders = cached_probe(custom)
+        if drives is not None and folders is not None:
+            then(self._gather_roots(drives, folders))
+            return
+        self._roots_waiting = then
+        if self._roots_thread and self._roots_thread.isRunning():
+            # Discovery already running: probe the folders when it ends
+            return
+        self.lbl_status.setText("Comprobando unidades y carpetas…")
+        self._roots_thread = RootsThread(custom=custom, parent=self)
+        self._roots_thread.discovered.connect(self._set_drives)
+        self._roots_thread.probed.connect(self._on_roots_probed)
+        self._roots_thread.finished.connect(self._on_roots_thread_finished)
+        self._roots_thread.start()
+
+    def _on_roots_probed(self, drives: list, folders: list):
+        then, self._roots_waiting = self._roots_waiting, None
+        if then is not None:
+            then(self._gather_roots(drives if self.chk_all_drives.isChecked() else [], folders))
+
+    def _on_roots_thread_finished(self):
+        # A search asked for roots while a plain drive discovery was running
+        if self._roots_waiting is not None and not self._roots_thread.isRunning():
+            then, self._roots_waiting = self._roots_waiting, None
+            self._resolve_roots(then)
+
+    def _gather_roots(self, drives: list[str], folders: list[str]) -> list[str]:
+        roots: list[str] = list(drives)
+        if not self.chk_all_drives.isChecked():
+            roots.extend(chk.text() for chk in self._drive_checks() if chk.isChecked())
+        roots.extend(folders)
+        norm = [os.path.normpath(r) for r in roots]
         seen = set()
         unique: list[str] = []
         for r in norm:
@@ -294,42 +576,132 @@ class MainWindow(QtWidgets.QMainWindow):
             dt = dt.addSecs(23 * 3600 + 59 * 60 + 59)
         return int(dt.toSecsSinceEpoch()) if hasattr(dt, 'toSecsSinceEpoch') else int(dt.toMSecsSinceEpoch() / 1000)
 
-    def _start_search(self):
-        if self._thread and self._thread.isRunning():
-            return
+    def _build_params(self, roots: list[str], quiet: bool = False):
         pattern = self.input_pattern.text().strip()
         mode = self.mode_combo.currentText()
         match_case = self.chk_case.isChecked()
         use_regex = self.chk_regex.isChecked()
         use_wildcard = self.chk_wildcard.isChecked()
         include_dirs = self.chk_dirs.isChecked()
-        roots = self._gather_roots()
+        SearchParams, _ = _search_api()
         if not roots:
-            QtWidgets.QMessageBox.information(self, "Raíces", "No hay unidades o carpetas seleccionadas.")
-            return
+            if not quiet:
+                QtWidgets.QMessageBox.information(self, "Raíces", "No hay unidades o carpetas seleccionadas.")
+            return None
         exts = [e.strip().lower() if e.strip().startswith('.') else ('.' + e.strip().lower()) for e in self.input_ext.text().split(';') if e.strip()]
         min_b = parse_size(self.input_min.text().strip())
         max_b = parse_size(self.input_max.text().strip())
         dfrom = self._qdate_to_epoch(self.date_from.date(), end=False) if self.chk_date_from.isChecked() else None
         dto = self._qdate_to_epoch(self.date_to.date(), end=True) if self.chk_date_to.isChecked() else None
         ex_paths = [self.ex_list.item(i).text() for i in range(self.ex_list.count())]
-        params = SearchParams(pattern, mode, match_case, use_regex, use_wildcard, include_dirs, roots,
+        ex_names = [n.strip() for n in self.input_ex_names.text().split(';') if n.strip()]
+        return SearchParams(pattern, mode, match_case, use_regex, use_wildcard, include_dirs, roots,
                               extensions=exts, min_size=min_b, max_size=max_b, date_from=dfrom, date_to=dto,
                               exclude_system=self.chk_ex_system.isChecked(), exclude_hidden=self.chk_ex_hidden.isChecked(),
-                              exclude_offline=self.chk_ex_offline.isChecked(), excluded_paths=ex_paths)
-        self._thread = SearchThread(params)
-        self._thread.found.connect(self._on_found)
+                              exclude_offline=self.chk_ex_offline.isChecked(), excluded_paths=ex_paths,
+                              excluded_names=ex_names, use_index=self.chk_use_index.isChecked(), workers=self.spin_workers.value(),
+                              content=self.input_content.text(), content_regex=self.chk_content_regex.isChecked(),
+                              content_case=match_case, find_duplicates=self.chk_duplicates.isChecked(),
+                              use_cache=self.chk_query_cache.isChecked(),
+                              traversal=self.traversal_combo.currentData(),
+                              max_results=self.spin_max_results.value() or None, top_k=self.spin_top.value() or None,
+                              top_by=self.top_by_combo.currentData(), rollup=self.chk_rollup.isChecked())
+
+    def _search_clicked(self):
+        if self._thread and self._thread.isRunning():
+            return
+        self._resolve_roots(lambda roots: self._start_search(params=self._build_params(roots)))
+
+    def _start_search(self, output=None, params=None, quiet: bool = False) -> bool:
+        if self._thread and self._thread.isRunning():
+            return False
+        if params is None:
+            return False
+        _, SearchThread = _search_api()
+        try:
+            self._thread = SearchThread(params, output=output)
+        except re.error as e:
+            # While typing a live search a regex is often incomplete: say so without a dialog
+            if quiet:
+                self.lbl_status.setText(f"Regex inválida: {e}")
+            else:
+                QtWidgets.QMessageBox.warning(self, "Buscar", f"Regex inválida: {e}")
+            return False
+        self._thread.found_batch.connect(self._on_found_batch)
         self._thread.status.connect(self._on_status)
+        self._thread.progress.connect(self._on_progress)
+        self._thread.removed.connect(self._on_removed)
         self._thread.started_search.connect(self._on_search_started)
         self._thread.finished_search.connect(self._on_search_finished)
         self._thread.start()
+        return True
+
+    def _schedule_live_search(self, *_):
+        if self.chk_live.isChecked():
+            self._live_timer.start()
+
+    def _live_search(self):
+        self._resolve_roots(self._live_search_in)
+
+    def _live_search_in(self, roots: list[str]):
+        # Narrower queries filter the rows on hand; anything else walks again,
+        # interrupting a walk that the new text has already made obsolete
+        params = self._build_params(roots, quiet=True)
+        if params is None:
+            return
+        if self._thread and self._thread.isRunning():
+            self._live_restart = True
+            self._thread.cancel()
+            return
+        if is_refinement_of(params, self._last_params):
+            kept = self.model.retain(record_filter(params))
+            self._last_params = params
+            self._found_count = kept
+            self.lbl_status.setText(f"Refinado sin recorrer: {kept} resultados")
+            return
+        self._start_search(params=params, quiet=True)
+
+    def _ask_export_path(self, title: str, default_name: str) -> tuple[str, str]:
+        fname, selected = QtWidgets.QFileDialog.getSaveFileName(self, title, default_name, EXPORT_FILTERS)
+        if not fname:
+            return '', ''
+        fmt = selected.split(' ')[0].lower() if selected else 'csv'
+        _, format_from_path, _, _ = _export_api()
+        return fname, format_from_path(fname, fmt)
+
+    def _search_to_file(self):
+        if self._thread and self._thread.isRunning():
+            return
+        fname, fmt = self._ask_export_path("Buscar a archivo", "resultados.csv")
+        if not fname:
+            return
+        self._resolve_roots(lambda roots: self._search_to_file_in(roots, fname, fmt))
+
+    def _search_to_file_in(self, roots: list[str], fname: str, fmt: str):
+        params = self._build_params(roots)
+        if params is None or (self._thread and self._thread.isRunning()):
+            return
+        _, _, open_output, ResultWriter = _export_api()
+        try:
+            writer = ResultWriter(open_output(fname), fmt, formatted=self.chk_export_formatted.isChecked())
+        except Exception as e:
+            QtWidgets.QMessageBox.warning(self, "Buscar a archivo", f"Error: {e}")
+            return
+        self._output_path = fname
+        if not self._start_search(output=writer, params=params):
+            writer.close()
 
     def _stop_search(self):
         if self._thread and self._thread.isRunning():
             self._thread.cancel()
+        if self._export_thread and self._export_thread.isRunning():
+            self._export_thread.cancel()
 
     def _clear_results(self):
-        self.table.setRowCount(0)
+        self._stop_watch()
+        self.model.clear()
+        self.usage_model.clear()
+        self._last_params = None
         self.lbl_status.setText("Listo")
 
     def _settings(self) -> QtCore.QSettings:
@@ -366,6 +738,25 @@ class MainWindow(QtWidgets.QMainWindow):
         self.ex_list.clear()
         for p in s.value('ex_paths', [], list):
             self.ex_list.addItem(p)
+        self.input_ex_names.setText(s.value('ex_names', '', str))
+        self.chk_use_index.setChecked(s.value('use_index', False, bool))
+        self.spin_workers.setValue(s.value('workers', default_workers(), int))
+        self.spin_max_results.setValue(s.value('max_results', 0, int))
+        self.spin_top.setValue(s.value('top_k', 0, int))
+        top_by = self.top_by_combo.findData(s.value('top_by', 'size', str))
+        if top_by >= 0:
+            self.top_by_combo.setCurrentIndex(top_by)
+        traversal = self.traversal_combo.findData(s.value('traversal', 'priority', str))
+        if traversal >= 0:
+            self.traversal_combo.setCurrentIndex(traversal)
+        self.chk_export_formatted.setChecked(s.value('export_formatted', False, bool))
+        self.input_content.setText(s.value('content', '', str))
+        self.chk_content_regex.setChecked(s.value('content_regex', False, bool))
+        self.chk_duplicates.setChecked(s.value('duplicates', False, bool))
+        self.chk_rollup.setChecked(s.value('rollup', False, bool))
+        self.chk_live.setChecked(s.value('live', False, bool))
+        self.chk_query_cache.setChecked(s.value('query_cache', True, bool))
+        self.chk_watch.setChecked(s.value('watch', False, bool))
         widths = s.value('col_widths', [], list)
         if widths:
             for i, w in enumerate(widths):
@@ -395,74 +786,187 @@ class MainWindow(QtWidgets.QMainWindow):
         s.setValue('ex_hidden', self.chk_ex_hidden.isChecked())
         s.setValue('ex_offline', self.chk_ex_offline.isChecked())
         s.setValue('ex_paths', [self.ex_list.item(i).text() for i in range(self.ex_list.count())])
-        widths = [self.table.columnWidth(i) for i in range(self.table.columnCount())]
+        s.setValue('ex_names', self.input_ex_names.text())
+        s.setValue('use_index', self.chk_use_index.isChecked())
+        s.setValue('workers', self.spin_workers.value())
+        s.setValue('traversal', self.traversal_combo.currentData())
+        s.setValue('max_results', self.spin_max_results.value())
+        s.setValue('top_k', self.spin_top.value())
+        s.setValue('top_by', self.top_by_combo.currentData())
+        s.setValue('export_formatted', self.chk_export_formatted.isChecked())
+        s.setValue('content', self.input_content.text())
+        s.setValue('content_regex', self.chk_content_regex.isChecked())
+        s.setValue('duplicates', self.chk_duplicates.isChecked())
+        s.setValue('rollup', self.chk_rollup.isChecked())
+        s.setValue('live', self.chk_live.isChecked())
+        s.setValue('query_cache', self.chk_query_cache.isChecked())
+        s.setValue('watch', self.chk_watch.isChecked())
+        widths = [self.table.columnWidth(i) for i in range(self.model.columnCount())]
         s.setValue('col_widths', widths)
 
-    def _export_csv(self):
-        if self.table.rowCount() == 0:
+    def _export_results(self):
+        if self._export_thread and self._export_thread.isRunning():
+            return
+        usage = self.results_stack.currentWidget() is self.tree
+        total = self.usage_model.folder_count() if usage else self.model.rowCount()
+        if total == 0:
             QtWidgets.QMessageBox.information(self, "Exportar", "No hay resultados.")
             return
-        fname, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Guardar CSV", "resultados.csv", "CSV (*.csv)")
+        fname, fmt = self._ask_export_path("Exportar resultados", "uso_de_disco.csv" if usage else "resultados.csv")
         if not fname:
             return
-        try:
-            with open(fname, 'w', newline='', encoding='utf-8') as f:
-                w = csv.writer(f)
-                headers = [self.table.horizontalHeaderItem(i).text() for i in range(self.table.columnCount())]
-                w.writerow(headers)
-                for r in range(self.table.rowCount()):
-                    row = [self.table.item(r, c).text() if self.table.item(r, c) else '' for c in range(self.table.columnCount())]
-                    w.writerow(row)
-            QtWidgets.QMessageBox.information(self, "Exportar", "CSV guardado.")
-        except Exception as e:
-            QtWidgets.QMessageBox.warning(self, "Exportar", f"Error: {e}")
+        records = self.usage_model.iter_records() if usage else self.model.iter_records()
+        self._export_thread = ExportThread(records, total, fname, fmt,
+                                           self.chk_export_formatted.isChecked(), self)
+        self._export_thread.progress.connect(self._on_export_progress)
+        self._export_thread.finished_export.connect(self._on_export_finished)
+        self.btn_export.setEnabled(False)
+        self.btn_stop.setEnabled(True)
+        self.progress.setRange(0, total)
+        self.progress.setValue(0)
+        self.progress.setVisible(True)
+        self._export_thread.start()
+
+    def _on_export_progress(self, rows: int, total: int):
+        self.progress.setValue(rows)
+        self.lbl_status.setText(f"Exportando: {rows} de {total} filas")
+
+    def _on_export_finished(self, error: str):
+        t = self._export_thread
+        self.btn_export.setEnabled(True)
+        if not (self._thread and self._thread.isRunning()):
+            self.btn_stop.setEnabled(False)
+            self.progress.setVisible(False)
+        if error:
+            QtWidgets.QMessageBox.warning(self, "Exportar", f"Error: {error}")
+        elif t.rows is None:
+            self.lbl_status.setText("Exportación cancelada")
+        else:
+            self.lbl_status.setText(f"Exportadas {t.rows} filas a {t.path}")
 
     def _on_search_started(self):
         self.btn_search.setEnabled(False)
+        self.btn_search_to_file.setEnabled(False)
         self.btn_stop.setEnabled(True)
+        self.progress.setRange(0, 0)
         self.progress.setVisible(True)
         # Disable sorting during streaming inserts
         self._prev_sorting = self.table.isSortingEnabled()
         self.table.setSortingEnabled(False)
         self._clear_results()
         self._found_count = 0
-
-    def _on_found(self, item: dict):
-        row = self.table.rowCount()
-        self.table.insertRow(row)
-        name_item = QtWidgets.QTableWidgetItem(item['name'])
-        path_item = QtWidgets.QTableWidgetItem(item['path'])
-        size_item = QtWidgets.QTableWidgetItem(human_size(item['size']))
-        dt = datetime.fromtimestamp(item['mtime']) if item['mtime'] else None
-        mtime_text = dt.strftime('%Y-%m-%d %H:%M') if dt else ''
-        mtime_item = QtWidgets.QTableWidgetItem(mtime_text)
-        type_text = 'Carpeta' if item['is_dir'] else 'Archivo'
-        type_item = QtWidgets.QTableWidgetItem(type_text)
-        if item['is_dir']:
-            name_item.setForeground(QtGui.QBrush(QtGui.QColor('#555')))
-            path_item.setForeground(QtGui.QBrush(QtGui.QColor('#555')))
-        self.table.setItem(row, 0, name_item)
-        self.table.setItem(row, 1, path_item)
-        self.table.setItem(row, 2, size_item)
-        self.table.setItem(row, 3, mtime_item)
-        self.table.setItem(row, 4, type_item)
-        self._found_count = getattr(self, '_found_count', 0) + 1
+        self._search_started_at = time.time()
+        # A disk usage search sends its folders once, at the end; they are gathered for the tree
+        self._usage_rows = [] if self._thread.params.rollup and self._thread.output is None else None
+        self.results_stack.setCurrentWidget(self.tree if self._usage_rows is not None else self.table)
+
+    def _on_found_batch(self, items: list):
+        if self._usage_rows is not None:
+            self._usage_rows.extend(items)
+            return
+        self.model.append_rows(items)
+        self._found_count = getattr(self, '_found_count', 0) + len(items)
         self.lbl_status.setText(f"Resultados: {self._found_count}")
 
-    def _on_status(self, path: str):
-        self.lbl_status.setText(f"Escaneando: {path}")
+    def _on_removed(self, items: list):
+        gone = {(it['path'], it['size'], it['mtime']) for it in items}
+        kept = self.model.retain(lambda path, name, is_dir, size, mtime: (path, size, mtime) not in gone)
+        self._found_count = kept
+
+    def _on_status(self, text: str):
+        self.lbl_status.setText(text)
+
+    def _on_progress(self, p: dict):
+        if p.get('done'):
+            return
+        text = (f"Escaneando: {p['current']} — {p['dirs']} carpetas, {p['entries']} entradas, "
+                f"{p['matches']} resultados ({human_size(p['matched_bytes'])}), {p['entries_per_sec']:.0f}/s")
+        if 'percent' in p:
+            self.progress.setRange(0, 100)
+            self.progress.setValue(int(p['percent']))
+            eta = p.get('eta')
+            if eta is not None:
+                text += f", faltan ~{int(eta) // 60}:{int(eta) % 60:02d}"
+        else:
+            self.progress.setRange(0, 0)
+        self.lbl_status.setText(text)
 
     def _on_search_finished(self):
         self.btn_search.setEnabled(True)
+        self.btn_search_to_file.setEnabled(True)
         self.btn_stop.setEnabled(False)
         self.progress.setVisible(False)
         # Re-enable sorting after finish
         if getattr(self, '_prev_sorting', True):
             self.table.setSortingEnabled(True)
-        self.lbl_status.setText(f"Listo. Resultados: {getattr(self, '_found_count', 0)}")
+        t = self._thread
+        if t is not None and t.output is None and t.params.top_k and self.table.isSortingEnabled():
+            # Show a top-K list in its ranking order rather than the last clicked column
+            column = COL_SIZE if t.params.top_by == 'size' else COL_MTIME
+            self.table.sortByColumn(column, QtCore.Qt.DescendingOrder)
+        # Only a complete result set can be narrowed later (a top-K list or folder totals are not one)
+        complete = (t is not None and t.output is None and not t.engine.cancelled and not t.params.top_k
+                    and not t.params.rollup)
+        self._last_params = t.params if complete else None
+        if complete and self.chk_watch.isChecked():
+            self._start_watch()
+        if t is not None and t.output is not None:
+            if t.output_error:
+                QtWidgets.QMessageBox.warning(self, "Buscar a archivo", f"Error: {t.output_error}")
+            self.lbl_status.setText(f"Listo. {t.output.rows} resultados guardados en {self._output_path}")
+        elif self._usage_rows is not None:
+            rows, self._usage_rows = self._usage_rows, None
+            self.usage_model.set_records(rows)
+            self.tree.expandToDepth(0)
+            self.lbl_status.setText(f"Listo. {len(rows)} carpetas, {human_size(self.usage_model.total_size())}")
+        else:
+            self.lbl_status.setText(f"Listo. Resultados: {getattr(self, '_found_count', 0)}")
         self._save_settings()
+        if self._live_restart:
+            self._live_restart = False
+            self._live_search()
+
+    def _start_watch(self):
+        self._stop_watch()
+        if self._last_params is None:
+            return
+        WatchBridge = _watch_api()
+        bridge = WatchBridge(self._last_params, since=self._search_started_at, parent=self)
+        bridge.changed.connect(lambda changes, b=bridge: self._on_fs_changes(b, changes))
+        bridge.status.connect(self._on_status)
+        self._watch = bridge
+        bridge.start()
+
+    def _stop_watch(self):
+        if self._watch is not None:
+            self._watch.stop()
+            self._watch = None
+
+    def _toggle_watch(self, on: bool):
+        if not on:
+            self._stop_watch()
+        elif self._watch is None and not (self._thread and self._thread.isRunning()):
+            self._start_watch()
+
+    def _on_fs_changes(self, bridge, changes):
+        # Batches from a watcher already replaced (new search, cleared table) are dropped
+        params = self._last_params
+        if bridge is not self._watch or params is None:
+            return
+        if params.content or params.find_duplicates:
+            # Content hits and duplicate groups would need the files read again
+            self.lbl_status.setText(f"Cambios en disco: {len(changes)} entradas (no se aplican a esta búsqueda)")
+            return
+        keep = record_filter(params)
+        items = [it for it in changes.items()
+                 if keep(it['path'], it['name'], it['is_dir'], it['size'], it['mtime'], it['attrs'])]
+        kept = self.model.retain(lambda path, name, is_dir, size, mtime: not changes.touches(path))
+        self.model.append_rows(items)
+        self._found_count = kept + len(items)
+        self.lbl_status.setText(f"Cambios en disco: {len(changes)} entradas. Resultados: {self._found_count}")
 
     def closeEvent(self, e):
+        self._stop_watch()
         self._save_settings()
         super().closeEvent(e)
 
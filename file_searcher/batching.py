@@ -0,0 +1,58 @@
+﻿import threading
+import time
+
+
+# Groups results into chunks so the receiver gets one call per chunk instead
+# of one per hit. A chunk is flushed when it reaches max_items or when its
+# oldest item has waited max_latency seconds; poll() lets an idle producer
+# honour the time window between hits.
+class ResultBatcher:
+    def __init__(self, flush, max_items: int = 2000, max_latency: float = 0.05):
+        self._flush_cb = flush
+        self.max_items = max(1, int(max_items))
+        self.max_latency = max(0.0, float(max_latency))
+        self._items: list = []
+        self._first_at = 0.0
+        self._lock = threading.Lock()
+        self.items = 0
+        self.batches = 0
+        self.worst_latency = 0.0
+
+    def add(self, item):
+        with self._lock:
+            if not self._items:
+                self._first_at = time.perf_counter()
+            self._items.append(item)
+            if len(self._items) >= self.max_items or self._expired():
+                self._flush_locked()
+
+    def poll(self):
+        with self._lock:
+            if self._items and self._expired():
+                self._flush_locked()
+
+    def close(self):
+        with self._lock:
+            if self._items:
+                self._flush_locked()
+
+    def _expired(self) -> bool:
+        return time.perf_counter() - self._first_at >= self.max_latency
+
+    def _flush_locked(self):
+        items, self._items = self._items, []
+        self.items += len(items)
+        self.batches += 1
+        self.worst_latency = max(self.worst_latency, time.perf_counter() - self._first_at)
+        # Flushing under the lock keeps batches in order across walker threads
+        self._flush_cb(items)
+
+    def as_dict(self) -> dict:
+        return {
+            'items': self.items,
+            'batches': self.batches,
+            'avg_batch': self.items / self.batches if self.batches else 0.0,
+            'worst_latency': self.worst_latency,
+            'max_items': self.max_items,
+            'max_latency': self.max_latency,
+        }
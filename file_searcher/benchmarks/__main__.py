@@ -0,0 +1,127 @@
+﻿import os
+import sys
+import json
+import time
+import argparse
+import platform
+
+from .treegen import PRESETS, generate_tree, expected_counts
+from .micro import run_micro
+from .e2e import CASES, measure, run_e2e
+from .compare import compare, format_rows, load
+
+
+def _meta() -> dict:
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def _tree_spec(args) -> dict:
+    spec = dict(PRESETS[args.preset])
+    for key in ('depth', 'fanout', 'files_per_dir'):
+        if getattr(args, key) is not None:
+            spec[key] = getattr(args, key)
+    return spec
+
+
+def _generate(args) -> dict:
+    spec = _tree_spec(args)
+    dirs, files = expected_counts(**spec)
+    sys.stderr.write(f"Árbol {args.root}: {dirs} carpetas, {files} archivos\n")
+
+    def progress(d, f):
+        sys.stderr.write(f"\r{d}/{dirs} carpetas, {f} archivos ")
+        sys.stderr.flush()
+    manifest = generate_tree(args.root, seed=args.seed, sparse=not args.dense, on_progress=progress, **spec)
+    sys.stderr.write('\n')
+    return manifest
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m file_searcher.benchmarks')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def tree_args(p):
+        p.add_argument('root', help="Carpeta del árbol sintético")
+        p.add_argument('--preset', choices=sorted(PRESETS), default='small')
+        p.add_argument('--depth', type=int)
+        p.add_argument('--fanout', type=int)
+        p.add_argument('--files-per-dir', type=int)
+        p.add_argument('--seed', type=int, default=1)
+        p.add_argument('--dense', action='store_true', help="Escribir datos reales en vez de archivos dispersos")
+
+    def report_args(p):
+        p.add_argument('--out', help="Guardar el resultado en JSON")
+        p.add_argument('--baseline', help="JSON de una corrida anterior para comparar")
+        p.add_argument('--tolerance', type=float, default=0.10, help="Empeoramiento tolerado (0.10 = 10%%)")
+
+    tree_args(sub.add_parser('gen', help="Generar el árbol sintético"))
+    p = sub.add_parser('micro', help="Micro-benchmarks de coincidencia, filtros y entrega")
+    p.add_argument('--records', type=int, default=100000)
+    p.add_argument('--repeat', type=int, default=5)
+    report_args(p)
+    p = sub.add_parser('e2e', help="Búsquedas completas sobre el árbol sintético")
+    tree_args(p)
+    p.add_argument('--case', action='append', choices=sorted(CASES), help="Solo estos casos (repetible)")
+    report_args(p)
+    p = sub.add_parser('all', help="micro + e2e")
+    tree_args(p)
+    p.add_argument('--records', type=int, default=100000)
+    p.add_argument('--repeat', type=int, default=5)
+    report_args(p)
+    p = sub.add_parser('compare', help="Comparar dos resultados JSON")
+    p.add_argument('current')
+    p.add_argument('baseline')
+    p.add_argument('--tolerance', type=float, default=0.10)
+    # Internal: one e2e case, run in a child process by e2e.run_case_subprocess
+    p = sub.add_parser('_case')
+    p.add_argument('root')
+    p.add_argument('spec')
+    return parser
+
+
+def _report(result: dict, args) -> int:
+    text = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+    if not args.baseline:
+        return 0
+    rows = compare(result, load(args.baseline), args.tolerance)
+    sys.stderr.write(format_rows(rows) + '\n')
+    return 1 if any(r['regression'] for r in rows) else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == '_case':
+        print(json.dumps(measure(args.root, json.loads(args.spec))))
+        return 0
+    if args.command == 'compare':
+        rows = compare(load(args.current), load(args.baseline), args.tolerance)
+        print(format_rows(rows))
+        return 1 if any(r['regression'] for r in rows) else 0
+    if args.command == 'gen':
+        print(json.dumps(_generate(args)))
+        return 0
+    result = {'meta': _meta()}
+    if args.command in ('micro', 'all'):
+        sys.stderr.write("Micro-benchmarks…\n")
+        result['micro'] = run_micro(args.records, args.repeat)
+    if args.command in ('e2e', 'all'):
+        result['tree'] = _generate(args)
+        cases = {name: CASES[name] for name in args.case} if getattr(args, 'case', None) else None
+        result['e2e'] = run_e2e(os.path.abspath(args.root), cases,
+                                on_case=lambda name, r: sys.stderr.write(f"  {name}: {r.get('elapsed', r)}\n"))
+    return _report(result, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,48 @@
+﻿import json
+
+# Metrics where a bigger number is better; every other timing/size metric is lower-is-better
+HIGHER_IS_BETTER = ('entries_per_sec',)
+COMPARED = ('_ns', '_bytes', 'elapsed', 'time_to_first', 'peak_rss', 'entries_per_sec')
+
+
+def flatten(data: dict, prefix: str = '') -> dict[str, float]:
+    out: dict[str, float] = {}
+    for key, value in data.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            out.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[name] = float(value)
+    return out
+
+
+def _compared(name: str) -> bool:
+    return not name.startswith('meta.') and any(tag in name for tag in COMPARED)
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.10) -> list[dict]:
+    # One row per metric present in both runs; 'change' is relative, positive = worse
+    cur, base = flatten(current), flatten(baseline)
+    rows = []
+    for name in sorted(cur.keys() & base.keys()):
+        if not _compared(name) or not base[name]:
+            continue
+        change = (cur[name] - base[name]) / base[name]
+        if name.endswith(HIGHER_IS_BETTER):
+            change = -change
+        rows.append({'metric': name, 'baseline': base[name], 'current': cur[name], 'change': change,
+                     'regression': change > tolerance})
+    return rows
+
+
+def load(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def format_rows(rows: list[dict]) -> str:
+    lines = []
+    for r in rows:
+        mark = 'PEOR' if r['regression'] else ('mejor' if r['change'] < 0 else '')
+        lines.append(f"{r['metric']:<48} {r['baseline']:>14.4g} {r['current']:>14.4g} {r['change']:>+8.1%} {mark}")
+    return '\n'.join(lines)
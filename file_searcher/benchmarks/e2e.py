@@ -0,0 +1,120 @@
+﻿import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+
+from ..engine import SearchParams, SearchEngine
+from ..traversal import default_workers
+
+# name -> SearchParams keyword arguments; every case runs in a fresh process
+CASES = {
+    'all_serial': {'pattern': '', 'workers': 1},
+    'all_parallel': {'pattern': '', 'workers': default_workers()},
+    'literal': {'pattern': 'informe'},
+    'wildcard_ext': {'pattern': '*.pdf'},
+    'regex': {'pattern': r'^INV_\d+', 'use_regex': True},
+    'size_filter': {'pattern': '', 'min_size': 1 << 20},
+    'index_warm': {'pattern': 'informe', 'use_index': True},
+    'index_range': {'pattern': '', 'extensions': ['.pdf'], 'min_size': 1 << 20, 'use_index': True},
+    # Same query under each traversal order; compare time_to_first_n rather than elapsed. Cases share
+    # the app data, so order_priority starts with the hit history of the earlier runs, like a repeat search
+    'order_dfs': {'pattern': 'informe', 'traversal': 'dfs'},
+    'order_bfs': {'pattern': 'informe', 'traversal': 'bfs'},
+    'order_deepening': {'pattern': 'informe', 'traversal': 'deepening'},
+    'order_priority': {'pattern': 'informe', 'traversal': 'priority'},
+}
+# Results counted for time_to_first_n
+FIRST_N = 100
+
+
+def peak_rss() -> int | None:
+    # Peak resident set size of this process in bytes
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    if os.name == 'nt':
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+                (f, ctypes.c_size_t) for f in ('PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage',
+                                               'QuotaPagedPoolUsage', 'QuotaPeakNonPagedPoolUsage',
+                                               'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return int(counters.PeakWorkingSetSize)
+    return None
+
+
+def _params(root: str, spec: dict) -> SearchParams:
+    spec = dict(spec)
+    return SearchParams(spec.pop('pattern', ''), spec.pop('mode', 'contains'), False, spec.pop('use_regex', False),
+                        spec.pop('use_wildcard', False), False, [root], **spec)
+
+
+def measure(root: str, spec: dict) -> dict:
+    if spec.get('use_index'):
+        # Build (or refresh) the index first so the timed run answers from it
+        SearchEngine(_params(root, spec)).run()
+    results = 0
+    first: list[float] = []
+    first_n: list[float] = []
+    started = time.perf_counter()
+
+    def on_batch(items):
+        nonlocal results
+        now = time.perf_counter() - started
+        if not first:
+            first.append(now)
+        results += len(items)
+        if not first_n and results >= FIRST_N:
+            first_n.append(now)
+
+    engine = SearchEngine(_params(root, spec), on_batch=on_batch)
+    engine.run()
+    elapsed = time.perf_counter() - started
+    progress = engine.progress_stats
+    return {
+        'elapsed': elapsed,
+        'results': results,
+        'time_to_first_result': first[0] if first else None,
+        'time_to_first_n': first_n[0] if first_n else None,
+        'dirs': progress['dirs'],
+        'entries': progress['entries'],
+        'entries_per_sec': progress['entries'] / elapsed if elapsed > 0 else 0.0,
+        'stats_calls': engine.syscall_stats['stats'],
+        'peak_rss': peak_rss(),
+    }
+
+
+def run_case_subprocess(root: str, name: str, spec: dict, cache_dir: str) -> dict:
+    # A child per case keeps peak RSS and warm caches from leaking between cases
+    package_parent = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = package_parent + os.pathsep + env.get('PYTHONPATH', '')
+    # The index and crawl totals of benchmark runs stay out of the user's app data
+    env['LOCALAPPDATA'] = env['XDG_CACHE_HOME'] = cache_dir
+    proc = subprocess.run([sys.executable, '-m', 'file_searcher.benchmarks', '_case', root, json.dumps(spec)],
+                          capture_output=True, text=True, env=env)
+    if proc.returncode != 0:
+        return {'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"}
+    return json.loads(proc.stdout)
+
+
+def run_e2e(root: str, cases: dict | None = None, on_case=None) -> dict:
+    out = {}
+    with tempfile.TemporaryDirectory(prefix='fsbench-') as cache_dir:
+        for name, spec in (cases or CASES).items():
+            out[name] = run_case_subprocess(root, name, spec, cache_dir)
+            if on_case:
+                on_case(name, out[name])
+    return out
@@ -0,0 +1,144 @@
+﻿import random
+import time
+import tracemalloc
+
+from ..matchers import compile_name_matcher
+from ..filters import FilterPlan
+from ..batching import ResultBatcher
+from ..engine import SearchParams, SearchEngine
+from ..resultstore import ResultStore
+from .treegen import _name, _size, _YEAR
+
+MODES = ('contains', 'startswith', 'endswith', 'equals')
+# (label, pattern, use_regex, use_wildcard)
+PATTERNS = (
+    ('literal', 'informe', False, False),
+    ('wildcard', 'inf*.pdf', False, True),
+    ('regex', r'^INV_\d+', True, False),
+    ('multi', 'informe;*.xlsx;backup', False, False),
+)
+
+
+def sample_records(n: int, seed: int = 7) -> list[tuple]:
+    # (path, name, is_dir, size, mtime, attrs) drawn like the synthetic tree
+    rng = random.Random(seed)
+    now = time.time()
+    out = []
+    for i in range(n):
+        name = _name(rng, i % 100000)
+        out.append((f"/bench/dir_{i % 97}/{name}", name, False, _size(rng), now - rng.random() * 3 * _YEAR, 0))
+    return out
+
+
+def _best_ns(fn, items, repeat: int) -> float:
+    # Best of `repeat` passes, in nanoseconds per item
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        fn(items)
+        best = min(best, time.perf_counter_ns() - started)
+    return best / max(len(items), 1)
+
+
+def bench_name_matchers(records: list[tuple], repeat: int) -> dict:
+    names = [r[1] for r in records]
+    out = {}
+    for label, pattern, use_regex, use_wildcard in PATTERNS:
+        for mode in MODES:
+            match = compile_name_matcher(pattern, mode, False, use_regex, use_wildcard)
+
+            def run(items, match=match):
+                for name in items:
+                    match(name)
+            out[f"{label}/{mode}"] = _best_ns(run, names, repeat)
+    return out
+
+
+def bench_filter_plan(records: list[tuple], repeat: int) -> dict:
+    now = time.time()
+    cases = {
+        'none': {},
+        'extensions': {'extensions': ['.pdf', '.xlsx']},
+        'size_date': {'min_size': 4096, 'max_size': 64 << 20, 'date_from': now - _YEAR},
+        'all': {'extensions': ['.pdf', '.xlsx'], 'min_size': 4096, 'date_from': now - _YEAR,
+                'exclude_hidden': True},
+    }
+    out = {}
+    for label, extra in cases.items():
+        params = SearchParams('informe', 'contains', False, False, False, False, ['/bench'], **extra)
+        plan = FilterPlan(params, compile_name_matcher(params.pattern, params.mode))
+
+        def run(items, check=plan.check_record):
+            for r in items:
+                check(*r)
+        out[label] = _best_ns(run, records, repeat)
+    return out
+
+
+def bench_emission(records: list[tuple], repeat: int) -> dict:
+    out = {}
+
+    def run_batcher(items):
+        batcher = ResultBatcher(lambda batch: None)
+        for r in items:
+            batcher.add(r)
+        batcher.close()
+    out['batcher_add'] = _best_ns(run_batcher, records, repeat)
+
+    def run_engine(items):
+        engine = SearchEngine(SearchParams('', 'contains', False, False, False, False, ['/bench']))
+        emit = engine._emit_record
+        for path, name, is_dir, size, mtime, _attrs in items:
+            emit(path, name, is_dir, size, mtime)
+        engine._batcher.close()
+    out['engine_emit'] = _best_ns(run_engine, records, repeat)
+
+    try:
+        from ..results_model import ResultsModel
+    except ImportError:
+        return out
+    items = [{'name': r[1], 'path': r[0], 'is_dir': r[2], 'size': r[3], 'mtime': r[4]} for r in records]
+
+    def run_model(batch):
+        model = ResultsModel()
+        for i in range(0, len(batch), 2000):
+            model.append_rows(batch[i:i + 2000])
+    out['model_append'] = _best_ns(run_model, items, repeat)
+    return out
+
+
+def _traced_bytes(build) -> int:
+    tracemalloc.start()
+    try:
+        kept = build()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del kept
+    return size
+
+
+def bench_result_memory(records: list[tuple]) -> dict:
+    # Bytes per stored result: one dict with its own path string vs a ResultStore row
+    def dicts():
+        return [{'name': r[1], 'path': ''.join(r[0]), 'is_dir': r[2], 'size': r[3], 'mtime': r[4]}
+                for r in records]
+
+    def store():
+        out = ResultStore()
+        for r in records:
+            out.append({'name': r[1], 'path': r[0], 'is_dir': r[2], 'size': r[3], 'mtime': r[4]})
+        return out
+    n = max(len(records), 1)
+    return {'dicts': _traced_bytes(dicts) / n, 'store': _traced_bytes(store) / n}
+
+
+def run_micro(n: int = 100000, repeat: int = 5) -> dict:
+    records = sample_records(n)
+    return {
+        'records': n,
+        'name_match_ns': bench_name_matchers(records, repeat),
+        'filter_plan_ns': bench_filter_plan(records, repeat),
+        'emission_ns': bench_emission(records, repeat),
+        'result_bytes': bench_result_memory(records),
+    }
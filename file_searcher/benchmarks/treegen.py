@@ -0,0 +1,85 @@
+﻿import os
+import json
+import random
+import time
+
+MANIFEST = '.benchtree.json'
+
+PRESETS = {
+    'small': {'depth': 3, 'fanout': 6, 'files_per_dir': 40},
+    'medium': {'depth': 4, 'fanout': 8, 'files_per_dir': 60},
+    'large': {'depth': 5, 'fanout': 8, 'files_per_dir': 60},
+    'huge': {'depth': 4, 'fanout': 10, 'files_per_dir': 200},
+}
+
+EXTENSIONS = ('.txt', '.pdf', '.docx', '.xlsx', '.jpg', '.png', '.log', '.csv', '.py', '.zip', '')
+_WORDS = ('informe', 'reporte', 'factura', 'backup', 'foto', 'notas', 'datos', 'cliente', 'INV', 'draft', 'final')
+# Mostly small files with a long tail, like a real user profile
+_SIZES = ((0.55, 0, 4096), (0.30, 4096, 256 * 1024), (0.12, 256 * 1024, 16 << 20), (0.03, 16 << 20, 2 << 30))
+_YEAR = 365 * 86400
+
+
+def expected_counts(depth: int, fanout: int, files_per_dir: int) -> tuple[int, int]:
+    dirs = sum(fanout ** level for level in range(depth + 1))
+    return dirs, dirs * files_per_dir
+
+
+def _size(rng: random.Random) -> int:
+    x = rng.random()
+    for share, low, high in _SIZES:
+        if x < share:
+            return rng.randint(low, high)
+        x -= share
+    return 0
+
+
+def _name(rng: random.Random, i: int) -> str:
+    return f"{rng.choice(_WORDS)}_{i:05d}_{rng.randint(0, 9999)}{rng.choice(EXTENSIONS)}"
+
+
+def generate_tree(root: str, depth: int, fanout: int, files_per_dir: int, seed: int = 1,
+                  sparse: bool = True, on_progress=None) -> dict:
+    # Same arguments, same tree: names, sizes and mtimes come from one seeded
+    # generator. Sizes are set with truncate(), which makes sparse files on
+    # NTFS/ext4/APFS, so a tree of millions of entries costs metadata only.
+    # An existing tree with the same manifest is reused as is.
+    spec = {'depth': depth, 'fanout': fanout, 'files_per_dir': files_per_dir, 'seed': seed, 'sparse': sparse}
+    manifest_path = os.path.join(root, MANIFEST)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('spec') == spec:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    rng = random.Random(seed)
+    now = time.time()
+    os.makedirs(root, exist_ok=True)
+    dirs = files = total_bytes = 0
+    stack = [(root, 0)]
+    while stack:
+        current, level = stack.pop()
+        dirs += 1
+        for i in range(files_per_dir):
+            path = os.path.join(current, _name(rng, i))
+            size = _size(rng)
+            with open(path, 'wb') as f:
+                if sparse:
+                    f.truncate(size)
+                else:
+                    f.write(os.urandom(min(size, 1 << 20)))
+            mtime = now - rng.random() * 3 * _YEAR
+            os.utime(path, (mtime, mtime))
+            files += 1
+            total_bytes += size
+        if level < depth:
+            for i in range(fanout):
+                sub = os.path.join(current, f"dir_{level + 1}_{i:03d}")
+                os.makedirs(sub, exist_ok=True)
+                stack.append((sub, level + 1))
+        if on_progress and dirs % 100 == 0:
+            on_progress(dirs, files)
+    manifest = {'spec': spec, 'dirs': dirs, 'files': files, 'entries': dirs - 1 + files, 'bytes': total_bytes}
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    return manifest
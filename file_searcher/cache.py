@@ -0,0 +1,137 @@
+﻿import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+# Imports that work both as package and as script
+try:
+    from .resultstore import ResultStore
+except Exception:
+    from resultstore import ResultStore  # type: ignore
+
+DEFAULT_MAX_BYTES = 64 << 20
+
+# SearchParams fields that change the answer; workers, batching and index use do not
+_KEY_FIELDS = ('pattern', 'mode', 'match_case', 'use_regex', 'use_wildcard', 'include_dirs', 'min_size', 'max_size',
+               'date_from', 'date_to', 'exclude_system', 'exclude_hidden', 'exclude_offline', 'content',
+               'content_regex', 'content_case', 'content_all_hits', 'max_results', 'top_k', 'top_by',
+               'rollup')
+
+
+def query_key(params) -> str:
+    key = {f: getattr(params, f, None) for f in _KEY_FIELDS}
+    key['roots'] = sorted(os.path.normcase(os.path.normpath(r)) for r in params.roots)
+    key['extensions'] = sorted(set(params.extensions))
+    key['excluded_paths'] = sorted(params.excluded_paths)
+    key['excluded_names'] = sorted(n.casefold() for n in params.excluded_names)
+    return json.dumps(key, sort_keys=True)
+
+
+def folder_mtimes(items) -> dict[str, float]:
+    # Modification time of every folder holding a result; a folder's mtime
+    # moves when an entry in it is created, deleted or renamed
+    if isinstance(items, ResultStore):
+        parents = items.used_dir_paths()
+    else:
+        parents = (os.path.dirname(item['path']) for item in items)
+    out: dict[str, float] = {}
+    for parent in parents:
+        if parent in out:
+            continue
+        try:
+            out[parent] = os.stat(parent).st_mtime
+        except OSError:
+            out[parent] = -1.0
+    return out
+
+
+# One cached answer. The hits are kept in a ResultStore (folder table and
+# typed columns) and only turned back into dicts when served.
+class CachedQuery:
+    def __init__(self, items, dir_mtimes: dict[str, float]):
+        self.store = ResultStore.from_items(items)
+        self.dir_mtimes = dir_mtimes
+        self.created_at = time.time()
+        self.nbytes = self.store.nbytes() + 100 * len(dir_mtimes)
+
+    @property
+    def items(self) -> list:
+        return list(self.store)
+
+    def changed_dirs(self) -> set[str]:
+        changed = set()
+        for path, mtime in self.dir_mtimes.items():
+            try:
+                if os.stat(path).st_mtime != mtime:
+                    changed.add(path)
+            except OSError:
+                changed.add(path)
+        return changed
+
+
+# Answers of recent searches, least recently used evicted first once the
+# estimated size passes max_bytes. An answer larger than the whole budget
+# is not kept.
+class QueryCache:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, CachedQuery] = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> CachedQuery | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: CachedQuery):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            if entry.nbytes > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self.nbytes += entry.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def discard(self, key: str):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'nbytes': self.nbytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+_shared: QueryCache | None = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache() -> QueryCache:
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = QueryCache()
+        return _shared
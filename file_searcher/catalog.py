@@ -0,0 +1,216 @@
+﻿import os
+import sys
+import threading
+from array import array
+
+# Imports that work both as package and as script
+try:
+    from .index import FileIndex, root_key
+    from .trigrams import TrigramIndex
+    from .secondary import SecondaryIndex, bitmap_of, iter_bitmap
+except Exception:
+    from index import FileIndex, root_key  # type: ignore
+    from trigrams import TrigramIndex  # type: ignore
+    from secondary import SecondaryIndex, bitmap_of, iter_bitmap  # type: ignore
+
+
+# A filter answered by an index is only worth a bitmap when it keeps at
+# most this share of the entries; wider ones are left to the exact check
+SELECTIVE_FRACTION = 0.5
+# Candidates read per hold of the catalog lock while a search checks them
+READ_CHUNK = 4096
+
+
+# In-memory, column-wise copy of one indexed root. Rows are addressed by a
+# stable id (their position); removed rows stay as dead slots so ids never
+# shift. A trigram index over the names narrows name queries to a few
+# candidate ids before the exact matcher runs, and is kept up to date as
+# the incremental refresh adds and removes entries. Sorted size, mtime and
+# extension indexes (secondary.SecondaryIndex) are built on first use.
+# One catalog is shared by every search of its root and updated by the
+# refresh and the watcher from other threads: changes and reads go through
+# a lock, and batch() holds it over a group of changes (a rename, a watcher
+# batch) so searches never see one half applied.
+class Catalog:
+    def __init__(self, root: str, crawled_at: float | None = None):
+        self.root = root
+        self.crawled_at = crawled_at
+        self.parents: list[str] = []
+        self.names: list[str] = []
+        self.is_dir = array('b')
+        self.sizes = array('q')
+        self.mtimes = array('d')
+        self.attrs = array('q')
+        self.alive = bytearray()
+        self.live = 0
+        self._children: dict[str, dict[str, int]] = {}
+        self.trigrams = TrigramIndex()
+        self._secondary: SecondaryIndex | None = None
+        # Set when changes were applied that the index did not keep (see discard)
+        self.stale = False
+        self._lock = threading.RLock()
+
+    @classmethod
+    def load(cls, index: FileIndex, root: str, rules: str = '') -> 'Catalog':
+        catalog = cls(root, index.crawled_at(root, rules))
+        for row in index.iter_entries(root):
+            catalog.add(*row)
+        return catalog
+
+    def batch(self):
+        return self._lock
+
+    def add(self, parent: str, name: str, is_dir: bool, size: int, mtime: float, attrs: int) -> int:
+        with self._lock:
+            return self._add(parent, name, is_dir, size, mtime, attrs)
+
+    def _add(self, parent: str, name: str, is_dir: bool, size: int, mtime: float, attrs: int) -> int:
+        entry_id = len(self.names)
+        parent = sys.intern(parent)
+        self.parents.append(parent)
+        self.names.append(name)
+        self.is_dir.append(1 if is_dir else 0)
+        self.sizes.append(int(size))
+        self.mtimes.append(float(mtime))
+        self.attrs.append(int(attrs))
+        self.alive.append(1)
+        self.live += 1
+        self._children.setdefault(parent, {})[name] = entry_id
+        self.trigrams.add(entry_id, name)
+        self._touch(entry_id)
+        return entry_id
+
+    def discard(self):
+        self.stale = True
+
+    def find(self, parent: str, name: str) -> int | None:
+        with self._lock:
+            return self._children.get(parent, {}).get(name)
+
+    def update(self, parent: str, name: str, is_dir: bool, size: int, mtime: float, attrs: int):
+        with self._lock:
+            entry_id = self._children.get(parent, {}).get(name)
+            if entry_id is None:
+                self._add(parent, name, is_dir, size, mtime, attrs)
+                return
+            self.is_dir[entry_id] = 1 if is_dir else 0
+            self.sizes[entry_id] = int(size)
+            self.mtimes[entry_id] = float(mtime)
+            self.attrs[entry_id] = int(attrs)
+            self._touch(entry_id)
+
+    def _touch(self, entry_id: int):
+        secondary = self._secondary
+        if secondary is not None:
+            secondary.touch(entry_id)
+            if secondary.stale():
+                self._secondary = None
+
+    def secondary(self) -> SecondaryIndex:
+        with self._lock:
+            secondary = self._secondary
+            if secondary is None:
+                secondary = self._secondary = SecondaryIndex(self)
+            return secondary
+
+    def _drop(self, entry_id: int):
+        if self.alive[entry_id]:
+            self.alive[entry_id] = 0
+            self.live -= 1
+            self.trigrams.remove(entry_id)
+
+    def remove(self, parent: str, name: str, is_dir: bool):
+        with self._lock:
+            listing = self._children.get(parent)
+            entry_id = listing.pop(name, None) if listing else None
+            if entry_id is not None:
+                self._drop(entry_id)
+            if is_dir:
+                path = os.path.join(parent, name)
+                prefix = path.rstrip('\\/') + os.sep
+                for folder in [p for p in self._children if p == path or p.startswith(prefix)]:
+                    for child_id in self._children.pop(folder).values():
+                        self._drop(child_id)
+
+    def set_dir_mtime(self, path: str, mtime: float):
+        parent, name = os.path.split(path)
+        with self._lock:
+            entry_id = self._children.get(parent, {}).get(name)
+            if entry_id is not None and self.is_dir[entry_id]:
+                self.mtimes[entry_id] = float(mtime)
+                self._touch(entry_id)
+
+    def candidates(self, literals: list[list[str]] | None, params=None) -> tuple[array, list[str]]:
+        # (ids that may match, labels of the indexes that narrowed them).
+        # The name query goes through the trigrams (see
+        # trigrams.required_literals); size, date and extension filters of
+        # params through the sorted indexes. Selective answers are combined
+        # as bitmaps, the smallest first. The ids are taken under the lock;
+        # read them back with records(), which skips any removed since.
+        with self._lock:
+            alive = self.alive
+            length = len(alive)
+            answers = []
+            found = self.trigrams.candidates(literals)
+            if found is not None:
+                answers.append(('name', len(found), [found]))
+            if params is not None:
+                answers.extend(self.secondary().predicates(params))
+            answers = sorted((a for a in answers if a[1] <= self.live * SELECTIVE_FRACTION), key=lambda a: a[1])
+            if not answers:
+                return array('q', (i for i in range(length) if alive[i])), []
+            if len(answers) == 1 and answers[0][0] == 'name':
+                return array('q', (i for i in sorted(found) if alive[i])), ['name']
+            bitmap = None
+            for _, _, runs in answers:
+                mask = bitmap_of((i for run in runs for i in run), length)
+                bitmap = mask if bitmap is None else bitmap & mask
+                if not bitmap:
+                    break
+            return array('q', (i for i in iter_bitmap(bitmap, length) if alive[i])), [a[0] for a in answers]
+
+    def record(self, entry_id: int) -> tuple:
+        # (parent, name, is_dir, size, mtime, attrs), like FileIndex.iter_entries
+        with self._lock:
+            return (self.parents[entry_id], self.names[entry_id], bool(self.is_dir[entry_id]),
+                    self.sizes[entry_id], self.mtimes[entry_id], self.attrs[entry_id])
+
+    def records(self, ids) -> list[tuple]:
+        # record() of the ids still alive, read in one hold of the lock
+        with self._lock:
+            parents, names, is_dir, sizes, mtimes, attrs = (self.parents, self.names, self.is_dir, self.sizes,
+                                                            self.mtimes, self.attrs)
+            alive = self.alive
+            return [(parents[i], names[i], bool(is_dir[i]), sizes[i], mtimes[i], attrs[i]) for i in ids if alive[i]]
+
+
+_catalogs: dict[tuple[str, str], Catalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def loaded_catalog(index: FileIndex, root: str, rules: str = '') -> Catalog | None:
+    # The cached catalog of a root, only if it still matches the index
+    with _catalogs_lock:
+        catalog = _catalogs.get((index.path, root_key(root)))
+    if catalog is not None and not catalog.stale and catalog.crawled_at == index.crawled_at(root, rules):
+        return catalog
+    return None
+
+
+def catalog_for(index: FileIndex, root: str, rules: str = '') -> Catalog:
+    catalog = loaded_catalog(index, root, rules)
+    if catalog is None:
+        catalog = Catalog.load(index, root, rules)
+        with _catalogs_lock:
+            _catalogs[(index.path, root_key(root))] = catalog
+    return catalog
+
+
+def drop_catalog(index: FileIndex, root: str):
+    with _catalogs_lock:
+        _catalogs.pop((index.path, root_key(root)), None)
+
+
+def clear_catalogs():
+    with _catalogs_lock:
+        _catalogs.clear()
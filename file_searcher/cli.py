@@ -0,0 +1,194 @@
+﻿import io
+import os
+import sys
+import re
+import json
+import argparse
+from datetime import datetime
+
+# Imports that work both as package and as script
+try:
+    from .engine import SearchParams
+    from .export import FORMATS, ResultWriter
+    from .utils import parse_size
+    from .scheduling import ORDERS
+    from .ranking import TOP_KEYS
+    from .daemon import DaemonServer, make_engine, ping, stop_daemon
+except Exception:
+    from engine import SearchParams  # type: ignore
+    from export import FORMATS, ResultWriter  # type: ignore
+    from utils import parse_size  # type: ignore
+    from scheduling import ORDERS  # type: ignore
+    from ranking import TOP_KEYS  # type: ignore
+    from daemon import DaemonServer, make_engine, ping, stop_daemon  # type: ignore
+
+COMMANDS = ('search', 'daemon')
+
+
+def is_cli(argv: list[str]) -> bool:
+    return bool(argv) and argv[0] in COMMANDS
+
+
+def _split(values: list[str] | None) -> list[str]:
+    out: list[str] = []
+    for v in values or []:
+        out.extend(x.strip() for x in v.split(';') if x.strip())
+    return out
+
+
+def _date(text: str | None, end: bool = False) -> float | None:
+    if not text:
+        return None
+    dt = datetime.strptime(text, '%Y-%m-%d')
+    if end:
+        dt = dt.replace(hour=23, minute=59, second=59)
+    return dt.timestamp()
+
+
+def _size(text: str | None) -> int | None:
+    if not text:
+        return None
+    value = parse_size(text)
+    if value is None:
+        raise argparse.ArgumentTypeError(f"tamaño inválido: {text}")
+    return value
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m file_searcher')
+    sub = parser.add_subparsers(dest='command', required=True)
+    s = sub.add_parser('search', help="Buscar por nombre y escribir los resultados en stdout")
+    s.add_argument('pattern', help="Patrón de nombre ('' para todo; varios separados por ;)")
+    s.add_argument('roots', nargs='*', help="Carpetas raíz (por defecto la carpeta actual)")
+    s.add_argument('--mode', choices=['contains', 'startswith', 'endswith', 'equals'], default='contains')
+    s.add_argument('--case', action='store_true', help="Distinguir mayúsculas/minúsculas")
+    s.add_argument('--regex', action='store_true')
+    s.add_argument('--wildcard', action='store_true')
+    s.add_argument('--dirs', action='store_true', help="Incluir carpetas")
+    s.add_argument('--ext', action='append', help="Extensiones, ej: .pdf;.csv")
+    s.add_argument('--min-size', type=_size)
+    s.add_argument('--max-size', type=_size)
+    s.add_argument('--since', help="Modificado desde YYYY-MM-DD")
+    s.add_argument('--until', help="Modificado hasta YYYY-MM-DD")
+    s.add_argument('--exclude', action='append', help="Ruta a excluir (repetible)")
+    s.add_argument('--exclude-name', action='append', help="Nombres a excluir, ej: node_modules;.git")
+    s.add_argument('--exclude-system', action='store_true')
+    s.add_argument('--exclude-hidden', action='store_true')
+    s.add_argument('--exclude-offline', action='store_true')
+    s.add_argument('--content', help="Texto que deben contener los archivos")
+    s.add_argument('--content-regex', action='store_true', help="--content es una regex")
+    s.add_argument('--content-case', action='store_true', help="--content distingue mayúsculas/minúsculas")
+    s.add_argument('--all-hits', action='store_true', help="Todas las coincidencias por archivo, no solo la primera")
+    s.add_argument('--duplicates', action='store_true', help="Solo archivos duplicados, agrupados ('group')")
+    s.add_argument('--no-hash-cache', action='store_true', help="No usar ni guardar la caché de hashes")
+    s.add_argument('--index', action='store_true', help="Usar el índice en disco")
+    s.add_argument('--index-max-age', type=float, default=3600)
+    s.add_argument('--workers', type=int, default=None)
+    s.add_argument('--order', choices=ORDERS, default='dfs',
+                   help="Orden del recorrido: dfs (más rápido en total), bfs, deepening (por niveles) o priority "
+                        "(carpetas del usuario, recientes y con resultados previos primero)")
+    s.add_argument('--max-results', type=int, default=None, help="Detener la búsqueda tras N resultados")
+    s.add_argument('--top', type=int, default=None,
+                   help="Solo los N mayores según --top-by, ordenados, al terminar el recorrido")
+    s.add_argument('--top-by', choices=TOP_KEYS, default='size', help="size: más grandes; mtime: más recientes")
+    s.add_argument('--rollup', action='store_true',
+                   help="Uso de disco: una fila por carpeta con el total de los archivos que pasan los filtros")
+    s.add_argument('--format', choices=FORMATS, default='ndjson')
+    s.add_argument('--header', action='store_true', help="Encabezado en CSV/TSV")
+    s.add_argument('--formatted', action='store_true', help="Tamaños y fechas legibles en lugar de bytes y epoch")
+    s.add_argument('--progress', action='store_true', help="Progreso en stderr")
+    s.add_argument('--no-daemon', action='store_true', help="Buscar en este proceso aunque el servicio esté activo")
+    d = sub.add_parser('daemon', help="Servicio local que atiende las búsquedas de la ventana y la consola")
+    d.add_argument('--address', help="Socket Unix o named pipe (por defecto, uno por usuario)")
+    d.add_argument('--watch', action='store_true', help="Vigilar las raíces buscadas con índice y mantenerlo al día")
+    d.add_argument('--status', action='store_true', help="Mostrar el estado del servicio y salir")
+    d.add_argument('--stop', action='store_true', help="Detener el servicio y salir")
+    return parser
+
+
+def params_from_args(args) -> SearchParams:
+    exts = [e.lower() if e.startswith('.') else '.' + e.lower() for e in _split(args.ext)]
+    return SearchParams(args.pattern, args.mode, args.case, args.regex, args.wildcard, args.dirs,
+                        args.roots or [os.getcwd()],
+                        extensions=exts, min_size=args.min_size, max_size=args.max_size,
+                        date_from=_date(args.since), date_to=_date(args.until, end=True),
+                        exclude_system=args.exclude_system, exclude_hidden=args.exclude_hidden,
+                        exclude_offline=args.exclude_offline, excluded_paths=args.exclude or [],
+                        excluded_names=_split(args.exclude_name), use_index=args.index,
+                        index_max_age=args.index_max_age, workers=args.workers, traversal=args.order,
+                        max_results=args.max_results, top_k=args.top, top_by=args.top_by, rollup=args.rollup,
+                        content=args.content, content_regex=args.content_regex,
+                        content_case=args.content_case, content_all_hits=args.all_hits,
+                        find_duplicates=args.duplicates, hash_cache=not args.no_hash_cache)
+
+
+def _print_progress(p: dict):
+    sys.stderr.write(f"\r{p['dirs']} carpetas, {p['entries']} entradas, {p['matches']} resultados, "
+                     f"{p['entries_per_sec']:.0f}/s ")
+    if p.get('done'):
+        sys.stderr.write('\n')
+    sys.stderr.flush()
+
+
+def run_search(args, out) -> int:
+    try:
+        engine = make_engine(params_from_args(args), on_progress=_print_progress if args.progress else None,
+                             use_daemon=not args.no_daemon)
+    except re.error as e:
+        sys.stderr.write(f"Regex inválida: {e}\n")
+        return 2
+    writer = ResultWriter(out, args.format, formatted=args.formatted, header=args.header)
+    try:
+        for item in engine.iter_results():
+            writer.write((item,))
+        out.flush()
+    except BrokenPipeError:
+        # Reader went away (e.g. "| head"): stop quietly like other Unix tools
+        engine.cancel()
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 0
+    except KeyboardInterrupt:
+        engine.cancel()
+        return 130
+    return 0 if writer.rows else 1
+
+
+def run_daemon(args) -> int:
+    if args.status:
+        stats = ping(args.address)
+        if stats is None:
+            sys.stderr.write("El servicio no está en ejecución\n")
+            return 1
+        sys.stdout.write(json.dumps(stats) + '\n')
+        return 0
+    if args.stop:
+        return 0 if stop_daemon(args.address) else 1
+    server = DaemonServer(args.address, watch=args.watch, on_log=lambda text: sys.stderr.write(text + '\n'))
+    try:
+        server.serve_forever()
+    except RuntimeError as e:
+        sys.stderr.write(f"{e}\n")
+        return 1
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    # Paths that do not decode cleanly round-trip through surrogateescape
+    out = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='surrogateescape',
+                           newline='\n', line_buffering=False)
+    try:
+        if args.command == 'search':
+            return run_search(args, out)
+        if args.command == 'daemon':
+            return run_daemon(args)
+        return 2
+    finally:
+        try:
+            out.detach()
+        except Exception:
+            pass
+
@@ -0,0 +1,124 @@
+﻿import re
+import mmap
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+BINARY_PROBE = 8192
+MAX_HITS = 1000
+_LINE_CHUNK = 1 << 20
+
+
+def _count_newlines(view, start: int, end: int) -> int:
+    # Counted in bounded slices so a hit deep in a huge file never copies it whole
+    count = 0
+    while start < end:
+        stop = min(end, start + _LINE_CHUNK)
+        count += view[start:stop].count(b'\n')
+        start = stop
+    return count
+
+
+# Finds a literal or regex needle inside files through a read-only mmap, so
+# the regex engine scans the page cache in place instead of Python reading
+# the file into strings. Files with a NUL byte near the start are treated as
+# binary and skipped. Needles match as UTF-8 bytes; case folding applies to
+# ASCII letters only.
+class ContentMatcher:
+    def __init__(self, needle: str, use_regex: bool = False, match_case: bool = False, all_hits: bool = False,
+                 max_hits: int = MAX_HITS):
+        source = needle.encode('utf-8')
+        if not use_regex:
+            source = re.escape(source)
+        self.regex = re.compile(source, 0 if match_case else re.IGNORECASE)
+        self.all_hits = all_hits
+        self.max_hits = max_hits if all_hits else 1
+        self._lock = threading.Lock()
+        self.scanned = 0
+        self.matched = 0
+        self.binary = 0
+        self.errors = 0
+        self.bytes_scanned = 0
+
+    def scan(self, path: str) -> list[list[int]] | None:
+        # [line, offset] per hit (1-based line, byte offset), or None
+        try:
+            with open(path, 'rb') as f:
+                try:
+                    view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except ValueError:
+                    # Empty files cannot be mapped and cannot match
+                    return None
+                with view:
+                    if view.find(b'\x00', 0, BINARY_PROBE) != -1:
+                        with self._lock:
+                            self.binary += 1
+                        return None
+                    hits = self._hits(view)
+                    scanned = len(view) if not hits or self.all_hits else hits[0][1]
+        except OSError:
+            with self._lock:
+                self.errors += 1
+            return None
+        with self._lock:
+            self.scanned += 1
+            self.bytes_scanned += scanned
+            if hits:
+                self.matched += 1
+        return hits
+
+    def _hits(self, view) -> list[list[int]] | None:
+        hits: list[list[int]] = []
+        line, last = 1, 0
+        for m in self.regex.finditer(view):
+            offset = m.start()
+            line += _count_newlines(view, last, offset)
+            last = offset
+            hits.append([line, offset])
+            if len(hits) >= self.max_hits:
+                break
+        return hits or None
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                'scanned': self.scanned,
+                'matched': self.matched,
+                'binary': self.binary,
+                'errors': self.errors,
+                'bytes_scanned': self.bytes_scanned,
+            }
+
+
+# Runs ContentMatcher.scan on a bounded thread pool. submit() blocks once
+# workers * 4 files are waiting, so a fast walker cannot queue the whole
+# tree; items that match get their 'hits' and go to on_hit.
+class ContentPool:
+    def __init__(self, matcher: ContentMatcher, on_hit, workers: int, is_cancelled=None):
+        self.matcher = matcher
+        self._on_hit = on_hit
+        self._is_cancelled = is_cancelled or (lambda: False)
+        workers = max(1, int(workers))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='content')
+        self._slots = threading.BoundedSemaphore(workers * 4)
+
+    def submit(self, item: dict):
+        self._slots.acquire()
+        try:
+            self._executor.submit(self._scan, item)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _scan(self, item: dict):
+        try:
+            if self._is_cancelled():
+                return
+            hits = self.matcher.scan(item['path'])
+            if hits:
+                item['hits'] = hits
+                self._on_hit(item)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
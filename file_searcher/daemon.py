@@ -0,0 +1,517 @@
+﻿import os
+import json
+import getpass
+import inspect
+import threading
+from multiprocessing.connection import Listener, Client, AuthenticationError
+
+# Imports that work both as package and as script
+try:
+    from .engine import SearchParams, SearchEngine
+    from .cache import shared_cache, query_key
+    from .exclusions import ExclusionRules
+    from .watcher import Watcher, IndexSync
+    from .utils import app_data_dir
+except Exception:
+    from engine import SearchParams, SearchEngine  # type: ignore
+    from cache import shared_cache, query_key  # type: ignore
+    from exclusions import ExclusionRules  # type: ignore
+    from watcher import Watcher, IndexSync  # type: ignore
+    from utils import app_data_dir  # type: ignore
+
+# Bumped on any change to the frames; a client and a service that disagree
+# do not talk, the client searches in-process instead
+PROTOCOL = 2
+# Frames a search keeps after every client has read them, so an identical
+# query arriving late can still join it from the start
+REPLAY_FRAMES = 256
+# Frames the slowest client may have unread before the search waits for it
+MAX_BACKLOG = 1024
+_PARAM_NAMES = tuple(inspect.signature(SearchParams).parameters)
+_ITEM_KEYS = ('name', 'path', 'is_dir', 'size', 'mtime')
+
+
+def default_address() -> str:
+    # Per user by default; a service shared by every session of a terminal
+    # server is started with --address and found through FILE_SEARCHER_DAEMON
+    address = os.environ.get('FILE_SEARCHER_DAEMON')
+    if address:
+        return address
+    if os.name == 'nt':
+        return r'\\.\pipe\FileSearcherQt-' + getpass.getuser()
+    return os.path.join(app_data_dir(), 'daemon.sock')
+
+
+def _key_path() -> str:
+    return os.environ.get('FILE_SEARCHER_DAEMON_KEY') or os.path.join(app_data_dir(), 'daemon.key')
+
+
+def load_authkey(create: bool = False) -> bytes | None:
+    # Clients must present this key (multiprocessing's HMAC handshake); the
+    # file is only readable by its owner
+    path = _key_path()
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        if not create:
+            return None
+    key = os.urandom(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return key
+
+
+# Frames: one JSON object per Connection.send_bytes (length-prefixed by
+# multiprocessing). Results travel as pages of compact rows, see item_to_row.
+def encode(msg: dict) -> bytes:
+    return json.dumps(msg, separators=(',', ':'), ensure_ascii=False, default=str).encode('utf-8', 'surrogatepass')
+
+
+def decode(data: bytes) -> dict:
+    return json.loads(data.decode('utf-8', 'surrogatepass'))
+
+
+def params_to_dict(params: SearchParams) -> dict:
+    return {name: getattr(params, name) for name in _PARAM_NAMES}
+
+
+def params_from_dict(data: dict) -> SearchParams:
+    return SearchParams(**{k: v for k, v in data.items() if k in _PARAM_NAMES})
+
+
+def item_to_row(item: dict) -> list:
+    # [path, is_dir, size, mtime] plus a dict of any extra keys (hits, group, digest)
+    row = [item['path'], 1 if item['is_dir'] else 0, item['size'], item['mtime']]
+    extra = {k: v for k, v in item.items() if k not in _ITEM_KEYS}
+    if extra:
+        row.append(extra)
+    return row
+
+
+def row_to_item(row: list) -> dict:
+    path = row[0]
+    item = {'name': os.path.basename(path), 'path': path, 'is_dir': bool(row[1]), 'size': row[2], 'mtime': row[3]}
+    if len(row) > 4:
+        item.update(row[4])
+    return item
+
+
+def engine_stats(engine: SearchEngine) -> dict:
+    return {'progress': engine.progress_stats, 'walk': engine.walk_stats, 'refresh': engine.refresh_stats,
+            'index': engine.index_stats, 'syscalls': engine.syscall_stats, 'delivery': engine.delivery_stats,
+            'cache': engine.cache_stats, 'content': engine.content_stats, 'duplicates': engine.duplicate_stats}
+
+
+def _flight_key(params: SearchParams) -> str:
+    extra = {f: getattr(params, f) for f in ('use_index', 'index_max_age', 'find_duplicates', 'hash_cache',
+                                             'use_cache', 'cache_revalidate')}
+    return query_key(params) + json.dumps(extra, sort_keys=True)
+
+
+# One running search and the frames it has sent that are still needed.
+# Each client reading it has a position; frames every client has read are
+# dropped once more than REPLAY_FRAMES are held, and push() waits while the
+# slowest client is MAX_BACKLOG frames behind, so memory stays bounded
+# however large the answer. An identical query that arrives while nothing
+# has been dropped yet joins it instead of walking again: it gets the
+# frames already sent, then the rest as they come.
+class _Flight:
+    def __init__(self, key: str):
+        self.key = key
+        self.frames: list[bytes] = []
+        # Position of frames[0] in the whole stream
+        self.base = 0
+        self.progress: bytes | None = None
+        self.progress_seq = 0
+        self.done: bytes | None = None
+        self.subscribers = 0
+        self.engine: SearchEngine | None = None
+        self._positions: dict[int, int] = {}
+        self._next_reader = 0
+        self._cond = threading.Condition()
+
+    def join(self) -> int | None:
+        # A reader id, or None once the start of the stream is gone
+        with self._cond:
+            if self.base:
+                return None
+            self._next_reader += 1
+            self._positions[self._next_reader] = 0
+            return self._next_reader
+
+    def leave(self, reader: int):
+        with self._cond:
+            self._positions.pop(reader, None)
+            self._trim()
+            self._cond.notify_all()
+
+    def _trim(self):
+        # Called with the condition held
+        end = self.base + len(self.frames)
+        low = min(self._positions.values(), default=end)
+        drop = min(low - self.base, len(self.frames) - REPLAY_FRAMES)
+        if drop > 0:
+            del self.frames[:drop]
+            self.base += drop
+
+    def push(self, msg: dict):
+        frame = encode(msg)
+        with self._cond:
+            while self._positions and self.base + len(self.frames) - min(self._positions.values()) >= MAX_BACKLOG:
+                self._cond.wait(0.2)
+            self.frames.append(frame)
+            self._cond.notify_all()
+
+    def set_progress(self, snapshot: dict):
+        frame = encode({'t': 'progress', 'progress': snapshot})
+        with self._cond:
+            self.progress = frame
+            self.progress_seq += 1
+            self._cond.notify_all()
+
+    def finish(self, msg: dict):
+        with self._cond:
+            self.done = encode(msg)
+            self._cond.notify_all()
+
+    def wait(self, reader: int, seq: int, timeout: float):
+        with self._cond:
+            pos = self._positions[reader]
+            if pos == self.base + len(self.frames) and seq == self.progress_seq and self.done is None:
+                self._cond.wait(timeout)
+            frames = self.frames[pos - self.base:]
+            self._positions[reader] = pos + len(frames)
+            self._trim()
+            self._cond.notify_all()
+            progress = self.progress if seq != self.progress_seq else None
+            return frames, progress, self.progress_seq, self.done
+
+
+# The long-running service: one process owns the query cache, the loaded
+# catalogs and (with watch) the watchers, and answers every client from
+# them. Each client connection gets a thread.
+class DaemonServer:
+    def __init__(self, address: str | None = None, authkey: bytes | None = None, watch: bool = False,
+                 on_log=None):
+        self.address = address or default_address()
+        self._authkey = authkey or load_authkey(create=True)
+        self.watch = watch
+        self.on_log = on_log or (lambda text: None)
+        self._lock = threading.Lock()
+        self._flights: dict[str, _Flight] = {}
+        self._watchers: dict[str, Watcher] = {}
+        self._clients = 0
+        self._searches = 0
+        self._shared = 0
+        self._stopping = False
+        self._listener: Listener | None = None
+
+    def _listen(self) -> Listener:
+        # A second named pipe server would just add instances to the first one's pipe
+        if ping(self.address, self._authkey) is not None:
+            raise RuntimeError(f"Ya hay un servicio en {self.address}")
+        if os.name != 'nt' and os.path.exists(self.address):
+            os.unlink(self.address)
+        old = os.umask(0o077) if os.name != 'nt' else None
+        try:
+            return Listener(self.address, authkey=self._authkey)
+        finally:
+            if old is not None:
+                os.umask(old)
+
+    def serve_forever(self):
+        self._listener = self._listen()
+        self.on_log(f"Servicio escuchando en {self.address} (pid {os.getpid()})")
+        try:
+            while not self._stopping:
+                try:
+                    conn = self._listener.accept()
+                except (OSError, EOFError, AuthenticationError):
+                    continue
+                if self._stopping:
+                    conn.close()
+                    break
+                threading.Thread(target=self._serve_client, args=(conn,), name='daemon-client', daemon=True).start()
+        finally:
+            self._listener.close()
+            for watcher in self._watchers.values():
+                watcher.stop(wait=False)
+            if os.name != 'nt':
+                try:
+                    os.unlink(self.address)
+                except OSError:
+                    pass
+
+    def shutdown(self):
+        self._stopping = True
+        with self._lock:
+            for flight in self._flights.values():
+                if flight.engine is not None:
+                    flight.engine.cancel()
+        # accept() only returns for a connection: make one
+        try:
+            Client(self.address, authkey=self._authkey).close()
+        except (OSError, EOFError, AuthenticationError):
+            pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'pid': os.getpid(), 'clients': self._clients, 'searches': self._searches,
+                    'shared': self._shared, 'running': len(self._flights), 'watchers': len(self._watchers),
+                    'cache': shared_cache().as_dict()}
+
+    def _serve_client(self, conn):
+        with self._lock:
+            self._clients += 1
+        try:
+            while True:
+                msg = decode(conn.recv_bytes())
+                op = msg.get('op')
+                if op == 'hello':
+                    conn.send_bytes(encode({'t': 'hello', 'protocol': PROTOCOL, 'pid': os.getpid()}))
+                elif op == 'search':
+                    self._search(conn, msg)
+                elif op == 'stats':
+                    conn.send_bytes(encode({'t': 'stats', 'stats': self.stats()}))
+                elif op == 'shutdown':
+                    conn.send_bytes(encode({'t': 'bye'}))
+                    self.shutdown()
+                    return
+                else:
+                    conn.send_bytes(encode({'t': 'error', 'message': f"operación desconocida: {op}"}))
+        except (EOFError, OSError, ValueError):
+            pass
+        finally:
+            with self._lock:
+                self._clients -= 1
+            conn.close()
+
+    def _search(self, conn, msg: dict):
+        try:
+            params = params_from_dict(msg['params'])
+            candidate = _Flight(_flight_key(params))
+            candidate.engine = SearchEngine(
+                params, on_batch=lambda items: candidate.push({'t': 'page', 'rows': [item_to_row(i) for i in items]}),
+                on_status=lambda text: candidate.push({'t': 'status', 'text': text}),
+                on_progress=candidate.set_progress,
+                cache=shared_cache() if params.use_cache else None,
+                on_removed=lambda items: candidate.push({'t': 'removed', 'rows': [item_to_row(i) for i in items]}))
+        except Exception as e:
+            conn.send_bytes(encode({'t': 'error', 'message': str(e)}))
+            return
+        with self._lock:
+            self._searches += 1
+            flight = self._flights.get(candidate.key)
+            reader = flight.join() if flight is not None else None
+            if reader is None:
+                flight = self._flights[candidate.key] = candidate
+                reader = flight.join()
+                threading.Thread(target=self._run_flight, args=(flight, params), name='daemon-search',
+                                 daemon=True).start()
+            else:
+                self._shared += 1
+            flight.subscribers += 1
+        try:
+            self._stream(conn, flight, reader)
+        finally:
+            self._leave(flight, reader)
+
+    def _stream(self, conn, flight: _Flight, reader: int):
+        seq = 0
+        while True:
+            frames, progress, seq, done = flight.wait(reader, seq, 0.2)
+            for frame in frames:
+                conn.send_bytes(frame)
+            if progress is not None and done is None:
+                conn.send_bytes(progress)
+            if done is not None:
+                # finish() comes after the last push, so nothing is left behind
+                conn.send_bytes(done)
+                return
+            if conn.poll():
+                if decode(conn.recv_bytes()).get('op') == 'cancel':
+                    conn.send_bytes(encode({'t': 'done', 'cancelled': True, 'stats': {}}))
+                    return
+
+    def _leave(self, flight: _Flight, reader: int):
+        flight.leave(reader)
+        with self._lock:
+            flight.subscribers -= 1
+            if flight.subscribers <= 0 and flight.done is None and flight.engine is not None:
+                # Nobody is listening any more
+                flight.engine.cancel()
+
+    def _run_flight(self, flight: _Flight, params: SearchParams):
+        engine = flight.engine
+        error = None
+        try:
+            engine.run()
+        except Exception as e:
+            error = str(e)
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        flight.finish({'t': 'done', 'cancelled': engine.cancelled, 'limit_reached': engine.limit_reached,
+                       'error': error, 'stats': engine_stats(engine)})
+        if self.watch and params.use_index and not engine.cancelled and error is None:
+            self._watch_roots(params)
+
+    def _watch_roots(self, params: SearchParams):
+        # Keeps the index and catalogs of searched roots current between queries
+        rules = ExclusionRules(params.excluded_paths, params.excluded_names, params.exclude_system, params.roots)
+        key = json.dumps([sorted(params.roots), rules.signature])
+        with self._lock:
+            if key in self._watchers or self._stopping:
+                return
+            sync = IndexSync(params.roots, rules)
+            watcher = self._watchers[key] = Watcher(params.roots, sync.apply, rules, on_status=self.on_log,
+                                                    since=sync.since())
+        watcher.start()
+        self.on_log(f"Vigilando {', '.join(params.roots)}")
+
+
+def connect(address: str | None = None, authkey: bytes | None = None):
+    # A connection to the running service, or None (no service, other user's
+    # key, FILE_SEARCHER_NO_DAEMON set) so the caller searches in-process
+    if os.environ.get('FILE_SEARCHER_NO_DAEMON'):
+        return None
+    address = address or default_address()
+    if os.name != 'nt' and not os.path.exists(address):
+        return None
+    key = authkey or load_authkey()
+    if key is None:
+        return None
+    try:
+        return Client(address, authkey=key)
+    except (OSError, EOFError, AuthenticationError, ValueError):
+        return None
+
+
+def request(conn, msg: dict) -> dict:
+    conn.send_bytes(encode(msg))
+    return decode(conn.recv_bytes())
+
+
+def _speaks_protocol(conn) -> bool:
+    # An older or newer service answers with another version (or an error frame)
+    try:
+        return request(conn, {'op': 'hello'}).get('protocol') == PROTOCOL
+    except (EOFError, OSError, ValueError):
+        return False
+
+
+def ping(address: str | None = None, authkey: bytes | None = None) -> dict | None:
+    conn = connect(address, authkey)
+    if conn is None:
+        return None
+    try:
+        return request(conn, {'op': 'stats'}).get('stats')
+    except (EOFError, OSError):
+        return None
+    finally:
+        conn.close()
+
+
+def stop_daemon(address: str | None = None) -> bool:
+    conn = connect(address)
+    if conn is None:
+        return False
+    try:
+        request(conn, {'op': 'shutdown'})
+        return True
+    except (EOFError, OSError):
+        return False
+    finally:
+        conn.close()
+
+
+# SearchEngine whose work happens in the service: run() sends the query and
+# replays the frames it gets back through the same callbacks, so
+# SearchThread, iter_results() and the CLI work unchanged. The constructor
+# still validates the parameters (an invalid content regex raises here).
+class RemoteEngine(SearchEngine):
+    def __init__(self, params: SearchParams, conn, on_batch=None, on_status=None, on_progress=None,
+                 on_removed=None):
+        super().__init__(params, on_batch, on_status, on_progress, on_removed=on_removed)
+        self._conn = conn
+        self.remote_stats: dict = {}
+
+    @property
+    def syscall_stats(self) -> dict:
+        return self.remote_stats.get('syscalls', {})
+
+    @property
+    def delivery_stats(self) -> dict:
+        return self.remote_stats.get('delivery', {})
+
+    @property
+    def progress_stats(self) -> dict:
+        return self.remote_stats.get('progress', {})
+
+    @property
+    def content_stats(self) -> dict:
+        return self.remote_stats.get('content', {})
+
+    def run(self):
+        conn = self._conn
+        try:
+            conn.send_bytes(encode({'op': 'search', 'params': params_to_dict(self.params)}))
+            cancel_sent = False
+            while True:
+                if self._cancel and not cancel_sent:
+                    conn.send_bytes(encode({'op': 'cancel'}))
+                    cancel_sent = True
+                if not conn.poll(0.1):
+                    continue
+                msg = decode(conn.recv_bytes())
+                kind = msg.get('t')
+                if kind == 'page':
+                    self.on_batch([row_to_item(r) for r in msg['rows']])
+                elif kind == 'status':
+                    self.on_status(msg['text'])
+                elif kind == 'progress':
+                    self.on_progress(msg['progress'])
+                elif kind == 'removed':
+                    self.on_removed([row_to_item(r) for r in msg['rows']])
+                elif kind == 'error':
+                    self._cancel = True
+                    self._status(f"Servicio de búsqueda: {msg.get('message')}")
+                    return
+                elif kind == 'done':
+                    self._finish(msg)
+                    return
+        except (EOFError, OSError):
+            self._cancel = True
+            self._status("Se perdió la conexión con el servicio de búsqueda")
+        finally:
+            conn.close()
+
+    def _finish(self, msg: dict):
+        stats = self.remote_stats = msg.get('stats') or {}
+        self._cancel = self._cancel or bool(msg.get('cancelled'))
+        self.limit_reached = bool(msg.get('limit_reached'))
+        self.walk_stats = stats.get('walk', {})
+        self.refresh_stats = stats.get('refresh', {})
+        self.index_stats = stats.get('index', {})
+        self.cache_stats = stats.get('cache', {})
+        self.duplicate_stats = stats.get('duplicates', {})
+        if msg.get('error'):
+            self._status(f"Servicio de búsqueda: {msg['error']}")
+
+
+def make_engine(params: SearchParams, on_batch=None, on_status=None, on_progress=None, cache=None,
+                on_removed=None, use_daemon: bool = True) -> SearchEngine:
+    # The service's engine when one is running, else a local one
+    conn = connect() if use_daemon else None
+    if conn is not None and not _speaks_protocol(conn):
+        conn.close()
+        conn = None
+    if conn is not None:
+        try:
+            return RemoteEngine(params, conn, on_batch, on_status, on_progress, on_removed)
+        except Exception:
+            conn.close()
+            raise
+    return SearchEngine(params, on_batch, on_status, on_progress, cache=cache, on_removed=on_removed)
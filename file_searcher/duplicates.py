@@ -0,0 +1,214 @@
+﻿import os
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Imports that work both as package and as script
+try:
+    from .utils import app_data_dir
+    from .traversal import default_workers
+except Exception:
+    from utils import app_data_dir  # type: ignore
+    from traversal import default_workers  # type: ignore
+
+PARTIAL_BLOCK = 64 * 1024
+READ_CHUNK = 1 << 20
+PARTIAL, FULL = 'partial', 'full'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    path TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (path, kind)
+);
+"""
+
+_BATCH = 1000
+
+
+def default_hash_cache_path() -> str:
+    return os.path.join(app_data_dir(), 'hashes.sqlite')
+
+
+def partial_digest(path: str, size: int, block: int = PARTIAL_BLOCK) -> str:
+    # First and last block: cheap to read and enough to split most same-size files
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        h.update(f.read(block))
+        if size > block:
+            f.seek(max(block, size - block))
+            h.update(f.read(block))
+    return h.hexdigest()
+
+
+def full_digest(path: str, is_cancelled=None, chunk: int = READ_CHUNK) -> str | None:
+    h = hashlib.blake2b(digest_size=32)
+    buf = bytearray(chunk)
+    view = memoryview(buf)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            if is_cancelled and is_cancelled():
+                return None
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.hexdigest()
+
+
+# Digests remembered per (path, size, mtime): a file that has not changed
+# since the last run is never read again
+class HashCache:
+    def __init__(self, path: str | None = None):
+        self.path = path or default_hash_cache_path()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        self._pending: list[tuple] = []
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: str, kind: str, size: int, mtime: float) -> str | None:
+        with self._lock:
+            row = self._conn.execute('SELECT size, mtime, digest FROM hashes WHERE path = ? AND kind = ?',
+                                     (path, kind)).fetchone()
+            if row and row[0] == size and row[1] == mtime:
+                self.hits += 1
+                return row[2]
+            self.misses += 1
+        return None
+
+    def put(self, path: str, kind: str, size: int, mtime: float, digest: str):
+        with self._lock:
+            self._pending.append((path, kind, size, mtime, digest))
+            if len(self._pending) >= _BATCH:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        rows, self._pending = self._pending, []
+        if rows:
+            self._conn.execute('BEGIN')
+            self._conn.executemany('INSERT OR REPLACE INTO hashes (path, kind, size, mtime, digest) '
+                                   'VALUES (?, ?, ?, ?, ?)', rows)
+            self._conn.execute('COMMIT')
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+
+# Finds identical files among result items (name, path, size, mtime) in
+# stages, each one reading only what the previous one could not rule out:
+# unique sizes are dropped without I/O, then same-size files are compared
+# by a hash of their first and last blocks, and only files that still
+# collide are hashed in full. Hashing runs on a thread pool (hashlib
+# releases the GIL on large buffers).
+class DuplicateFinder:
+    def __init__(self, workers: int | None = None, cache: HashCache | None = None, min_size: int = 1,
+                 is_cancelled=None, on_status=None):
+        self.workers = workers or default_workers()
+        self.cache = cache
+        self.min_size = max(1, min_size)
+        self._is_cancelled = is_cancelled or (lambda: False)
+        self._status = on_status or (lambda _text: None)
+        self._by_size: dict[int, list[dict]] = {}
+        self.files = 0
+        self.partial_hashed = 0
+        self.full_hashed = 0
+        self.bytes_hashed = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def add(self, item: dict):
+        if item['is_dir'] or item['size'] < self.min_size:
+            return
+        self.files += 1
+        self._by_size.setdefault(item['size'], []).append(item)
+
+    def _digest(self, item: dict, kind: str) -> str | None:
+        path, size, mtime = item['path'], item['size'], item['mtime']
+        if self.cache is not None:
+            digest = self.cache.get(path, kind, size, mtime)
+            if digest is not None:
+                return digest
+        try:
+            if kind == PARTIAL:
+                digest = partial_digest(path, size)
+                read = min(size, 2 * PARTIAL_BLOCK)
+            else:
+                digest = full_digest(path, self._is_cancelled)
+                read = size
+        except OSError:
+            with self._lock:
+                self.errors += 1
+            return None
+        if digest is None:
+            return None
+        with self._lock:
+            self.bytes_hashed += read
+            if kind == PARTIAL:
+                self.partial_hashed += 1
+            else:
+                self.full_hashed += 1
+        if self.cache is not None:
+            self.cache.put(path, kind, size, mtime, digest)
+        return digest
+
+    def _split(self, groups: list[list[dict]], kind: str) -> list[list[dict]]:
+        items = [item for group in groups for item in group]
+        out: list[list[dict]] = []
+        if not items:
+            return out
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f'hash-{kind}') as pool:
+            digests = list(pool.map(lambda it: self._digest(it, kind), items))
+        buckets: dict[tuple, list[dict]] = {}
+        for item, digest in zip(items, digests):
+            if digest is not None:
+                item['digest'] = digest
+                buckets.setdefault((item['size'], digest), []).append(item)
+        for group in buckets.values():
+            if len(group) > 1:
+                out.append(group)
+        return out
+
+    def run(self) -> list[list[dict]]:
+        # Groups of identical files, the most wasted space first
+        groups = [g for g in self._by_size.values() if len(g) > 1]
+        self._by_size = {}
+        self._status(f"Duplicados: {sum(map(len, groups))} de {self.files} archivos comparten tamaño")
+        # Files no bigger than the two partial blocks are already fully read by the partial pass
+        small = [g for g in groups if g[0]['size'] <= 2 * PARTIAL_BLOCK]
+        large = [g for g in groups if g[0]['size'] > 2 * PARTIAL_BLOCK]
+        result = self._split(small, FULL) if not self._is_cancelled() else []
+        if large and not self._is_cancelled():
+            large = self._split(large, PARTIAL)
+            self._status(f"Duplicados: {sum(map(len, large))} archivos grandes coinciden en el hash parcial")
+        if large and not self._is_cancelled():
+            result += self._split(large, FULL)
+        if self.cache is not None:
+            self.cache.flush()
+        if self._is_cancelled():
+            return []
+        result.sort(key=lambda g: g[0]['size'] * (len(g) - 1), reverse=True)
+        return result
+
+    def as_dict(self) -> dict:
+        return {
+            'files': self.files,
+            'partial_hashed': self.partial_hashed,
+            'full_hashed': self.full_hashed,
+            'bytes_hashed': self.bytes_hashed,
+            'errors': self.errors,
+            'cache_hits': self.cache.hits if self.cache is not None else 0,
+        }
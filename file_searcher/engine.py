@@ -0,0 +1,659 @@
+﻿import os
+import queue
+import threading
+
+# Imports that work both as package and as script
+try:
+    from .utils import attributes_from_stat, human_size
+    from .index import FileIndex
+    from .filters import FilterPlan
+    from .matchers import compile_name_matcher
+    from .exclusions import ExclusionRules
+    from .batching import ResultBatcher
+    from .content import ContentMatcher, ContentPool
+    from .duplicates import DuplicateFinder, HashCache
+    from .cache import CachedQuery, folder_mtimes, query_key
+    from .resultstore import ResultStore
+    from .catalog import catalog_for, loaded_catalog, drop_catalog, READ_CHUNK
+    from .trigrams import required_literals
+    from .progress import ProgressTracker, load_previous_total, save_total, totals_key
+    from .traversal import ParallelWalker, default_workers
+    from .scheduling import HITS_PER_SEARCH, make_order, save_hit_dirs, uses_hit_dirs
+    from .ranking import TopK, TOP_LABELS
+    from .usage import UsageTree
+except Exception:
+    from utils import attributes_from_stat, human_size  # type: ignore
+    from index import FileIndex  # type: ignore
+    from filters import FilterPlan  # type: ignore
+    from matchers import compile_name_matcher  # type: ignore
+    from exclusions import ExclusionRules  # type: ignore
+    from batching import ResultBatcher  # type: ignore
+    from content import ContentMatcher, ContentPool  # type: ignore
+    from duplicates import DuplicateFinder, HashCache  # type: ignore
+    from cache import CachedQuery, folder_mtimes, query_key  # type: ignore
+    from resultstore import ResultStore  # type: ignore
+    from catalog import catalog_for, loaded_catalog, drop_catalog, READ_CHUNK  # type: ignore
+    from trigrams import required_literals  # type: ignore
+    from progress import ProgressTracker, load_previous_total, save_total, totals_key  # type: ignore
+    from traversal import ParallelWalker, default_workers  # type: ignore
+    from scheduling import HITS_PER_SEARCH, make_order, save_hit_dirs, uses_hit_dirs  # type: ignore
+    from ranking import TopK, TOP_LABELS  # type: ignore
+    from usage import UsageTree  # type: ignore
+
+
+def _ignore(*_):
+    pass
+
+
+class SearchParams:
+    def __init__(self, pattern: str, mode: str, match_case: bool, use_regex: bool, use_wildcard: bool,
+                 include_dirs: bool, roots,
+                 extensions=None, min_size=None, max_size=None,
+                 date_from=None, date_to=None,
+                 exclude_system=False, exclude_hidden=False, exclude_offline=False, excluded_paths=None,
+                 excluded_names=None, use_index=False, index_max_age=3600, incremental_refresh=True, workers=None,
+                 batch_size=2000, batch_latency=0.05, progress_interval=0.1,
+                 content=None, content_regex=False, content_case=False, content_all_hits=False,
+                 find_duplicates=False, hash_cache=True, use_cache=False, cache_revalidate=True,
+                 traversal='dfs', max_results=None, top_k=None, top_by='size', rollup=False):
+        self.pattern = pattern
+        self.mode = mode
+        self.match_case = match_case
+        self.use_regex = use_regex
+        self.use_wildcard = use_wildcard
+        self.include_dirs = include_dirs
+        self.roots = [os.path.abspath(r) for r in roots]
+        self.extensions = [e.lower() for e in (extensions or []) if e]
+        self.min_size = min_size
+        self.max_size = max_size
+        self.date_from = date_from
+        self.date_to = date_to
+        self.exclude_system = exclude_system
+        self.exclude_hidden = exclude_hidden
+        self.exclude_offline = exclude_offline
+        self.excluded_paths = [os.path.normcase(os.path.abspath(p)) for p in (excluded_paths or [])]
+        # Folder/file name globs (node_modules, .git, *.tmp.d) pruned during the walk
+        self.excluded_names = [n.strip() for n in (excluded_names or []) if n and n.strip()]
+        # Answer from the on-disk index when it is younger than index_max_age seconds
+        self.use_index = use_index
+        self.index_max_age = index_max_age
+        # A stale index is patched by rescanning only folders whose mtime changed
+        self.incremental_refresh = incremental_refresh
+        self.workers = workers or default_workers()
+        # Order in which folders are listed (scheduling.ORDERS); changes when results show up, not which
+        self.traversal = traversal
+        # Stop the walk after max_results results; or keep only the top_k largest/newest (top_by
+        # 'size'/'mtime') and send them, ranked, when the walk ends. Neither applies to duplicates.
+        self.max_results = max_results or None
+        self.top_k = top_k or None
+        self.top_by = top_by
+        # Disk usage instead of a result list: matching files are summed per folder and one
+        # record per folder (usage.UsageTree) is sent at the end; limits and duplicates do not apply
+        self.rollup = rollup
+        self.batch_size = batch_size
+        self.batch_latency = batch_latency
+        self.progress_interval = progress_interval
+        # Text (or regex) the files must contain; checked after every other filter
+        self.content = content or None
+        self.content_regex = content_regex
+        self.content_case = content_case
+        self.content_all_hits = content_all_hits
+        # Report only files with an identical twin, grouped ('group', 'digest' keys)
+        self.find_duplicates = find_duplicates
+        self.hash_cache = hash_cache
+        # Serve a repeated query from cache.QueryCache, then walk again and send only the differences
+        self.use_cache = use_cache
+        self.cache_revalidate = cache_revalidate
+
+
+
+# The search itself, free of Qt: results go to on_batch(list of dicts) in
+# chunks, messages to on_status(str) and throttled counters to
+# on_progress(dict). run() blocks until the walk ends or cancel() is called;
+# iter_results() runs it in the background and yields result dicts. With a
+# cache and params.use_cache, results that a revalidation finds gone or
+# changed are withdrawn through on_removed(list of the old dicts).
+class SearchEngine:
+    def __init__(self, params: SearchParams, on_batch=None, on_status=None, on_progress=None,
+                 cache=None, on_removed=None):
+        self.params = params
+        self.on_batch = on_batch or _ignore
+        self.on_status = on_status or _ignore
+        self.on_progress = on_progress or _ignore
+        self.on_removed = on_removed or _ignore
+        self._cancel = False
+        self._dup_lock = threading.Lock()
+        self.refresh_stats: dict[str, int] = {}
+        self.index_stats: dict = {}
+        self.walk_stats: dict = {}
+
+        self._name_matches = compile_name_matcher(params.pattern, params.mode, params.match_case,
+                                                  params.use_regex, params.use_wildcard)
+        self._plan = FilterPlan(self.params, self._name_matches)
+        # Literals every matching name contains, used to narrow index lookups by trigram
+        self._literals = required_literals(params.pattern, params.use_regex, params.use_wildcard)
+        self._batcher = ResultBatcher(self._deliver, params.batch_size, params.batch_latency)
+        self._rules = ExclusionRules(params.excluded_paths, params.excluded_names, params.exclude_system, params.roots)
+        self._totals_key = totals_key(params.roots, self._rules.signature)
+        # Entries under the roots, saved for the next run's ETA: the walk's
+        # count for crawled roots, the catalog's for roots answered by the index
+        self._root_entries = 0
+        self._progress = ProgressTracker(self._report, params.progress_interval)
+        self._content = None
+        if params.content:
+            self._content = ContentMatcher(params.content, params.content_regex, params.content_case,
+                                           params.content_all_hits)
+        self._pool: ContentPool | None = None
+        self._duplicates: DuplicateFinder | None = None
+        self.duplicate_stats: dict = {}
+        self._usage = UsageTree(params.roots) if params.rollup else None
+        self._top: TopK | None = None
+        self._limit: int | None = None
+        if not params.find_duplicates and self._usage is None:
+            if params.top_k:
+                self._top = TopK(params.top_k, params.top_by)
+            elif params.max_results:
+                self._limit = int(params.max_results)
+        self._limit_lock = threading.Lock()
+        self._delivered = 0
+        self.limit_reached = False
+        # Duplicate groups are only meaningful as a whole, so they are not cached; nor are
+        # truncated or ranked answers, which a revalidation could not patch row by row
+        self.cache = (cache if params.use_cache and not params.find_duplicates and self._top is None
+                      and self._limit is None and self._usage is None else None)
+        self._cache_key = query_key(params) if self.cache is not None else None
+        self._collected: ResultStore | None = ResultStore() if self.cache is not None else None
+        self._collect_lock = threading.Lock()
+        self._known: dict | None = None
+        self._known_items: list = []
+        self.cache_stats: dict = {}
+        # Folders that held matches, remembered when the traversal order learns from them
+        self._hit_dirs: set[str] | None = set() if uses_hit_dirs(params.traversal) else None
+        self._order = None
+
+    @property
+    def syscall_stats(self) -> dict:
+        return self._plan.counters.as_dict()
+
+    @property
+    def delivery_stats(self) -> dict:
+        return self._batcher.as_dict()
+
+    @property
+    def progress_stats(self) -> dict:
+        return self._progress.snapshot()
+
+    @property
+    def content_stats(self) -> dict:
+        return self._content.as_dict() if self._content is not None else {}
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel
+
+    def cancel(self):
+        self._cancel = True
+
+    def _deliver(self, items: list):
+        self.on_batch(items)
+
+    def _status(self, text: str):
+        self.on_status(text)
+
+    def _report(self, snapshot: dict):
+        self.on_progress(snapshot)
+
+    def iter_results(self):
+        batches: queue.Queue = queue.Queue(maxsize=16)
+        done = object()
+        self.on_batch = batches.put
+
+        def work():
+            try:
+                self.run()
+            finally:
+                batches.put(done)
+
+        worker = threading.Thread(target=work, name='search-engine', daemon=True)
+        worker.start()
+        try:
+            while True:
+                batch = batches.get()
+                if batch is done:
+                    break
+                yield from batch
+        finally:
+            # Consumer stopped early: cancel and drain so the worker is not left blocked on put()
+            self.cancel()
+            while worker.is_alive():
+                try:
+                    batches.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            worker.join()
+
+    def run(self):
+        self._progress.expected_entries = load_previous_total(self._totals_key)
+        index = None
+        if self._content is not None:
+            self._pool = ContentPool(self._content, self._deliver_item, self.params.workers, lambda: self._cancel)
+        if self.params.find_duplicates and self._usage is None:
+            self._duplicates = DuplicateFinder(self.params.workers, is_cancelled=lambda: self._cancel,
+                                               on_status=self._status)
+        walked = False
+        try:
+            if self.cache is not None:
+                cached = self.cache.get(self._cache_key)
+                if cached is not None:
+                    self._serve_cached(cached)
+                    if not self.params.cache_revalidate:
+                        return
+            walked = True
+            if self.params.use_index:
+                try:
+                    index = FileIndex()
+                except Exception:
+                    index = None
+            rules = self._rules.signature
+            to_crawl: list[str] = []
+            for root in self.params.roots:
+                if self._cancel:
+                    break
+                if self._rules.trie.covers(root):
+                    continue
+                if index is not None and index.is_fresh(root, self.params.index_max_age, rules):
+                    self._search_index(index, root)
+                elif (index is not None and self.params.incremental_refresh
+                      and index.crawled_at(root, rules) is not None):
+                    if self._refresh_root(index, root):
+                        self._search_index(index, root)
+                else:
+                    to_crawl.append(root)
+            if to_crawl and not self._cancel:
+                self._crawl(to_crawl, index)
+        except BaseException:
+            # A failed search is treated as cancelled: nothing of it is cached or remembered
+            self._cancel = True
+            raise
+        finally:
+            if index is not None:
+                index.close()
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
+                stats = self._content.as_dict()
+                self._status(f"Contenido: {stats['matched']} de {stats['scanned']} archivos leídos, "
+                             f"{stats['binary']} binarios omitidos")
+            if self._duplicates is not None:
+                self._report_duplicates()
+            if self._top is not None:
+                self._report_top()
+            if self._usage is not None:
+                self._report_usage()
+            self._batcher.close()
+            if walked and not self._cancel and self.cache is not None:
+                self._store_in_cache()
+            self._progress.finish()
+            if walked and not self._cancel:
+                save_total(self._totals_key, self._root_entries)
+                if self._hit_dirs:
+                    save_hit_dirs(list(self._hit_dirs)[:HITS_PER_SEARCH])
+
+    def _serve_cached(self, cached: CachedQuery):
+        # Hits in folders whose listing changed are re-checked before anything is shown
+        changed = cached.changed_dirs()
+        items = cached.items
+        if changed:
+            items = [it for it in (self._recheck(it) if os.path.dirname(it['path']) in changed else it
+                                   for it in items) if it is not None]
+            self.cache.put(self._cache_key, CachedQuery(items, folder_mtimes(items)))
+        size = max(1, self.params.batch_size)
+        for i in range(0, len(items), size):
+            self._deliver(items[i:i + size])
+        for it in items:
+            self._progress.matched(it['size'])
+        self._known = {it['path']: (it['size'], it['mtime']) for it in items}
+        self._known_items = items
+        self.cache_stats = {'hit': True, 'items': len(items), 'changed_dirs': len(changed)}
+        self._status(f"Desde caché: {len(items)} resultados ({len(changed)} carpetas cambiadas)"
+                     + (", revalidando…" if self.params.cache_revalidate else ""))
+
+    def _recheck(self, item: dict) -> dict | None:
+        path, name, is_dir = item['path'], item['name'], item['is_dir']
+        try:
+            st = os.stat(path, follow_symlinks=False)
+        except OSError:
+            return None
+        size = 0 if is_dir else st.st_size
+        if not self._plan.check_record(path, name, is_dir, size, st.st_mtime, attributes_from_stat(name, st)):
+            return None
+        if (size, st.st_mtime) == (item['size'], item['mtime']):
+            return item
+        item = dict(item, size=size, mtime=st.st_mtime)
+        if self._content is not None:
+            # The file was rewritten: its cached content match says nothing about it now
+            hits = self._content.scan(path) if not is_dir else None
+            if not hits:
+                return None
+            item['hits'] = hits
+        return item
+
+    def _store_in_cache(self):
+        items = self._collected
+        if self._known is not None:
+            current = {(it['path'], it['size'], it['mtime']) for it in items}
+            removed = [it for it in self._known_items if (it['path'], it['size'], it['mtime']) not in current]
+            self.cache_stats['removed'] = len(removed)
+            if removed:
+                self.on_removed(removed)
+        self.cache.put(self._cache_key, CachedQuery(items, folder_mtimes(items)))
+
+    def _search_index(self, index: FileIndex, root: str):
+        self._status(f"Índice: {root}")
+        # The first lookup loads the root into memory; later ones only touch the
+        # candidates left by the trigram and the size/date/extension indexes
+        catalog = catalog_for(index, root, self._rules.signature)
+        candidates, narrowed_by = catalog.candidates(self._literals, self.params)
+        checked = 0
+        for start in range(0, len(candidates), READ_CHUNK):
+            # Each chunk is read in one hold of the catalog lock, then checked without it
+            for parent, name, is_dir, size, mtime, attrs in catalog.records(candidates[start:start + READ_CHUNK]):
+                if self._cancel:
+                    return
+                checked += 1
+                path = os.path.join(parent, name)
+                if self._plan.check_record(path, name, is_dir, size, mtime, attrs):
+                    self._emit_record(path, name, is_dir, size, mtime)
+        self.index_stats = {'entries': catalog.live, 'checked': checked, 'narrowed_by': narrowed_by}
+        self._progress.add_entries(catalog.live)
+        self._root_entries += catalog.live
+
+    def _refresh_root(self, index: FileIndex, root: str) -> bool:
+        refresh = index.refresher(root, mirror=loaded_catalog(index, root, self._rules.signature))
+        stack = [root]
+        try:
+            while stack and not self._cancel:
+                current = stack.pop()
+                try:
+                    mtime = os.stat(current).st_mtime
+                except (PermissionError, FileNotFoundError, OSError):
+                    continue
+                if refresh.known_mtime(current) == mtime:
+                    # Listing unchanged: reuse the indexed subfolders instead of scandir
+                    refresh.skipped += 1
+                    stack.extend(refresh.child_dirs(current))
+                    self._progress.visit(current, 0)
+                    continue
+                refresh.rescanned += 1
+                known = refresh.children(current)
+                seen = set()
+                # Applied together once the folder is listed, so a rename is never seen half done
+                pending = []
+                try:
+                    with os.scandir(current) as it:
+                        for entry in it:
+                            if self._cancel:
+                                break
+                            try:
+                                is_dir = entry.is_dir(follow_symlinks=False)
+                            except (PermissionError, FileNotFoundError, OSError):
+                                continue
+                            name = entry.name
+                            if self._excluded(entry, is_dir):
+                                continue
+                            try:
+                                st = entry.stat(follow_symlinks=False)
+                            except (PermissionError, FileNotFoundError, OSError):
+                                continue
+                            seen.add(name)
+                            size = st.st_size if not is_dir else 0
+                            attrs = attributes_from_stat(name, st)
+                            old = known.get(name)
+                            if old is None:
+                                pending.append((refresh.add, (current, name, is_dir, size, st.st_mtime, attrs)))
+                            elif old != (is_dir, size, st.st_mtime, attrs):
+                                if old[0] != is_dir:
+                                    pending.append((refresh.remove, (current, name, old[0])))
+                                    pending.append((refresh.add, (current, name, is_dir, size, st.st_mtime, attrs)))
+                                else:
+                                    pending.append((refresh.update, (current, name, is_dir, size, st.st_mtime, attrs)))
+                            if is_dir:
+                                stack.append(entry.path)
+                except (PermissionError, FileNotFoundError, OSError):
+                    continue
+                if self._cancel:
+                    break
+                with refresh.batch():
+                    for apply, args in pending:
+                        apply(*args)
+                    for name, old in known.items():
+                        if name not in seen:
+                            refresh.remove(current, name, old[0])
+                    refresh.set_dir_mtime(current, mtime)
+                self._progress.visit(current, len(seen))
+            if self._cancel:
+                refresh.abort()
+                drop_catalog(index, root)
+            else:
+                refresh.commit()
+        except BaseException:
+            # Half-applied changes are neither committed nor stamped fresh
+            refresh.abort()
+            drop_catalog(index, root)
+            raise
+        self.refresh_stats = {
+            'skipped': refresh.skipped,
+            'rescanned': refresh.rescanned,
+            'added': refresh.added,
+            'removed': refresh.removed,
+            'updated': refresh.updated,
+        }
+        self._status(f"Índice actualizado: {refresh.skipped} carpetas sin cambios, "
+                     f"{refresh.rescanned} reescaneadas")
+        return not self._cancel
+
+    def _crawl(self, roots: list[str], index: FileIndex | None = None):
+        # All roots share one work queue and are listed concurrently by the walker threads
+        writers = {}
+        if index is not None:
+            index.begin()
+            for root in roots:
+                writer = writers[root] = index.writer(root, self._rules.signature)
+                try:
+                    writer.add_dir(root, os.stat(root).st_mtime)
+                except OSError:
+                    pass
+        self._order = make_order(self.params.traversal)
+        walker = ParallelWalker(self._scan_dir, self.params.workers, lambda: self._cancel, self._order)
+        try:
+            stats = walker.run((root, writers.get(root)) for root in roots)
+            if index is not None:
+                if self._cancel:
+                    index.rollback()
+                else:
+                    for writer in writers.values():
+                        writer.finish()
+                    index.commit()
+        except BaseException:
+            # A failed crawl must not replace the previous index with a partial one
+            if index is not None:
+                index.abandon()
+            raise
+        self._root_entries += stats.entries
+        self.walk_stats = stats.as_dict()
+        self.walk_stats['traversal'] = self._order.name
+        self.walk_stats['syscalls'] = self.syscall_stats
+        self._status(f"Recorrido: {stats.entries} entradas en {stats.elapsed:.1f} s "
+                     f"({stats.entries_per_sec:.0f} entradas/s, {stats.workers} hilos, "
+                     f"{self.walk_stats['syscalls']['stats']} stat)")
+
+    def _scan_dir(self, current: str, writer) -> tuple[list[str], int]:
+        self._batcher.poll()
+        subdirs: list[str] = []
+        seen = 0
+        note_mtime = self._order.note_mtime if self._order is not None and self._order.wants_mtime else None
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    if self._cancel:
+                        break
+                    seen += 1
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except PermissionError:
+                        continue
+                    if self._excluded(entry, is_dir):
+                        continue
+                    if is_dir:
+                        subdirs.append(entry.path)
+                        if note_mtime is not None:
+                            # Free on Windows; elsewhere the filters or the index usually stat it anyway
+                            try:
+                                note_mtime(entry.path, entry.stat(follow_symlinks=False).st_mtime)
+                            except OSError:
+                                pass
+                    if writer is not None:
+                        self._index_entry(writer, current, entry, is_dir)
+                        continue
+                    meta = self._plan.check_entry(entry, is_dir)
+                    if meta is not None:
+                        self._emit_record(entry.path, entry.name, is_dir, meta[0], meta[1])
+        except (PermissionError, FileNotFoundError, OSError):
+            pass
+        self._progress.visit(current, seen)
+        return subdirs, seen
+
+    def _excluded(self, entry: os.DirEntry, is_dir: bool) -> bool:
+        # Excluded folders are dropped before they are queued, so their subtree is never listed
+        rules = self._rules
+        if not rules:
+            return False
+        if is_dir:
+            return rules.prunes_dir(entry.path, entry.name)
+        return rules.skips_file(entry.path, entry.name)
+
+    def _index_entry(self, writer, parent: str, entry: os.DirEntry, is_dir: bool):
+        # A single stat feeds both the index row and the filters
+        meta = self._plan.stat_entry(entry, is_dir)
+        if meta is None:
+            return
+        size, mtime, attrs = meta
+        writer.add(parent, entry.name, is_dir, size, mtime, attrs)
+        if is_dir:
+            writer.add_dir(entry.path, mtime)
+        if self._plan.check_record(entry.path, entry.name, is_dir, size, mtime, attrs):
+            self._emit_record(entry.path, entry.name, is_dir, size, mtime)
+
+    def _emit_record(self, path: str, name: str, is_dir: bool, size: int, mtime: float):
+        if self._usage is not None and self._pool is None:
+            # Folded into its folder's counters; no result dict is built
+            if not is_dir:
+                self._usage.add(path, size, mtime)
+                self._progress.matched(size)
+            return
+        top = self._top
+        if top is not None and not top.would_keep(size if top.key == 'size' else mtime):
+            # Cannot enter the ranking any more: skip the dict and the content scan
+            return
+        item = {
+            'name': name,
+            'path': path,
+            'is_dir': is_dir,
+            'size': size,
+            'mtime': mtime,
+        }
+        if self._pool is not None:
+            # Name and metadata passed; only files go on to the content scan
+            if not is_dir:
+                self._pool.submit(item)
+            return
+        self._deliver_item(item)
+
+    def _deliver_item(self, item: dict):
+        if self._collected is not None:
+            with self._collect_lock:
+                self._collected.append(item)
+            if self._known is not None and self._known.get(item['path']) == (item['size'], item['mtime']):
+                # Already delivered from the cache
+                return
+        if self._usage is not None:
+            if not item['is_dir']:
+                self._usage.add(item['path'], item['size'], item['mtime'])
+                self._progress.matched(item['size'])
+            return
+        last = False
+        if self._limit is not None:
+            with self._limit_lock:
+                if self._delivered >= self._limit:
+                    return
+                self._delivered += 1
+                last = self._delivered == self._limit
+        hit_dirs = self._hit_dirs
+        if hit_dirs is not None and len(hit_dirs) < HITS_PER_SEARCH:
+            hit_dirs.add(os.path.dirname(item['path']))
+        if self._duplicates is not None:
+            # Held back until the walk ends: a file is only a result once its twin is found
+            with self._dup_lock:
+                self._duplicates.add(item)
+            return
+        self._progress.matched(item['size'])
+        if self._top is not None:
+            self._top.add(item)
+            return
+        self._batcher.add(item)
+        if last:
+            self._stop_at_limit()
+
+    def _stop_at_limit(self):
+        # Same path as cancel(): the walk, the index lookup and the content scan stop
+        # where they are; the truncated answer is neither cached nor counted as a full walk
+        self.limit_reached = True
+        self._cancel = True
+        self._status(f"Límite de {self._limit} resultados alcanzado; recorrido detenido")
+
+    def _report_top(self):
+        top, self._top = self._top, None
+        ranked = top.ranked()
+        for item in ranked:
+            self._batcher.add(item)
+        self._status(f"Top {len(ranked)} {TOP_LABELS[top.key]} de {top.offered} coincidencias"
+                     + (" (búsqueda detenida)" if self._cancel else ""))
+
+    def _report_usage(self):
+        usage, self._usage = self._usage, None
+        if self._cancel:
+            return
+        records = usage.rollup()
+        for record in records:
+            self._batcher.add(record)
+        self._status(f"Uso de disco: {human_size(usage.bytes)} en {usage.files} archivos, "
+                     f"{len(records)} carpetas")
+
+    def _report_duplicates(self):
+        finder, self._duplicates = self._duplicates, None
+        if self._cancel:
+            return
+        cache = None
+        if self.params.hash_cache:
+            try:
+                cache = HashCache()
+            except Exception:
+                cache = None
+        finder.cache = cache
+        try:
+            groups = finder.run()
+        finally:
+            if cache is not None:
+                cache.close()
+        wasted = 0
+        for n, group in enumerate(groups, 1):
+            wasted += group[0]['size'] * (len(group) - 1)
+            for item in group:
+                item['group'] = n
+                self._progress.matched(item['size'])
+                self._batcher.add(item)
+        self.duplicate_stats = finder.as_dict()
+        self.duplicate_stats['groups'] = len(groups)
+        self.duplicate_stats['wasted_bytes'] = wasted
+        self._status(f"Duplicados: {len(groups)} grupos, {finder.full_hashed} hashes completos, "
+                     f"{self.duplicate_stats['cache_hits']} desde caché")
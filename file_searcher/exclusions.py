@@ -0,0 +1,92 @@
+﻿import os
+import re
+import json
+import fnmatch
+
+# Imports that work both as package and as script
+try:
+    from .utils import system_dir_prefixes
+except Exception:
+    from utils import system_dir_prefixes  # type: ignore
+
+_END = object()
+
+
+def _components(path: str) -> list[str]:
+    return [c for c in os.path.normcase(os.path.normpath(path)).replace('/', os.sep).split(os.sep) if c]
+
+
+# Excluded folders keyed by path component, so deciding whether a folder lies
+# under any exclusion costs one walk down its components, whatever the number
+# of rules.
+class PathTrie:
+    def __init__(self, paths=()):
+        self._root: dict = {}
+        self.paths: list[str] = []
+        for p in paths:
+            self.add(p)
+
+    def add(self, path: str):
+        parts = _components(path)
+        if not parts:
+            return
+        node = self._root
+        for part in parts:
+            node = node.setdefault(part, {})
+        if _END not in node:
+            node[_END] = True
+            self.paths.append(os.path.normcase(os.path.normpath(path)))
+
+    def __bool__(self) -> bool:
+        return bool(self._root)
+
+    def covers(self, path: str) -> bool:
+        node = self._root
+        for part in _components(path):
+            node = node.get(part)
+            if node is None:
+                return False
+            if _END in node:
+                return True
+        return False
+
+
+def compile_name_globs(globs) -> 're.Pattern | None':
+    parts = [fnmatch.translate(g.strip()) for g in (globs or []) if g and g.strip()]
+    if not parts:
+        return None
+    return re.compile('|'.join(f'(?:{p})' for p in parts), re.IGNORECASE)
+
+
+# Everything a search prunes before descending: excluded paths, system
+# folders of the drives being searched and folder/file name globs such as
+# node_modules, .git or *.tmp.d.
+class ExclusionRules:
+    def __init__(self, excluded_paths=(), name_globs=(), exclude_system=False, roots=()):
+        self.trie = PathTrie(excluded_paths)
+        if exclude_system:
+            drives = {os.path.splitdrive(os.path.normcase(os.path.abspath(r)))[0] for r in roots}
+            for drive in drives:
+                for prefix in system_dir_prefixes(drive):
+                    self.trie.add(prefix)
+        self.name_globs = sorted({g.strip() for g in (name_globs or []) if g and g.strip()})
+        self._names = compile_name_globs(self.name_globs)
+        self._exact = frozenset(self.trie.paths)
+
+    @property
+    def signature(self) -> str:
+        return json.dumps({'paths': sorted(self.trie.paths), 'names': self.name_globs}, sort_keys=True)
+
+    def __bool__(self) -> bool:
+        return bool(self.trie) or self._names is not None
+
+    def prunes_dir(self, path: str, name: str) -> bool:
+        if self._names is not None and self._names.match(name):
+            return True
+        return bool(self.trie) and self.trie.covers(path)
+
+    def skips_file(self, path: str, name: str) -> bool:
+        # The parent folder already passed prunes_dir, so only the file itself can be excluded
+        if self._names is not None and self._names.match(name):
+            return True
+        return bool(self._exact) and os.path.normcase(path) in self._exact
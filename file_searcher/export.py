@@ -0,0 +1,118 @@
+﻿import os
+import csv
+import json
+from datetime import datetime
+
+# Imports that work both as package and as script
+try:
+    from .utils import human_size
+except Exception:
+    from utils import human_size  # type: ignore
+
+FORMATS = ('csv', 'ndjson', 'tsv')
+FIELDS = ('path', 'name', 'type', 'size', 'mtime')
+LABELS = ('Ruta', 'Nombre', 'Tipo', 'Tamaño', 'Modificado')
+CHUNK_ROWS = 5000
+BUFFER_SIZE = 1 << 20
+
+_EXTENSIONS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.json': 'ndjson', '.tsv': 'tsv', '.txt': 'tsv'}
+
+
+def format_from_path(path: str, default: str = 'csv') -> str:
+    return _EXTENSIONS.get(os.path.splitext(path)[1].lower(), default)
+
+
+def tsv_field(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+
+def open_output(path: str):
+    # Large buffer so rows reach the disk in big writes; undecodable names round-trip
+    return open(path, 'w', encoding='utf-8', errors='surrogateescape', newline='', buffering=BUFFER_SIZE)
+
+
+# Writes result dicts (name, path, is_dir, size, mtime) to a text stream as
+# CSV, NDJSON or TSV. Raw mode keeps sizes in bytes and mtimes in epoch
+# seconds; formatted mode writes what the table shows.
+class ResultWriter:
+    def __init__(self, out, fmt: str = 'csv', formatted: bool = False, header: bool = True):
+        if fmt not in FORMATS:
+            raise ValueError(f"formato desconocido: {fmt}")
+        self.out = out
+        self.fmt = fmt
+        self.formatted = formatted
+        self.rows = 0
+        self._csv = csv.writer(out, lineterminator='\n') if fmt == 'csv' else None
+        if header and fmt != 'ndjson':
+            labels = LABELS if formatted else FIELDS
+            if self._csv is not None:
+                self._csv.writerow(labels)
+            else:
+                out.write('\t'.join(labels) + '\n')
+
+    def _row(self, item: dict) -> tuple:
+        if self.formatted:
+            mtime = item['mtime']
+            return (item['path'], item['name'], 'Carpeta' if item['is_dir'] else 'Archivo',
+                    human_size(item['size'] or 0),
+                    datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M') if mtime else '')
+        return (item['path'], item['name'], 'd' if item['is_dir'] else 'f', item['size'], item['mtime'])
+
+    def write(self, items: list):
+        if not items:
+            return
+        if self.fmt == 'csv':
+            self._csv.writerows(self._row(item) for item in items)
+        elif self.fmt == 'tsv':
+            self.out.write(''.join(f"{tsv_field(p)}\t{tsv_field(n)}\t{t}\t{s}\t{m}\n"
+                                   for p, n, t, s, m in map(self._row, items)))
+        elif self.formatted:
+            self.out.write(''.join(json.dumps(dict(zip(FIELDS, self._row(item))), ensure_ascii=False) + '\n'
+                                   for item in items))
+        else:
+            self.out.write(''.join(json.dumps(item, ensure_ascii=False) + '\n' for item in items))
+        self.rows += len(items)
+
+    def flush(self):
+        self.out.flush()
+
+    def close(self):
+        self.out.close()
+
+
+def export_records(records, path: str, fmt: str | None = None, formatted: bool = False,
+                   total: int | None = None, on_progress=None, is_cancelled=None,
+                   chunk_rows: int = CHUNK_ROWS) -> int | None:
+    # Writes to a side file that only replaces `path` once complete, so a
+    # cancelled or failed export never leaves a truncated file behind.
+    # Returns the rows written, or None if cancelled.
+    tmp = path + '.part'
+    cancelled = False
+    try:
+        with open_output(tmp) as f:
+            writer = ResultWriter(f, fmt or format_from_path(path), formatted)
+            chunk: list = []
+            for record in records:
+                chunk.append(record)
+                if len(chunk) >= chunk_rows:
+                    writer.write(chunk)
+                    chunk = []
+                    if on_progress:
+                        on_progress(writer.rows, total)
+                    if is_cancelled and is_cancelled():
+                        cancelled = True
+                        break
+            writer.write(chunk)
+        if cancelled:
+            os.remove(tmp)
+            return None
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    if on_progress:
+        on_progress(writer.rows, total)
+    return writer.rows
@@ -0,0 +1,107 @@
+﻿import os
+import threading
+
+# Imports that work both as package and as script
+try:
+    from .utils import (
+        attributes_from_stat,
+        FILE_ATTRIBUTE_HIDDEN,
+        FILE_ATTRIBUTE_OFFLINE,
+        FILE_ATTRIBUTE_RECALL_ON_OPEN,
+    )
+except Exception:
+    from utils import (  # type: ignore
+        attributes_from_stat,
+        FILE_ATTRIBUTE_HIDDEN,
+        FILE_ATTRIBUTE_OFFLINE,
+        FILE_ATTRIBUTE_RECALL_ON_OPEN,
+    )
+
+
+class SyscallCounters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entries = 0
+        self.stats = 0
+        self.stat_errors = 0
+
+    def count(self, entries: int = 0, stats: int = 0, stat_errors: int = 0):
+        with self._lock:
+            self.entries += entries
+            self.stats += stats
+            self.stat_errors += stat_errors
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {'entries': self.entries, 'stats': self.stats, 'stat_errors': self.stat_errors}
+
+
+# The filters of one SearchParams, resolved once and ordered cheapest first:
+# folder/extension and name checks on the entry name, and only for survivors
+# a single DirEntry.stat() that provides attributes, size and mtime at once
+# (on Windows it is served from the directory listing itself, without
+# touching the file). Path exclusions are not checked here: the walk prunes
+# them before listing (see exclusions.ExclusionRules).
+class FilterPlan:
+    def __init__(self, params, name_matches=None):
+        p = params
+        self._include_dirs = p.include_dirs
+        self._extensions = frozenset(p.extensions) if p.extensions else None
+        self._name_matches = name_matches
+        mask = 0
+        if p.exclude_hidden:
+            mask |= FILE_ATTRIBUTE_HIDDEN
+        if p.exclude_offline:
+            mask |= FILE_ATTRIBUTE_OFFLINE | FILE_ATTRIBUTE_RECALL_ON_OPEN
+        self._attr_mask = mask
+        self._min_size = p.min_size
+        self._max_size = p.max_size
+        self._date_from = p.date_from
+        self._date_to = p.date_to
+        self.counters = SyscallCounters()
+
+    def _passes_name(self, name: str, is_dir: bool) -> bool:
+        if is_dir:
+            if not self._include_dirs:
+                return False
+        elif self._extensions is not None and os.path.splitext(name)[1].lower() not in self._extensions:
+            return False
+        if self._name_matches is not None and not self._name_matches(name):
+            return False
+        return True
+
+    def _passes_meta(self, is_dir: bool, size: int, mtime: float, attrs: int) -> bool:
+        if attrs & self._attr_mask:
+            return False
+        if not is_dir:
+            if self._min_size is not None and size < self._min_size:
+                return False
+            if self._max_size is not None and size > self._max_size:
+                return False
+        if self._date_from is not None and mtime < self._date_from:
+            return False
+        if self._date_to is not None and mtime > self._date_to:
+            return False
+        return True
+
+    def stat_entry(self, entry: os.DirEntry, is_dir: bool) -> tuple[int, float, int] | None:
+        # (size, mtime, attrs) from one stat-equivalent call, None if it fails
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except OSError:
+            self.counters.count(stats=1, stat_errors=1)
+            return None
+        self.counters.count(stats=1)
+        return (st.st_size if not is_dir else 0), st.st_mtime, attributes_from_stat(entry.name, st)
+
+    def check_entry(self, entry: os.DirEntry, is_dir: bool) -> tuple[int, float, int] | None:
+        self.counters.count(entries=1)
+        if not self._passes_name(entry.name, is_dir):
+            return None
+        meta = self.stat_entry(entry, is_dir)
+        if meta is None or not self._passes_meta(is_dir, *meta):
+            return None
+        return meta
+
+    def check_record(self, path: str, name: str, is_dir: bool, size: int, mtime: float, attrs: int) -> bool:
+        return self._passes_name(name, is_dir) and self._passes_meta(is_dir, size, mtime, attrs)
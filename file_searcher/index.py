@@ -0,0 +1,279 @@
+﻿import os
+import sqlite3
+import contextlib
+import threading
+import time
+
+# Imports that work both as package and as script
+try:
+    from .utils import app_data_dir
+except Exception:
+    from utils import app_data_dir  # type: ignore
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS roots (
+    root TEXT PRIMARY KEY,
+    crawled_at REAL NOT NULL,
+    entries INTEGER NOT NULL,
+    rules TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS entries (
+    root TEXT NOT NULL,
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    attrs INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_entries_root ON entries(root);
+CREATE INDEX IF NOT EXISTS ix_entries_parent ON entries(root, parent);
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT NOT NULL,
+    root TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    PRIMARY KEY (root, path)
+);
+"""
+
+_BATCH = 5000
+
+
+def root_key(root: str) -> str:
+    return os.path.normcase(os.path.normpath(root))
+
+
+def _like_prefix(path: str) -> str:
+    prefix = path.rstrip('\\/') + os.sep
+    return prefix.replace('!', '!!').replace('%', '!%').replace('_', '!_') + '%'
+
+
+def default_index_path() -> str:
+    return os.path.join(app_data_dir(), 'index.sqlite')
+
+
+# On-disk catalog of crawled entries, one row per file or folder
+class FileIndex:
+    def __init__(self, path: str | None = None):
+        self.path = path or default_index_path()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def crawled_at(self, root: str, rules: str = '') -> float | None:
+        # A root crawled under different exclusion rules counts as never crawled
+        with self._lock:
+            row = self._conn.execute('SELECT crawled_at, rules FROM roots WHERE root = ?', (root_key(root),)).fetchone()
+        return row[0] if row and row[1] == rules else None
+
+    def is_fresh(self, root: str, max_age: float, rules: str = '') -> bool:
+        ts = self.crawled_at(root, rules)
+        return ts is not None and (time.time() - ts) <= max_age
+
+    def entry_count(self, root: str) -> int:
+        with self._lock:
+            row = self._conn.execute('SELECT entries FROM roots WHERE root = ?', (root_key(root),)).fetchone()
+        return int(row[0]) if row else 0
+
+    def iter_entries(self, root: str):
+        # Yields (parent, name, is_dir, size, mtime, attrs)
+        with self._lock:
+            cur = self._conn.execute(
+                'SELECT parent, name, is_dir, size, mtime, attrs FROM entries WHERE root = ?', (root_key(root),))
+        while True:
+            with self._lock:
+                rows = cur.fetchmany(_BATCH)
+            if not rows:
+                break
+            for parent, name, is_dir, size, mtime, attrs in rows:
+                yield parent, name, bool(is_dir), size, mtime, attrs
+
+    def begin(self):
+        with self._lock:
+            self._conn.execute('BEGIN')
+
+    def commit(self):
+        with self._lock:
+            self._conn.execute('COMMIT')
+
+    def rollback(self):
+        with self._lock:
+            self._conn.execute('ROLLBACK')
+
+    def abandon(self):
+        # Rolls back whatever transaction is open after a failure, if any
+        with self._lock:
+            if self._conn.in_transaction:
+                self._conn.execute('ROLLBACK')
+
+    def writer(self, root: str, rules: str = '') -> 'IndexWriter':
+        return IndexWriter(self, root, rules)
+
+    def refresher(self, root: str, mirror=None) -> 'IndexRefresh':
+        return IndexRefresh(self, root, mirror)
+
+    def forget(self, root: str):
+        key = root_key(root)
+        with self._lock:
+            self._conn.execute('DELETE FROM entries WHERE root = ?', (key,))
+            self._conn.execute('DELETE FROM dirs WHERE root = ?', (key,))
+            self._conn.execute('DELETE FROM roots WHERE root = ?', (key,))
+
+
+# Buffers the rows of one root's crawl. Runs inside a transaction opened with
+# FileIndex.begin(), so the new rows replace the previous ones atomically.
+# add() may be called from several walker threads.
+class IndexWriter:
+    def __init__(self, index: FileIndex, root: str, rules: str = ''):
+        self._index = index
+        self._root = root_key(root)
+        self._rules = rules
+        self._rows: list[tuple] = []
+        self._dirs: list[tuple] = []
+        self._count = 0
+        self._buf_lock = threading.Lock()
+        with index._lock:
+            index._conn.execute('DELETE FROM entries WHERE root = ?', (self._root,))
+            index._conn.execute('DELETE FROM dirs WHERE root = ?', (self._root,))
+
+    def add(self, parent: str, name: str, is_dir: bool, size: int, mtime: float, attrs: int):
+        with self._buf_lock:
+            self._rows.append((self._root, parent, name, int(is_dir), size, mtime, attrs))
+            full = len(self._rows) >= _BATCH
+        if full:
+            self._flush()
+
+    def add_dir(self, path: str, mtime: float):
+        with self._buf_lock:
+            self._dirs.append((path, self._root, mtime))
+            full = len(self._dirs) >= _BATCH
+        if full:
+            self._flush()
+
+    def _flush(self):
+        with self._buf_lock:
+            rows, dirs = self._rows, self._dirs
+            self._rows, self._dirs = [], []
+            self._count += len(rows)
+        with self._index._lock:
+            if rows:
+                self._index._conn.executemany('INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            if dirs:
+                self._index._conn.executemany('INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)', dirs)
+
+    def finish(self):
+        self._flush()
+        with self._index._lock:
+            self._index._conn.execute('INSERT OR REPLACE INTO roots VALUES (?, ?, ?, ?)',
+                                      (self._root, time.time(), self._count, self._rules))
+
+
+# Applies the differences found by an incremental walk inside one transaction.
+# A mirror (catalog.Catalog of the same root) receives the same changes and
+# is discarded if the refresh is aborted.
+class IndexRefresh:
+    def __init__(self, index: FileIndex, root: str, mirror=None):
+        self._index = index
+        self._root = root_key(root)
+        self._mirror = mirror
+        self.skipped = 0
+        self.rescanned = 0
+        self.added = 0
+        self.removed = 0
+        self.updated = 0
+        index.begin()
+        with index._lock:
+            rows = index._conn.execute('SELECT path, mtime FROM dirs WHERE root = ?', (self._root,)).fetchall()
+        self._mtimes = dict(rows)
+
+    def batch(self):
+        # Holds the mirror's lock over a group of changes (see catalog.Catalog.batch)
+        return self._mirror.batch() if self._mirror is not None else contextlib.nullcontext()
+
+    def known_mtime(self, path: str) -> float | None:
+        return self._mtimes.get(path)
+
+    def child_dirs(self, parent: str) -> list[str]:
+        with self._index._lock:
+            rows = self._index._conn.execute(
+                'SELECT name FROM entries WHERE root = ? AND parent = ? AND is_dir = 1', (self._root, parent)).fetchall()
+        return [os.path.join(parent, r[0]) for r in rows]
+
+    def children(self, parent: str) -> dict[str, tuple]:
+        # name -> (is_dir, size, mtime, attrs)
+        with self._index._lock:
+            rows = self._index._conn.execute(
+                'SELECT name, is_dir, size, mtime, attrs FROM entries WHERE root = ? AND parent = ?',
+                (self._root, parent)).fetchall()
+        return {name: (bool(is_dir), size, mtime, attrs) for name, is_dir, size, mtime, attrs in rows}
+
+    def add(self, parent: str, name: str, is_dir: bool, size: int, mtime: float, attrs: int):
+        with self._index._lock:
+            self._index._conn.execute('INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                      (self._root, parent, name, int(is_dir), size, mtime, attrs))
+        if self._mirror is not None:
+            self._mirror.add(parent, name, is_dir, size, mtime, attrs)
+        self.added += 1
+
+    def update(self, parent: str, name: str, is_dir: bool, size: int, mtime: float, attrs: int):
+        with self._index._lock:
+            self._index._conn.execute(
+                'UPDATE entries SET is_dir = ?, size = ?, mtime = ?, attrs = ? WHERE root = ? AND parent = ? AND name = ?',
+                (int(is_dir), size, mtime, attrs, self._root, parent, name))
+        if self._mirror is not None:
+            self._mirror.update(parent, name, is_dir, size, mtime, attrs)
+        self.updated += 1
+
+    def remove(self, parent: str, name: str, is_dir: bool):
+        path = os.path.join(parent, name)
+        with self._index._lock:
+            conn = self._index._conn
+            conn.execute('DELETE FROM entries WHERE root = ? AND parent = ? AND name = ?', (self._root, parent, name))
+            if is_dir:
+                like = _like_prefix(path)
+                cur = conn.execute("DELETE FROM entries WHERE root = ? AND (parent = ? OR parent LIKE ? ESCAPE '!')",
+                                   (self._root, path, like))
+                self.removed += max(cur.rowcount, 0)
+                conn.execute("DELETE FROM dirs WHERE root = ? AND (path = ? OR path LIKE ? ESCAPE '!')",
+                             (self._root, path, like))
+        if self._mirror is not None:
+            self._mirror.remove(parent, name, is_dir)
+        self.removed += 1
+
+    def set_dir_mtime(self, path: str, mtime: float):
+        if self._mtimes.get(path) == mtime:
+            return
+        self._mtimes[path] = mtime
+        parent, name = os.path.split(path)
+        with self._index._lock:
+            conn = self._index._conn
+            conn.execute('INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)', (path, self._root, mtime))
+            # Keep the folder's own row in its parent listing in step
+            conn.execute('UPDATE entries SET mtime = ? WHERE root = ? AND parent = ? AND name = ? AND is_dir = 1',
+                         (mtime, self._root, parent, name))
+        if self._mirror is not None:
+            self._mirror.set_dir_mtime(path, mtime)
+
+    def commit(self):
+        with self._index._lock:
+            conn = self._index._conn
+            count = conn.execute('SELECT COUNT(*) FROM entries WHERE root = ?', (self._root,)).fetchone()[0]
+            now = time.time()
+            conn.execute('UPDATE roots SET crawled_at = ?, entries = ? WHERE root = ?', (now, count, self._root))
+        self._index.commit()
+        if self._mirror is not None:
+            self._mirror.crawled_at = now
+
+    def abort(self):
+        # The mirror already took the changes: it is discarded so the next search reloads it
+        self._index.abandon()
+        if self._mirror is not None:
+            self._mirror.discard()
+            self._mirror = None
@@ -0,0 +1,110 @@
+﻿import re
+import fnmatch
+
+PATTERN_SEPARATOR = ';'
+_WILDCARD_CHARS = frozenset('*?[')
+
+
+def split_patterns(pattern: str) -> list[str]:
+    return [t.strip() for t in (pattern or '').split(PATTERN_SEPARATOR) if t.strip()]
+
+
+def _has_wildcard(term: str) -> bool:
+    return not _WILDCARD_CHARS.isdisjoint(term)
+
+
+def _classify(term: str, use_regex: bool, use_wildcard: bool, flags: int) -> str:
+    # Each ';' term gets its own kind, so lists such as "informe;*.xlsx;^INV-\d+"
+    # mix them: with Regex a term is a regex when it compiles, else a wildcard
+    # when it holds '*', '?' or '['; with Wildcard only such terms are
+    # wildcards. Otherwise those characters are ordinary characters of a name.
+    # A regex term that is neither raises re.error so the caller can report it.
+    if use_regex:
+        try:
+            re.compile(term, flags)
+            return 'regex'
+        except re.error:
+            if not _has_wildcard(term):
+                raise
+            return 'wildcard'
+    if use_wildcard and _has_wildcard(term):
+        return 'wildcard'
+    return 'literal'
+
+
+def _term_regex(term: str, kind: str, mode: str) -> str:
+    if kind == 'regex':
+        return f'(?:{term})'
+    if kind == 'wildcard':
+        return r'\A' + fnmatch.translate(term)
+    lit = re.escape(term)
+    if mode == 'startswith':
+        return r'\A' + lit
+    if mode == 'endswith':
+        return lit + r'\Z'
+    if mode == 'equals':
+        return r'\A' + lit + r'\Z'
+    return lit
+
+
+def _literal_matcher(term: str, mode: str, match_case: bool):
+    if match_case:
+        if mode == 'contains':
+            return lambda name: term in name
+        if mode == 'startswith':
+            return lambda name: name.startswith(term)
+        if mode == 'endswith':
+            return lambda name: name.endswith(term)
+        if mode == 'equals':
+            return lambda name: name == term
+        return None
+    folded = term.casefold()
+    if mode == 'contains':
+        return lambda name: folded in name.casefold()
+    if mode == 'startswith':
+        return lambda name: name.casefold().startswith(folded)
+    if mode == 'endswith':
+        return lambda name: name.casefold().endswith(folded)
+    if mode == 'equals':
+        return lambda name: name.casefold() == folded
+    return None
+
+
+def _never(name: str) -> bool:
+    return False
+
+
+def _regex_matcher(rx):
+    search = rx.search
+    return lambda name: search(name) is not None
+
+
+def compile_name_matcher(pattern: str, mode: str = 'contains', match_case: bool = False,
+                         use_regex: bool = False, use_wildcard: bool = False):
+    # Returns a callable name -> bool built once per search, or None when
+    # there is no pattern. Several terms separated by ';' are merged into a
+    # single alternation so each name is tested in one regex pass.
+    terms = split_patterns(pattern)
+    if not terms:
+        return None
+    flags = 0 if match_case else re.IGNORECASE
+    classified = [(t, _classify(t, use_regex, use_wildcard, flags)) for t in terms]
+    if mode not in ('contains', 'startswith', 'endswith', 'equals'):
+        classified = [(t, k) for t, k in classified if k != 'literal']
+        if not classified:
+            return _never
+    if len(classified) == 1:
+        term, kind = classified[0]
+        if kind == 'literal':
+            return _literal_matcher(term, mode, match_case)
+        return _regex_matcher(re.compile(term if kind == 'regex' else _term_regex(term, kind, mode), flags))
+    parts = [_term_regex(t, k, mode) for t, k in classified]
+    grouped = sum(1 for t, k in classified if k == 'regex' and re.compile(t, flags).groups)
+    if grouped <= 1:
+        try:
+            return _regex_matcher(re.compile('|'.join(parts), flags))
+        except re.error:
+            pass
+    # Shifted group numbers or inline global flags do not survive concatenation
+    compiled = [re.compile(t if k == 'regex' else _term_regex(t, k, mode), flags).search for t, k in classified]
+    return lambda name: any(m(name) for m in compiled)
@@ -0,0 +1,121 @@
+﻿import os
+import json
+import threading
+import time
+
+# Imports that work both as package and as script
+try:
+    from .utils import app_data_dir
+except Exception:
+    from utils import app_data_dir  # type: ignore
+
+_TOTALS_FILE = 'crawl_totals.json'
+
+
+def _totals_path() -> str:
+    return os.path.join(app_data_dir(), _TOTALS_FILE)
+
+
+def totals_key(roots, rules: str = '') -> str:
+    return json.dumps([sorted(os.path.normcase(r) for r in roots), rules])
+
+
+def load_previous_total(key: str) -> int | None:
+    try:
+        with open(_totals_path(), 'r', encoding='utf-8') as f:
+            value = json.load(f).get(key)
+        return int(value) if value else None
+    except Exception:
+        return None
+
+
+def save_total(key: str, entries: int):
+    path = _totals_path()
+    try:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception:
+            data = {}
+        data[key] = int(entries)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except Exception:
+        pass
+
+
+# Counts what a search has seen and hands a snapshot to emit() at most once
+# per interval, however many directories the walker threads get through.
+# With the entry total of a previous identical search it also reports a
+# percentage and an ETA.
+class ProgressTracker:
+    def __init__(self, emit, interval: float = 0.1, expected_entries: int | None = None):
+        self._emit = emit
+        self.interval = interval
+        self.expected_entries = expected_entries
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._last_emit = 0.0
+        self._current = ''
+        self.dirs = 0
+        self.entries = 0
+        self.matches = 0
+        self.matched_bytes = 0
+
+    def visit(self, path: str, entries: int):
+        with self._lock:
+            self.dirs += 1
+            self.entries += entries
+            self._current = path
+        self.tick()
+
+    def add_entries(self, entries: int):
+        with self._lock:
+            self.entries += entries
+        self.tick()
+
+    def matched(self, size: int):
+        with self._lock:
+            self.matches += 1
+            self.matched_bytes += size
+
+    def tick(self):
+        now = time.perf_counter()
+        if now - self._last_emit < self.interval:
+            return
+        with self._lock:
+            if now - self._last_emit < self.interval:
+                return
+            self._last_emit = now
+        self._emit(self.snapshot())
+
+    def finish(self):
+        self._emit(self.snapshot(done=True))
+
+    def snapshot(self, done: bool = False) -> dict:
+        with self._lock:
+            elapsed = max(time.perf_counter() - self._started, 1e-9)
+            snap = {
+                'current': self._current,
+                'dirs': self.dirs,
+                'entries': self.entries,
+                'matches': self.matches,
+                'matched_bytes': self.matched_bytes,
+                'elapsed': elapsed,
+                'entries_per_sec': self.entries / elapsed,
+                'done': done,
+            }
+        expected = self.expected_entries
+        if expected:
+            if done:
+                snap['percent'] = 100.0
+                snap['eta'] = 0.0
+            else:
+                # The tree may have grown since last time: hold at 99% instead of overshooting
+                snap['percent'] = min(99.0, 100.0 * snap['entries'] / expected)
+                rate = snap['entries_per_sec']
+                remaining = max(expected - snap['entries'], 0)
+                snap['eta'] = remaining / rate if rate > 0 else None
+        return snap
@@ -0,0 +1,57 @@
+﻿import heapq
+import itertools
+import threading
+
+# Keys a top-K query can rank by, largest first
+TOP_KEYS = ('size', 'mtime')
+TOP_LABELS = {
+    'size': "más grandes",
+    'mtime': "más recientes",
+}
+
+
+# The k best results by one key ('size': largest, 'mtime': newest) in a
+# min-heap of at most k entries, so memory stays O(k) however many results
+# pass the filters. would_keep() lets the caller skip work (building the
+# result, the content scan) for an entry that could no longer get in. On
+# equal keys the result found first stays.
+class TopK:
+    def __init__(self, k: int, key: str = 'size'):
+        if key not in TOP_KEYS:
+            raise ValueError(f"Clave de ranking no válida: {key}")
+        self.k = max(1, int(k))
+        self.key = key
+        self._heap: list = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.offered = 0
+
+    def would_keep(self, value) -> bool:
+        heap = self._heap
+        return len(heap) < self.k or value > heap[0][0]
+
+    def add(self, item: dict) -> bool:
+        value = item[self.key]
+        with self._lock:
+            self.offered += 1
+            heap = self._heap
+            if len(heap) < self.k:
+                heapq.heappush(heap, (value, -next(self._seq), item))
+                return True
+            if value > heap[0][0]:
+                heapq.heapreplace(heap, (value, -next(self._seq), item))
+                return True
+            return False
+
+    def floor(self):
+        # Key of the weakest result kept once the heap is full, else None
+        with self._lock:
+            return self._heap[0][0] if len(self._heap) >= self.k else None
+
+    def ranked(self) -> list:
+        with self._lock:
+            entries = sorted(self._heap, reverse=True)
+        return [item for _, _, item in entries]
+
+    def __len__(self) -> int:
+        return len(self._heap)
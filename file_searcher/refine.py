@@ -0,0 +1,87 @@
+﻿import os
+
+# Imports that work both as package and as script
+try:
+    from .matchers import compile_name_matcher, split_patterns
+    from .filters import FilterPlan
+except Exception:
+    from matchers import compile_name_matcher, split_patterns  # type: ignore
+    from filters import FilterPlan  # type: ignore
+
+# Parameters that decide which folders are walked or how hits are produced:
+# any difference means the previous results cannot be reused
+_SAME = ('include_dirs', 'exclude_system', 'exclude_hidden', 'exclude_offline', 'excluded_paths',
+         'excluded_names', 'content', 'content_regex', 'content_case', 'content_all_hits', 'find_duplicates')
+
+
+def _roots(params) -> list[str]:
+    return sorted(os.path.normcase(os.path.normpath(r)) for r in params.roots)
+
+
+def _single_literal(params) -> str | None:
+    if params.use_regex or params.use_wildcard:
+        return None
+    terms = split_patterns(params.pattern)
+    if len(terms) != 1:
+        return None
+    return terms[0] if params.match_case else terms[0].casefold()
+
+
+def _pattern_narrows(new, old) -> bool:
+    if not split_patterns(old.pattern):
+        return True
+    if (new.pattern, new.mode, new.match_case, new.use_regex, new.use_wildcard) == \
+            (old.pattern, old.mode, old.match_case, old.use_regex, old.use_wildcard):
+        return True
+    if new.mode != old.mode or new.match_case != old.match_case:
+        return False
+    n, o = _single_literal(new), _single_literal(old)
+    if n is None or o is None:
+        return False
+    if new.mode == 'contains':
+        return o in n
+    if new.mode == 'startswith':
+        return n.startswith(o)
+    if new.mode == 'endswith':
+        return n.endswith(o)
+    return n == o
+
+
+def _range_narrows(new_low, new_high, old_low, old_high) -> bool:
+    if old_low is not None and (new_low is None or new_low < old_low):
+        return False
+    if old_high is not None and (new_high is None or new_high > old_high):
+        return False
+    return True
+
+
+def is_refinement_of(new, old) -> bool:
+    # True when every result of `new` is necessarily among the results of
+    # `old`, so `new` can be answered by filtering old's results in memory:
+    # a longer "contains" term, an added extension, a tighter size or date
+    # range. Anything that could widen the answer returns False.
+    if old is None or new.find_duplicates or _roots(new) != _roots(old):
+        # Dropping a file from a duplicate group could leave its twin alone
+        return False
+    if new.max_results or new.top_k or new.rollup or old.rollup:
+        # Filtering in memory can neither cut the walk short, rank nor re-add folder totals
+        return False
+    if any(getattr(new, k) != getattr(old, k) for k in _SAME):
+        return False
+    if old.extensions and not (new.extensions and set(new.extensions) <= set(old.extensions)):
+        return False
+    if not _range_narrows(new.min_size, new.max_size, old.min_size, old.max_size):
+        return False
+    if not _range_narrows(new.date_from, new.date_to, old.date_from, old.date_to):
+        return False
+    return _pattern_narrows(new, old)
+
+
+def record_filter(params):
+    # keep(path, name, is_dir, size, mtime) for results already on hand;
+    # attribute filters are equal on both sides, so attrs are not needed.
+    # Entries that are new to the results (see watcher.ChangeSet) pass theirs.
+    plan = FilterPlan(params, compile_name_matcher(params.pattern, params.mode, params.match_case,
+                                                    params.use_regex, params.use_wildcard))
+    check = plan.check_record
+    return lambda path, name, is_dir, size, mtime, attrs=0: check(path, name, is_dir, size, mtime, attrs)
@@ -0,0 +1,178 @@
+﻿from array import array
+from datetime import datetime
+
+# Try PySide6 first, fallback to PyQt5
+try:
+    from PySide6 import QtCore, QtGui
+except ImportError:  # pragma: no cover
+    from PyQt5 import QtCore, QtGui  # type: ignore
+
+# Imports that work both as package and as script
+try:
+    from .utils import human_size
+    from .resultstore import ResultStore
+except Exception:
+    from utils import human_size  # type: ignore
+    from resultstore import ResultStore  # type: ignore
+
+HEADERS = ["Nombre", "Ruta", "Tamaño", "Modificado", "Tipo"]
+COL_NAME, COL_PATH, COL_SIZE, COL_MTIME, COL_TYPE = range(5)
+
+
+# Results kept column by column in a resultstore.ResultStore: numeric
+# columns in typed arrays, names interned, folders as ids into a shared
+# folder table. Cells are only formatted in data(), i.e. for the rows the
+# view paints, and sorting permutes row numbers using the raw values.
+class ResultsModel(QtCore.QAbstractTableModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._store = ResultStore()
+        # Line of the first content hit, 0 when the search had no content filter
+        self._lines = array('l')
+        # Duplicate group number, 0 outside duplicate searches
+        self._groups = array('l')
+        self._order: array | None = None
+        self._dir_brush = QtGui.QBrush(QtGui.QColor('#555'))
+
+    # Qt model API
+    def rowCount(self, parent=QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._store)
+
+    def columnCount(self, parent=QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        i = self._row(index.row())
+        col = index.column()
+        store = self._store
+        if role == QtCore.Qt.DisplayRole:
+            if col == COL_NAME:
+                return store.names[i]
+            if col == COL_PATH:
+                return store.path(i)
+            if col == COL_SIZE:
+                return human_size(store.sizes[i])
+            if col == COL_MTIME:
+                mtime = store.mtimes[i]
+                return datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M') if mtime else ''
+            if col == COL_TYPE:
+                return 'Carpeta' if store.is_dir(i) else 'Archivo'
+        elif role == QtCore.Qt.ForegroundRole:
+            if store.is_dir(i) and col in (COL_NAME, COL_PATH):
+                return self._dir_brush
+        elif role == QtCore.Qt.ToolTipRole:
+            if self._groups[i] and col in (COL_NAME, COL_PATH):
+                return f"Duplicado, grupo {self._groups[i]}"
+            if self._lines[i] and col in (COL_NAME, COL_PATH):
+                return f"Coincidencia en la línea {self._lines[i]}"
+        elif role == QtCore.Qt.TextAlignmentRole:
+            if col == COL_SIZE:
+                return int(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+        elif role == QtCore.Qt.UserRole:
+            return store.path(i)
+        return None
+
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        store = self._store
+        n = len(store)
+        if n == 0:
+            return
+        if column == COL_NAME:
+            key = [name.casefold() for name in store.names].__getitem__
+        elif column == COL_PATH:
+            key = [store.path(i).casefold() for i in range(n)].__getitem__
+        elif column == COL_SIZE:
+            key = store.sizes.__getitem__
+        elif column == COL_MTIME:
+            key = store.mtimes.__getitem__
+        elif column == COL_TYPE:
+            key = store.is_dir
+        else:
+            return
+        self.layoutAboutToBeChanged.emit()
+        rows = sorted(range(n), key=key, reverse=(order == QtCore.Qt.DescendingOrder))
+        self._order = array('l', rows)
+        self.layoutChanged.emit()
+
+    # Feeding
+    def append_rows(self, items: list):
+        if not items:
+            return
+        first = len(self._store)
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(items) - 1)
+        append = self._store.append
+        for item in items:
+            append(item)
+            hits = item.get('hits')
+            self._lines.append(hits[0][0] if hits else 0)
+            self._groups.append(item.get('group', 0))
+        if self._order is not None:
+            self._order.extend(range(first, first + len(items)))
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._store = ResultStore()
+        self._lines = array('l')
+        self._groups = array('l')
+        self._order = None
+        self.endResetModel()
+
+    def retain(self, keep) -> int:
+        # Drops the rows for which keep(path, name, is_dir, size, mtime) is
+        # false, compacting every column in one pass; the sort order survives
+        store = self._store
+        names, sizes, mtimes = store.names, store.sizes, store.mtimes
+        kept = [i for i in range(len(store))
+                if keep(store.path(i), names[i], store.is_dir(i), sizes[i], mtimes[i])]
+        if len(kept) == len(store):
+            return len(kept)
+        self.beginResetModel()
+        self._store = store.retain(kept)
+        self._lines = array('l', (self._lines[i] for i in kept))
+        self._groups = array('l', (self._groups[i] for i in kept))
+        if self._order is not None:
+            position = {old: new for new, old in enumerate(kept)}
+            self._order = array('l', (position[i] for i in self._order if i in position))
+        self.endResetModel()
+        return len(kept)
+
+    # Row access for the window (view row numbers)
+    def path_at(self, row: int) -> str:
+        return self._store.path(self._row(row))
+
+    def record_at(self, row: int) -> dict:
+        i = self._row(row)
+        store = self._store
+        return {
+            'name': store.names[i],
+            'path': store.path(i),
+            'is_dir': store.is_dir(i),
+            'size': store.sizes[i],
+            'mtime': store.mtimes[i],
+        }
+
+    def iter_records(self):
+        # Pins the current store and row order so an export worker can read
+        # them while the view keeps appending, sorting or clearing (the store
+        # only grows, and clear/retain replace it)
+        store = self._store
+        n = len(store)
+        order = self._order[:n] if self._order is not None else range(n)
+
+        def records():
+            names, sizes, mtimes = store.names, store.sizes, store.mtimes
+            for i in order:
+                yield {'name': names[i], 'path': store.path(i), 'is_dir': store.is_dir(i),
+                       'size': sizes[i], 'mtime': mtimes[i]}
+        return records()
+
+    def _row(self, row: int) -> int:
+        return self._order[row] if self._order is not None else row
@@ -0,0 +1,182 @@
+﻿import os
+import sys
+from array import array
+
+# Entry flags
+IS_DIR = 1
+# Path not ending in the name; kept whole among the extra keys
+OWN_PATH = 2
+
+_BASE_KEYS = ('name', 'path', 'is_dir', 'size', 'mtime')
+_SEPS = (os.sep, os.altsep) if os.altsep else (os.sep,)
+# Reconstructed folder prefixes kept around; sorting or exporting by path
+# asks for the same few folders over and over
+_DIR_CACHE = 4096
+
+
+# Results without a dict or a full path string per hit. Folders live in a
+# table of (parent id, interned name); entries in typed columns of
+# (folder id, interned name, size, mtime, flags). Paths are rebuilt on
+# demand (display, open, export). Rows are only ever appended, so a reader
+# that pinned len() keeps seeing the same rows; see retain() for removal.
+# Keys beyond the basic five (content 'hits', duplicate 'group'/'digest')
+# are kept aside for the rows that have them.
+class ResultStore:
+    def __init__(self):
+        self._dir_parent = array('l')
+        self._dir_name: list[str] = []
+        self._dir_index: dict[tuple[int, str], int] = {}
+        self._dir_cache: dict[int, str] = {}
+        self._last_dir: tuple[str, int] | None = None
+        self._last_prefix: tuple[str, int] | None = None
+        self.dir_ids = array('l')
+        self.names: list[str] = []
+        self.sizes = array('q')
+        self.mtimes = array('d')
+        self.flags = array('b')
+        self.extra: dict[int, dict] = {}
+
+    @classmethod
+    def from_items(cls, items) -> 'ResultStore':
+        if isinstance(items, ResultStore):
+            return items
+        store = cls()
+        store.extend(items)
+        return store
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    # Folders
+    def _child_dir(self, parent_id: int, name: str) -> int:
+        key = (parent_id, name)
+        dir_id = self._dir_index.get(key)
+        if dir_id is None:
+            dir_id = len(self._dir_name)
+            name = sys.intern(name)
+            self._dir_parent.append(parent_id)
+            self._dir_name.append(name)
+            self._dir_index[(parent_id, name)] = dir_id
+        return dir_id
+
+    def dir_id(self, path: str) -> int:
+        last = self._last_dir
+        if last is not None and last[0] == path:
+            return last[1]
+        parts = []
+        head = path
+        while True:
+            head, tail = os.path.split(head)
+            if not tail:
+                break
+            parts.append(tail)
+        # `head` is now the drive/root ('/', 'C:\\', '\\\\server\\share\\')
+        dir_id = self._child_dir(-1, head)
+        for part in reversed(parts):
+            dir_id = self._child_dir(dir_id, part)
+        if self.dir_path(dir_id) != path:
+            # Doubled or trailing separators: keep the folder verbatim
+            dir_id = self._child_dir(-1, path)
+        self._last_dir = (path, dir_id)
+        return dir_id
+
+    def dir_path(self, dir_id: int) -> str:
+        parts = []
+        current = dir_id
+        while current != -1:
+            parts.append(self._dir_name[current])
+            current = self._dir_parent[current]
+        return os.path.join(*reversed(parts)) if len(parts) > 1 else parts[0]
+
+    def _prefix(self, dir_id: int) -> str:
+        # Folder path ready to have an entry name appended
+        prefix = self._dir_cache.get(dir_id)
+        if prefix is None:
+            prefix = self.dir_path(dir_id)
+            if not prefix.endswith(_SEPS):
+                prefix += os.sep
+            if len(self._dir_cache) >= _DIR_CACHE:
+                self._dir_cache.clear()
+            self._dir_cache[dir_id] = prefix
+        return prefix
+
+    @property
+    def dir_count(self) -> int:
+        return len(self._dir_name)
+
+    # Feeding
+    def append(self, item: dict):
+        path, name = item['path'], item['name']
+        flags = IS_DIR if item['is_dir'] else 0
+        # Hits come folder by folder, so the previous row's folder usually matches
+        prefix = path[:len(path) - len(name)]
+        last = self._last_prefix
+        if last is not None and last[0] == prefix and path.endswith(name):
+            dir_id = last[1]
+        else:
+            dir_id = self.dir_id(os.path.dirname(path))
+            if path.endswith(name) and self._prefix(dir_id) == prefix:
+                self._last_prefix = (prefix, dir_id)
+            else:
+                flags |= OWN_PATH
+        self.dir_ids.append(dir_id)
+        self.names.append(sys.intern(item['name']))
+        self.sizes.append(int(item['size'] or 0))
+        self.mtimes.append(float(item['mtime'] or 0))
+        self.flags.append(flags)
+        if len(item) > len(_BASE_KEYS) or flags & OWN_PATH:
+            extra = {k: v for k, v in item.items() if k not in _BASE_KEYS}
+            if flags & OWN_PATH:
+                extra['path'] = path
+            if extra:
+                self.extra[len(self.names) - 1] = extra
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    # Reading
+    def path(self, i: int) -> str:
+        if self.flags[i] & OWN_PATH:
+            return self.extra[i]['path']
+        return self._prefix(self.dir_ids[i]) + self.names[i]
+
+    def is_dir(self, i: int) -> bool:
+        return bool(self.flags[i] & IS_DIR)
+
+    def item(self, i: int) -> dict:
+        out = {'name': self.names[i], 'path': self.path(i), 'is_dir': bool(self.flags[i] & IS_DIR),
+               'size': self.sizes[i], 'mtime': self.mtimes[i]}
+        extra = self.extra.get(i)
+        if extra:
+            out.update(extra)
+        return out
+
+    def __iter__(self):
+        for i in range(len(self.names)):
+            yield self.item(i)
+
+    def used_dir_paths(self) -> list[str]:
+        return [self.dir_path(d) for d in sorted(set(self.dir_ids))]
+
+    def retain(self, kept) -> 'ResultStore':
+        # A new store holding rows `kept` (ascending indexes), sharing the folder table
+        out = ResultStore()
+        out._dir_parent, out._dir_name, out._dir_index = self._dir_parent, self._dir_name, self._dir_index
+        out._dir_cache = self._dir_cache
+        out.dir_ids = array('l', (self.dir_ids[i] for i in kept))
+        out.names = [self.names[i] for i in kept]
+        out.sizes = array('q', (self.sizes[i] for i in kept))
+        out.mtimes = array('d', (self.mtimes[i] for i in kept))
+        out.flags = array('b', (self.flags[i] for i in kept))
+        if self.extra:
+            out.extra = {new: self.extra[old] for new, old in enumerate(kept) if old in self.extra}
+        return out
+
+    def nbytes(self) -> int:
+        # Estimate: typed columns, one pointer per row plus each distinct name
+        # string, the folder table and its index
+        columns = sum(a.itemsize * len(a) for a in (self.dir_ids, self.sizes, self.mtimes, self.flags))
+        names = 8 * len(self.names) + sum(49 + len(n) for n in {id(n): n for n in self.names}.values())
+        dirs = (self._dir_parent.itemsize + 8 + 140) * len(self._dir_name) + sum(len(n) for n in self._dir_name)
+        return columns + names + dirs + 300 * len(self.extra)
@@ -0,0 +1,135 @@
+﻿import os
+import time
+import threading
+
+# Imports that work both as package and as script
+try:
+    from .utils import GetLogicalDrives
+except Exception:
+    from utils import GetLogicalDrives  # type: ignore
+
+PROBE_TIMEOUT = 1.5
+ROOTS_TTL = 30.0
+
+# Virtual file systems that are never worth searching
+_PSEUDO_FS = frozenset({
+    'proc', 'sysfs', 'devtmpfs', 'devpts', 'tmpfs', 'cgroup', 'cgroup2', 'securityfs', 'pstore',
+    'debugfs', 'tracefs', 'mqueue', 'hugetlbfs', 'configfs', 'fusectl', 'bpf', 'autofs',
+    'binfmt_misc', 'efivarfs', 'rpc_pipefs', 'nsfs', 'ramfs', 'squashfs', 'fuse.gvfsd-fuse',
+    'fuse.portal',
+})
+
+_cache_lock = threading.Lock()
+_cache: dict = {'at': 0.0, 'roots': None}
+# path -> (reachable, when probed), for folders picked by the user
+_probed: dict[str, tuple[bool, float]] = {}
+
+
+def _unescape_mount(path: str) -> str:
+    # /proc/mounts writes spaces and tabs as octal escapes (\040, \011)
+    if '\\' not in path:
+        return path
+    out, i = [], 0
+    while i < len(path):
+        if path[i] == '\\' and i + 3 < len(path) and path[i + 1:i + 4].isdigit():
+            out.append(chr(int(path[i + 1:i + 4], 8)))
+            i += 4
+        else:
+            out.append(path[i])
+            i += 1
+    return ''.join(out)
+
+
+def linux_mount_points(mounts_file: str = '/proc/mounts') -> list[str]:
+    points: list[str] = []
+    try:
+        with open(mounts_file, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 3 or parts[2] in _PSEUDO_FS:
+                    continue
+                point = _unescape_mount(parts[1])
+                if point.startswith(('/proc', '/sys', '/dev', '/run')) or point in points:
+                    continue
+                points.append(point)
+    except OSError:
+        pass
+    return points or ['/']
+
+
+def candidate_roots() -> list[str]:
+    # Listed without touching the media: drive bitmask on Windows, mount table elsewhere
+    if GetLogicalDrives is not None:
+        try:
+            mask = int(GetLogicalDrives())
+            return [f"{chr(65 + i)}:\\" for i in range(26) if mask & (1 << i)]
+        except Exception:
+            pass
+        return [f"{letter}:\\" for letter in "ABCDEFGHIJKLMNOPQRSTUVWXYZ"]
+    if os.path.exists('/proc/mounts'):
+        return linux_mount_points()
+    roots = ['/']
+    try:
+        roots += [os.path.join('/Volumes', v) for v in sorted(os.listdir('/Volumes'))]
+    except OSError:
+        pass
+    return roots
+
+
+def probe_roots(paths: list[str], timeout: float = PROBE_TIMEOUT) -> list[str]:
+    # Every path is checked on its own daemon thread and all of them share one
+    # deadline, so a disconnected network drive costs at most `timeout` and
+    # cannot keep the process alive on exit.
+    results: dict[str, bool] = {}
+    lock = threading.Lock()
+
+    def probe(path: str):
+        try:
+            ok = os.path.isdir(path)
+        except Exception:
+            ok = False
+        with lock:
+            results[path] = ok
+
+    threads = [threading.Thread(target=probe, args=(p,), name=f"probe {p}", daemon=True) for p in paths]
+    for t in threads:
+        t.start()
+    deadline = time.monotonic() + timeout
+    for t in threads:
+        t.join(max(0.0, deadline - time.monotonic()))
+    now = time.monotonic()
+    with lock:
+        reachable = [p for p in paths if results.get(p)]
+        with _cache_lock:
+            for p in paths:
+                _probed[p] = (bool(results.get(p)), now)
+    return reachable
+
+
+def cached_probe(paths: list[str]) -> list[str] | None:
+    # probe_roots(paths) from the last probes, or None when one of them is missing or older than ROOTS_TTL
+    now = time.monotonic()
+    with _cache_lock:
+        seen = [(p, _probed.get(p)) for p in paths]
+    if any(hit is None or now - hit[1] > ROOTS_TTL for _, hit in seen):
+        return None
+    return [p for p, hit in seen if hit[0]]
+
+
+def cached_roots() -> list[str] | None:
+    with _cache_lock:
+        if _cache['roots'] is not None and time.monotonic() - _cache['at'] <= ROOTS_TTL:
+            return list(_cache['roots'])
+    return None
+
+
+def discover_roots(timeout: float = PROBE_TIMEOUT, refresh: bool = False) -> list[str]:
+    if not refresh:
+        roots = cached_roots()
+        if roots is not None:
+            return roots
+    roots = probe_roots(candidate_roots(), timeout)
+    with _cache_lock:
+        _cache['roots'] = list(roots)
+        _cache['at'] = time.monotonic()
+    return roots
@@ -0,0 +1,200 @@
+﻿import os
+import time
+
+# Imports that work both as package and as script
+try:
+    from .utils import app_data_dir
+except Exception:
+    from utils import app_data_dir  # type: ignore
+
+ORDERS = ('dfs', 'bfs', 'deepening', 'priority')
+ORDER_LABELS = {
+    'dfs': "Profundidad",
+    'bfs': "Anchura",
+    'deepening': "Por niveles",
+    'priority': "Prioridad",
+}
+
+_HISTORY_FILE = 'hit_dirs.json'
+# Folders remembered across searches, most recent kept
+MAX_HISTORY = 2000
+# Distinct hit folders one search adds to the history
+HITS_PER_SEARCH = 256
+
+# Folders under the user profile where people keep their own files
+USER_FOLDERS = ('Desktop', 'Escritorio', 'Documents', 'Documentos', 'Downloads', 'Descargas', 'Pictures',
+                'Imágenes', 'Music', 'Música', 'Videos', 'Vídeos', 'OneDrive', 'Dropbox')
+# Folder names that hold caches, build output or system files: large and rarely what is searched for
+NOISY = frozenset(n.casefold() for n in (
+    'AppData', 'node_modules', '.git', '.svn', '.hg', '__pycache__', '.cache', 'Cache', 'Caches', 'Temp',
+    '$Recycle.Bin', 'System Volume Information', 'Windows', 'WinSxS', 'Program Files', 'Program Files (x86)',
+    'ProgramData', 'site-packages', '.venv', 'venv', 'build', 'dist', 'target', 'obj', '.gradle', '.m2', '.npm',
+    '.nuget', '.tox'))
+
+USER_WEIGHT = 2.0
+HIT_WEIGHT = 3.0
+NOISY_WEIGHT = -4.0
+DEPTH_WEIGHT = -0.25
+# (age in seconds, bonus) for a folder's own mtime
+RECENT = ((7 * 86400, 2.0), (30 * 86400, 1.0))
+
+
+_TARGET = object()
+_LEAD = object()
+
+
+def _parts(path: str) -> list[str]:
+    return [c for c in os.path.normcase(path).replace('/', os.sep).split(os.sep) if c]
+
+
+def _history_path() -> str:
+    return os.path.join(app_data_dir(), _HISTORY_FILE)
+
+
+def _load_history() -> dict:
+    # json is imported here: the window reads ORDERS from this module at startup
+    import json
+    try:
+        with open(_history_path(), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def load_hit_dirs() -> list[str]:
+    return list(_load_history())
+
+
+def save_hit_dirs(folders):
+    # Folders that held results, as {folder: [searches, last seen]}
+    folders = list(folders)
+    if not folders:
+        return
+    import json
+    path = _history_path()
+    try:
+        data = _load_history()
+        now = time.time()
+        for folder in folders:
+            count = data.get(folder, [0, 0])[0]
+            data[folder] = [count + 1, now]
+        if len(data) > MAX_HISTORY:
+            data = dict(sorted(data.items(), key=lambda kv: kv[1][1], reverse=True)[:MAX_HISTORY])
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except Exception:
+        pass
+
+
+# Orders for the directories waiting to be listed. key(path, depth, seq)
+# returns a sort key, smallest listed first; seq grows with every queued
+# directory and breaks ties, so keys are unique.
+
+# Deepest first: the plain stack, lowest memory and fastest overall
+class DepthFirst:
+    name = 'dfs'
+    wants_mtime = False
+
+    def key(self, path: str, depth: int, seq: int):
+        return (-seq,)
+
+
+# Level by level: shallow results first, but the whole frontier of a level is kept
+class BreadthFirst:
+    name = 'bfs'
+    wants_mtime = False
+
+    def key(self, path: str, depth: int, seq: int):
+        return (depth, seq)
+
+
+# Depth-first within bands of `step` levels: every folder of the first
+# levels is listed before anything deeper, then the next band, and so on.
+# Unlike classic iterative deepening nothing is listed twice; deeper
+# folders found early simply wait for their band.
+class Deepening:
+    name = 'deepening'
+    wants_mtime = False
+
+    def __init__(self, step: int = 3):
+        self.step = max(1, step)
+
+    def key(self, path: str, depth: int, seq: int):
+        return (depth // self.step, -seq)
+
+
+# Best-first on a score: user folders and folders that held results in
+# earlier searches (and the folders leading to them) go up, recently
+# modified folders go up, cache/build/system folders go down, and every
+# level costs a little so the walk still reaches everything breadth-wise.
+# The targets live in a trie of path components, so scoring a folder is one
+# walk down its components whatever the size of the history.
+class Priority:
+    name = 'priority'
+    wants_mtime = True
+
+    def __init__(self, hit_dirs=None, home: str | None = None, now: float | None = None):
+        self.now = now if now is not None else time.time()
+        self._trie: dict = {}
+        home = home if home is not None else os.path.expanduser('~')
+        if home and home != '~':
+            for name in USER_FOLDERS:
+                self._add_target(os.path.join(home, name), USER_WEIGHT)
+        for folder in hit_dirs or ():
+            self._add_target(folder, HIT_WEIGHT)
+        self._mtimes: dict[str, float] = {}
+
+    def _add_target(self, folder: str, weight: float):
+        # _LEAD: best weight of a target at or below the node; _TARGET: weight of the node itself
+        node = self._trie
+        for part in _parts(os.path.normpath(folder)):
+            node = node.setdefault(part, {})
+            node[_LEAD] = max(weight, node.get(_LEAD, weight))
+        node[_TARGET] = max(weight, node.get(_TARGET, weight))
+
+    def note_mtime(self, path: str, mtime: float):
+        # Told by the visitor while listing the parent; read once when queued
+        self._mtimes[path] = mtime
+
+    def score(self, path: str, depth: int) -> float:
+        score = DEPTH_WEIGHT * depth
+        mtime = self._mtimes.pop(path, None)
+        if mtime is not None:
+            age = self.now - mtime
+            for limit, bonus in RECENT:
+                if age <= limit:
+                    score += bonus
+                    break
+        parts = _parts(path)
+        if not NOISY.isdisjoint([p.casefold() for p in parts]):
+            score += NOISY_WEIGHT
+        node = self._trie
+        inside = 0.0
+        for part in parts:
+            node = node.get(part)
+            if node is None:
+                return score + inside
+            inside = max(inside, node.get(_TARGET, 0.0))
+        # Every component matched: the folder is a target or leads to one
+        return score + max(inside, node.get(_LEAD, 0.0))
+
+    def key(self, path: str, depth: int, seq: int):
+        return (-self.score(path, depth), seq)
+
+
+def uses_hit_dirs(name: str | None) -> bool:
+    # Only the priority order reads the hit history, so only its searches update it
+    return name == 'priority'
+
+
+def make_order(name: str | None):
+    if name == 'bfs':
+        return BreadthFirst()
+    if name == 'deepening':
+        return Deepening()
+    if name == 'priority':
+        return Priority(load_hit_dirs())
+    return DepthFirst()
@@ -0,0 +1,91 @@
+﻿import os
+from array import array
+from bisect import bisect_left, bisect_right
+
+# Entries changed since the last build, as a share of the catalog, that
+# make the next query rebuild the sorted columns instead of patching them
+REBUILD_FRACTION = 0.05
+
+
+def extension_of(name: str) -> str:
+    return os.path.splitext(name)[1].lower()
+
+
+def bitmap_of(ids, length: int) -> int:
+    # One byte per id (0 or 1) read as an int, so '&' intersects two sets
+    # with a single C-level operation however many ids they hold
+    mask = bytearray(length)
+    for i in ids:
+        mask[i] = 1
+    return int.from_bytes(mask, 'little')
+
+
+def iter_bitmap(bitmap: int, length: int):
+    data = bitmap.to_bytes(length, 'little')
+    i = data.find(1)
+    while i != -1:
+        yield i
+        i = data.find(1, i + 1)
+
+
+# Sorted, array-backed copies of the size and mtime columns of a catalog
+# plus an extension -> ids map, built from the live entries. Range and
+# equality predicates are answered by binary search. Entries added or
+# changed later are kept in `touched` and included in every answer (the
+# exact FilterPlan check settles them) until enough pile up to rebuild.
+class SecondaryIndex:
+    def __init__(self, catalog):
+        alive, is_dir, sizes, mtimes = catalog.alive, catalog.is_dir, catalog.sizes, catalog.mtimes
+        live = [i for i in range(len(alive)) if alive[i]]
+        files = [i for i in live if not is_dir[i]]
+        self.dirs = array('q', (i for i in live if is_dir[i]))
+        self.by_extension: dict[str, array] = {}
+        names = catalog.names
+        for i in files:
+            ext = extension_of(names[i])
+            ids = self.by_extension.get(ext)
+            if ids is None:
+                ids = self.by_extension[ext] = array('q')
+            ids.append(i)
+        files.sort(key=sizes.__getitem__)
+        self.size_ids = array('q', files)
+        self.size_keys = array('q', (sizes[i] for i in files))
+        live.sort(key=mtimes.__getitem__)
+        self.mtime_ids = array('q', live)
+        self.mtime_keys = array('d', (mtimes[i] for i in live))
+        self.built_entries = len(live)
+        self.touched: set[int] = set()
+
+    def touch(self, entry_id: int):
+        self.touched.add(entry_id)
+
+    def stale(self) -> bool:
+        return len(self.touched) > max(1024, self.built_entries * REBUILD_FRACTION)
+
+    @staticmethod
+    def _range(keys, ids, low, high):
+        start = 0 if low is None else bisect_left(keys, low)
+        stop = len(keys) if high is None else bisect_right(keys, high)
+        return ids[start:stop] if stop > start else array('q')
+
+    def predicates(self, params) -> list[tuple[str, int, list]]:
+        # (label, count, id runs) for each filter of params this index can
+        # answer; folders skip the size and extension filters (see
+        # FilterPlan), so they belong to those answers
+        parts = []
+        extra = [self.touched] if self.touched else []
+        dirs = [self.dirs] if params.include_dirs else []
+        if params.min_size is not None or params.max_size is not None:
+            hit = self._range(self.size_keys, self.size_ids, params.min_size, params.max_size)
+            parts.append(('size', [hit] + dirs + extra))
+        if params.date_from is not None or params.date_to is not None:
+            hit = self._range(self.mtime_keys, self.mtime_ids, params.date_from, params.date_to)
+            parts.append(('mtime', [hit] + extra))
+        if params.extensions:
+            hits = [self.by_extension[e] for e in set(params.extensions) if e in self.by_extension]
+            parts.append(('extension', hits + dirs + extra))
+        return [(label, sum(len(r) for r in runs), runs) for label, runs in parts]
+
+    def nbytes(self) -> int:
+        return sum(a.itemsize * len(a) for a in (self.dirs, self.size_ids, self.size_keys, self.mtime_ids,
+                                                 self.mtime_keys, *self.by_extension.values()))
@@ -0,0 +1,168 @@
+﻿import os
+import heapq
+import itertools
+import threading
+import time
+
+# Imports that work both as package and as script
+try:
+    from .scheduling import DepthFirst
+except Exception:
+    from scheduling import DepthFirst  # type: ignore
+
+
+def default_workers() -> int:
+    # Directory listing is bound by I/O latency, not CPU, so oversubscribe a little
+    return min(16, (os.cpu_count() or 2) * 2)
+
+
+class WalkStats:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.dirs = 0
+        self.entries = 0
+        self.started = time.perf_counter()
+        self.finished: float | None = None
+        self._lock = threading.Lock()
+
+    def add(self, entries: int):
+        with self._lock:
+            self.dirs += 1
+            self.entries += entries
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return max(end - self.started, 1e-9)
+
+    @property
+    def entries_per_sec(self) -> float:
+        return self.entries / self.elapsed
+
+    def as_dict(self) -> dict:
+        return {
+            'workers': self.workers,
+            'dirs': self.dirs,
+            'entries': self.entries,
+            'elapsed': self.elapsed,
+            'entries_per_sec': self.entries_per_sec,
+        }
+
+
+# Walks several roots at once from a shared frontier of directories.
+# visit(path, ctx) lists one directory and returns (subdirs, entries_seen);
+# subdirectories inherit the ctx of the root they were found under. The
+# frontier hands out the directory with the smallest order.key() next
+# (see scheduling; depth-first when no order is given). A directory that
+# cannot be listed (OSError) is skipped; any other error from visit stops
+# the walk and is raised by run().
+class ParallelWalker:
+    def __init__(self, visit, workers: int = 1, is_cancelled=None, order=None):
+        self._visit = visit
+        self.workers = max(1, int(workers))
+        self._is_cancelled = is_cancelled or (lambda: False)
+        self._order = order if order is not None else DepthFirst()
+        self._heap: list = []
+        self._seq = itertools.count(1)
+        self._pending = 0
+        self._closed = False
+        self._error: BaseException | None = None
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self.stats = WalkStats(self.workers)
+
+    def run(self, roots) -> WalkStats:
+        self.stats = WalkStats(self.workers)
+        self._heap = []
+        self._pending = 0
+        self._closed = False
+        self._error = None
+        items = list(roots)
+        try:
+            if self.workers == 1:
+                self._run_serial(items)
+            else:
+                self._run_parallel(items)
+        finally:
+            self.stats.finished = time.perf_counter()
+        return self.stats
+
+    def _entry(self, path: str, ctx, depth: int) -> tuple:
+        # The key ends in a unique sequence number, so ctx is never compared
+        return (self._order.key(path, depth, next(self._seq)), path, ctx, depth)
+
+    def _run_serial(self, items):
+        heap = self._heap
+        for path, ctx in items:
+            heapq.heappush(heap, self._entry(path, ctx, 0))
+        while heap and not self._is_cancelled():
+            _, path, ctx, depth = heapq.heappop(heap)
+            for d in self._visit_one(path, ctx):
+                heapq.heappush(heap, self._entry(d, ctx, depth + 1))
+
+    def _run_parallel(self, items):
+        if not items:
+            return
+        entries = [self._entry(path, ctx, 0) for path, ctx in items]
+        with self._lock:
+            for entry in entries:
+                self._push(entry)
+        threads = [threading.Thread(target=self._worker, name=f"walker-{i}", daemon=True)
+                   for i in range(self.workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if self._error is not None:
+            raise self._error
+
+    def _visit_one(self, path: str, ctx) -> list:
+        try:
+            subdirs, entries = self._visit(path, ctx)
+        except OSError:
+            return []
+        self.stats.add(entries)
+        return subdirs
+
+    def _push(self, entry: tuple):
+        # Called with the lock held
+        heapq.heappush(self._heap, entry)
+        self._pending += 1
+        self._ready.notify()
+
+    def _next(self):
+        with self._lock:
+            while not self._heap and not self._closed:
+                self._ready.wait()
+            if not self._heap:
+                return None
+            return heapq.heappop(self._heap)
+
+    def _task_done(self, ctx, depth: int, subdirs: list):
+        # Keys are computed outside the lock; only the heap operations are serialized
+        entries = [self._entry(d, ctx, depth + 1) for d in subdirs]
+        with self._lock:
+            for entry in entries:
+                self._push(entry)
+            self._pending -= 1
+            if self._pending == 0:
+                self._closed = True
+                self._ready.notify_all()
+
+    def _worker(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            _, path, ctx, depth = item
+            subdirs = []
+            try:
+                # On cancel or after a failure keep draining so the pending count still reaches zero
+                if self._error is None and not self._is_cancelled():
+                    subdirs = self._visit_one(path, ctx)
+            except Exception as e:
+                with self._lock:
+                    if self._error is None:
+                        self._error = e
+            finally:
+                self._task_done(ctx, depth, subdirs)
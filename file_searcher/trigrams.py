@@ -0,0 +1,188 @@
+﻿import re
+
+try:
+    import re._parser as _sre  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse as _sre  # type: ignore
+
+# Imports that work both as package and as script
+try:
+    from .matchers import split_patterns, _classify
+except Exception:
+    from matchers import split_patterns, _classify  # type: ignore
+
+GRAM = 3
+_WILDCARD_SPLIT = re.compile(r'\*|\?|\[[^\]]*\]?')
+_REPEATS = tuple(op for op in (getattr(_sre, n, None) for n in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')) if op)
+
+
+def grams(text: str) -> set[str]:
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+def _encode_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_postings(data) -> list[int]:
+    ids: list[int] = []
+    current = value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        current += value
+        ids.append(current)
+        value = shift = 0
+    return ids
+
+
+def _regex_runs(parsed) -> list[str]:
+    # Literal runs every match must contain: concatenated LITERAL nodes,
+    # descending into groups and into repeats that occur at least once
+    runs: list[str] = []
+    cur: list[str] = []
+
+    def flush():
+        if cur:
+            runs.append(''.join(cur))
+            cur.clear()
+
+    for op, av in parsed:
+        if op is _sre.LITERAL:
+            cur.append(chr(av))
+        elif op is _sre.AT:
+            continue
+        elif op is _sre.SUBPATTERN:
+            flush()
+            runs.extend(_regex_runs(av[-1]))
+        elif op in _REPEATS:
+            flush()
+            if av[0] >= 1:
+                runs.extend(_regex_runs(av[2]))
+        else:
+            flush()
+    flush()
+    return runs
+
+
+def required_literals(pattern: str, use_regex: bool = False, use_wildcard: bool = False) -> list[list[str]] | None:
+    # For each ';' term, casefolded literals of at least GRAM characters that
+    # a matching name must contain. None when some term has none, i.e. the
+    # query cannot be narrowed and every name has to be checked.
+    out: list[list[str]] = []
+    for term in split_patterns(pattern):
+        try:
+            kind = _classify(term, use_regex, use_wildcard, 0)
+        except re.error:
+            return None
+        if kind == 'literal':
+            pieces = [term]
+        elif kind == 'wildcard':
+            pieces = _WILDCARD_SPLIT.split(term)
+        else:
+            try:
+                pieces = _regex_runs(_sre.parse(term))
+            except Exception:
+                return None
+        pieces = [p.casefold() for p in pieces if len(p) >= GRAM]
+        if not pieces:
+            return None
+        out.append(pieces)
+    return out or None
+
+
+# Trigram posting lists over casefolded names. Ids must be added in
+# increasing order, so every posting is a sorted run stored as varint
+# deltas (one byte per id in dense postings). Removals are tombstoned and
+# dropped from the postings by compact() once they pile up.
+class TrigramIndex:
+    def __init__(self):
+        self._postings: dict[str, bytearray] = {}
+        self._last: dict[str, int] = {}
+        self._removed: set[int] = set()
+        self._max_id = -1
+        self.count = 0
+
+    def add(self, entry_id: int, name: str):
+        if entry_id <= self._max_id:
+            raise ValueError("ids must be added in increasing order")
+        self._max_id = entry_id
+        self.count += 1
+        postings, last = self._postings, self._last
+        for g in grams(name.casefold()):
+            data = postings.get(g)
+            if data is None:
+                data = postings[g] = bytearray()
+                _encode_varint(data, entry_id)
+            else:
+                _encode_varint(data, entry_id - last[g])
+            last[g] = entry_id
+
+    def remove(self, entry_id: int):
+        if entry_id not in self._removed:
+            self._removed.add(entry_id)
+            self.count -= 1
+            if len(self._removed) > max(1024, self.count // 4):
+                self.compact()
+
+    def compact(self):
+        removed = self._removed
+        if not removed:
+            return
+        for g, data in list(self._postings.items()):
+            ids = [i for i in decode_postings(data) if i not in removed]
+            if not ids:
+                del self._postings[g]
+                del self._last[g]
+                continue
+            fresh = bytearray()
+            prev = 0
+            for i in ids:
+                _encode_varint(fresh, i - prev)
+                prev = i
+            self._postings[g] = fresh
+        self._removed = set()
+
+    def posting(self, gram: str) -> list[int]:
+        data = self._postings.get(gram)
+        if data is None:
+            return []
+        removed = self._removed
+        ids = decode_postings(data)
+        return [i for i in ids if i not in removed] if removed else ids
+
+    def _literal_candidates(self, literal: str) -> set[int]:
+        # Intersect the two shortest postings; the exact matcher settles the rest
+        needed = sorted(grams(literal), key=lambda g: len(self._postings.get(g, b'')))
+        if not needed or needed[0] not in self._postings:
+            return set()
+        result = set(self.posting(needed[0]))
+        for g in needed[1:2]:
+            result.intersection_update(self.posting(g))
+        return result
+
+    def candidates(self, literals: list[list[str]] | None) -> set[int] | None:
+        # OR over terms of AND over each term's literals; None = no narrowing
+        if literals is None:
+            return None
+        out: set[int] = set()
+        for term in literals:
+            ids: set[int] | None = None
+            for literal in sorted(term, key=len, reverse=True):
+                found = self._literal_candidates(literal)
+                ids = found if ids is None else ids & found
+                if not ids:
+                    break
+            out |= ids or set()
+        return out
+
+    def nbytes(self) -> int:
+        return sum(len(d) for d in self._postings.values())
+
+    def __len__(self) -> int:
+        return self.count
@@ -0,0 +1,75 @@
+﻿import os
+import threading
+
+
+def _depth(path: str) -> int:
+    return path.count(os.sep) + (path.count(os.altsep) if os.altsep else 0)
+
+
+# Disk usage per folder for one search. Every file that passes the filters
+# is folded into the counters of its folder as it is seen ([bytes, files,
+# newest mtime]), so nothing per file is kept. rollup() then adds each
+# folder into its parent, deepest folders first, up to the search roots:
+# only folders with at least one matching file below them appear.
+class UsageTree:
+    def __init__(self, roots):
+        self.roots = frozenset(os.path.normcase(os.path.normpath(r)) for r in roots)
+        self._own: dict[str, list] = {}
+        self._lock = threading.Lock()
+        self.files = 0
+        self.bytes = 0
+
+    def add(self, path: str, size: int, mtime: float):
+        folder = os.path.dirname(path)
+        with self._lock:
+            self.files += 1
+            self.bytes += size
+            acc = self._own.get(folder)
+            if acc is None:
+                self._own[folder] = [size, 1, mtime]
+            else:
+                acc[0] += size
+                acc[1] += 1
+                if mtime > acc[2]:
+                    acc[2] = mtime
+
+    def _is_root(self, folder: str) -> bool:
+        return os.path.normcase(folder) in self.roots
+
+    def rollup(self) -> list[dict]:
+        # One record per folder: 'size', 'files' and 'mtime' cover the whole
+        # subtree, 'own_size'/'own_files' the files directly inside it
+        with self._lock:
+            own = {folder: list(acc) for folder, acc in self._own.items()}
+        totals = {folder: list(acc) for folder, acc in own.items()}
+        levels: dict[int, list[str]] = {}
+        for folder in totals:
+            levels.setdefault(_depth(folder), []).append(folder)
+        for depth in range(max(levels, default=-1), -1, -1):
+            for folder in levels.get(depth, ()):
+                if self._is_root(folder):
+                    continue
+                parent = os.path.dirname(folder)
+                if not parent or parent == folder:
+                    continue
+                size, files, mtime = totals[folder]
+                acc = totals.get(parent)
+                if acc is None:
+                    totals[parent] = [size, files, mtime]
+                    levels.setdefault(_depth(parent), []).append(parent)
+                else:
+                    acc[0] += size
+                    acc[1] += files
+                    if mtime > acc[2]:
+                        acc[2] = mtime
+        records = []
+        for folder, (size, files, mtime) in totals.items():
+            own_size, own_files, _ = own.get(folder, (0, 0, 0.0))
+            records.append({'name': os.path.basename(folder) or folder, 'path': folder, 'is_dir': True,
+                            'size': size, 'mtime': mtime, 'files': files,
+                            'own_size': own_size, 'own_files': own_files})
+        records.sort(key=lambda r: r['size'], reverse=True)
+        return records
+
+    def __len__(self) -> int:
+        return len(self._own)
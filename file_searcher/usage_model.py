@@ -0,0 +1,192 @@
+﻿import os
+from array import array
+from datetime import datetime
+
+# Try PySide6 first, fallback to PyQt5
+try:
+    from PySide6 import QtCore
+except ImportError:  # pragma: no cover
+    from PyQt5 import QtCore  # type: ignore
+
+# Imports that work both as package and as script
+try:
+    from .utils import human_size
+except Exception:
+    from utils import human_size  # type: ignore
+
+HEADERS = ["Carpeta", "Tamaño", "Archivos", "% de la carpeta padre", "Último cambio"]
+COL_NAME, COL_SIZE, COL_FILES, COL_SHARE, COL_MTIME = range(5)
+_NO_PARENT = -1
+
+
+# Folder totals of a disk-usage search (usage.UsageTree records) as a tree.
+# Folders live in columns addressed by a node id, which is also the
+# internal id of their indexes. Every folder keeps its children as a list
+# of ids in the current sort order, and row_of[id] is its position in its
+# parent's list, so parent() costs nothing. Sorting reorders those lists and
+# remaps the persistent indexes, so expanded folders stay expanded.
+class UsageModel(QtCore.QAbstractItemModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._reset_columns()
+        self._sort_column = COL_SIZE
+        self._sort_order = QtCore.Qt.DescendingOrder
+
+    def _reset_columns(self):
+        self._paths: list[str] = []
+        self._names: list[str] = []
+        self._sizes = array('q')
+        self._files = array('q')
+        self._mtimes = array('d')
+        self._parents = array('l')
+        self._row_of = array('l')
+        self._children: dict[int, list[int]] = {_NO_PARENT: []}
+
+    # Qt model API
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        kids = self._children.get(parent.internalId() if parent.isValid() else _NO_PARENT, ())
+        if 0 <= row < len(kids) and 0 <= column < len(HEADERS):
+            return self.createIndex(row, column, kids[row])
+        return QtCore.QModelIndex()
+
+    def parent(self, index=None):
+        if index is None:
+            return super().parent()
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        parent = self._parents[index.internalId()]
+        if parent == _NO_PARENT:
+            return QtCore.QModelIndex()
+        return self.createIndex(self._row_of[parent], 0, parent)
+
+    def rowCount(self, parent=QtCore.QModelIndex()) -> int:
+        if parent.isValid():
+            if parent.column() != 0:
+                return 0
+            return len(self._children.get(parent.internalId(), ()))
+        return len(self._children[_NO_PARENT])
+
+    def columnCount(self, parent=QtCore.QModelIndex()) -> int:
+        return len(HEADERS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        i = index.internalId()
+        col = index.column()
+        if role == QtCore.Qt.DisplayRole:
+            if col == COL_NAME:
+                return self._names[i]
+            if col == COL_SIZE:
+                return human_size(self._sizes[i])
+            if col == COL_FILES:
+                return f"{self._files[i]:,}".replace(',', '.')
+            if col == COL_SHARE:
+                share = self._share(i)
+                return f"{share * 100:.1f} %" if share is not None else ''
+            if col == COL_MTIME:
+                mtime = self._mtimes[i]
+                return datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M') if mtime else ''
+        elif role == QtCore.Qt.TextAlignmentRole:
+            if col in (COL_SIZE, COL_FILES, COL_SHARE):
+                return int(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+        elif role == QtCore.Qt.ToolTipRole:
+            if col == COL_NAME:
+                return self._paths[i]
+        elif role == QtCore.Qt.UserRole:
+            return self._paths[i]
+        return None
+
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        if column not in range(len(HEADERS)):
+            return
+        self._sort_column, self._sort_order = column, order
+        if not self._paths:
+            return
+        self.layoutAboutToBeChanged.emit()
+        old = self.persistentIndexList()
+        nodes = [(ix.internalId(), ix.column()) for ix in old]
+        self._sort_children()
+        self.changePersistentIndexList(old, [self.createIndex(self._row_of[i], col, i) for i, col in nodes])
+        self.layoutChanged.emit()
+
+    # Feeding
+    def set_records(self, records: list):
+        self.beginResetModel()
+        self._reset_columns()
+        ids: dict[str, int] = {}
+        for r in records:
+            ids[r['path']] = len(self._paths)
+            self._paths.append(r['path'])
+            self._sizes.append(int(r['size'] or 0))
+            self._files.append(int(r.get('files', 0)))
+            self._mtimes.append(float(r['mtime'] or 0))
+        for i, path in enumerate(self._paths):
+            parent_path = os.path.dirname(path)
+            parent = ids.get(parent_path, _NO_PARENT) if parent_path != path else _NO_PARENT
+            self._parents.append(parent)
+            self._children.setdefault(parent, []).append(i)
+            # Top-level folders (the search roots) show their full path
+            self._names.append(path if parent == _NO_PARENT else (os.path.basename(path) or path))
+        self._row_of = array('l', bytes(self._row_of.itemsize * len(self._paths)))
+        self._sort_children()
+        self.endResetModel()
+
+    def clear(self):
+        self.beginResetModel()
+        self._reset_columns()
+        self.endResetModel()
+
+    # Access for the window
+    def path_at(self, index) -> str | None:
+        return self._paths[index.internalId()] if index.isValid() else None
+
+    def folder_count(self) -> int:
+        return len(self._paths)
+
+    def total_size(self) -> int:
+        return sum(self._sizes[i] for i in self._children[_NO_PARENT])
+
+    def iter_records(self):
+        # Folders depth-first in the order shown, as result dicts for export.ResultWriter
+        paths, names, sizes, files, mtimes = self._paths, self._names, self._sizes, self._files, self._mtimes
+        children = {k: list(v) for k, v in self._children.items()}
+
+        def records():
+            stack = list(reversed(children[_NO_PARENT]))
+            while stack:
+                i = stack.pop()
+                yield {'name': names[i], 'path': paths[i], 'is_dir': True, 'size': sizes[i],
+                       'mtime': mtimes[i], 'files': files[i]}
+                stack.extend(reversed(children.get(i, ())))
+        return records()
+
+    def _share(self, i: int) -> float | None:
+        parent = self._parents[i]
+        if parent == _NO_PARENT:
+            return None
+        total = self._sizes[parent]
+        return self._sizes[i] / total if total else 0.0
+
+    def _sort_children(self):
+        column = self._sort_column
+        if column == COL_NAME:
+            key = [name.casefold() for name in self._names].__getitem__
+        elif column == COL_FILES:
+            key = self._files.__getitem__
+        elif column == COL_MTIME:
+            key = self._mtimes.__getitem__
+        else:
+            # Siblings share a parent, so their share of it sorts like their size
+            key = self._sizes.__getitem__
+        reverse = self._sort_order == QtCore.Qt.DescendingOrder
+        row_of = self._row_of
+        for kids in self._children.values():
+            kids.sort(key=key, reverse=reverse)
+            for row, i in enumerate(kids):
+                row_of[i] = row
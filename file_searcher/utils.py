@@ -1,7 +1,6 @@
 ﻿import os
 import re
 import ctypes
-from ctypes import wintypes
 
 
 def list_windows_drives() -> list[str]:
@@ -25,6 +24,13 @@ def human_size(num: int | float | str) -> str:
     return f"{num:.1f} PB"
 
 
+def app_data_dir() -> str:
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    path = os.path.join(base, 'FileSearcherQt')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
 _SIZE_UNITS = {"b": 1, "kb": 1024, "mb": 1024 ** 2, "gb": 1024 ** 3, "tb": 1024 ** 4}
 
 
@@ -49,28 +55,44 @@ FILE_ATTRIBUTE_HIDDEN = 0x2
 FILE_ATTRIBUTE_OFFLINE = 0x1000
 FILE_ATTRIBUTE_RECALL_ON_OPEN = 0x40000
 
-GetFileAttributesW = ctypes.windll.kernel32.GetFileAttributesW
-GetFileAttributesW.argtypes = [wintypes.LPCWSTR]
-GetFileAttributesW.restype = wintypes.DWORD
+# Bound only on Windows so the engine can be imported anywhere
+if os.name == 'nt':
+    from ctypes import wintypes
+    GetFileAttributesW = ctypes.windll.kernel32.GetFileAttributesW
+    GetFileAttributesW.argtypes = [wintypes.LPCWSTR]
+    GetFileAttributesW.restype = wintypes.DWORD
+    GetLogicalDrives = ctypes.windll.kernel32.GetLogicalDrives
+    GetLogicalDrives.argtypes = []
+    GetLogicalDrives.restype = wintypes.DWORD
+else:
+    GetFileAttributesW = None
+    GetLogicalDrives = None
+
+
+def attributes_from_stat(name: str, st: os.stat_result) -> int:
+    attrs = getattr(st, 'st_file_attributes', None)
+    if attrs is not None:
+        return int(attrs)
+    # Outside Windows the only attribute with a meaning is "hidden": dot files
+    return FILE_ATTRIBUTE_HIDDEN if name.startswith('.') else 0
 
 
 def get_file_attributes(path: str) -> int:
     try:
         st = os.stat(path, follow_symlinks=False)
-        attrs = getattr(st, 'st_file_attributes', 0)
-        if attrs:
-            return int(attrs)
+        attrs = attributes_from_stat(os.path.basename(path), st)
+        if attrs or GetFileAttributesW is None:
+            return attrs
     except Exception:
-        pass
+        if GetFileAttributesW is None:
+            return 0
     try:
         return int(GetFileAttributesW(path))
     except Exception:
         return 0
 
 
-def is_system_path(path: str) -> bool:
-    p = os.path.normcase(os.path.abspath(path))
-    drive, _ = os.path.splitdrive(p)
+def system_dir_prefixes(drive: str) -> tuple[str, ...]:
     base = drive or 'C:'
     system_dirs = [
         os.path.join(base, '\\Windows'),
@@ -81,7 +103,10 @@ def is_system_path(path: str) -> bool:
         os.path.join(base, '\\$Recycle.Bin'),
         os.path.join(base, '\\System Volume Information'),
     ]
-    for s in system_dirs:
-        if p.startswith(os.path.normcase(s)):
-            return True
-    return False
+    return tuple(os.path.normcase(s) for s in system_dirs)
+
+
+def is_system_path(path: str) -> bool:
+    p = os.path.normcase(os.path.abspath(path))
+    drive, _ = os.path.splitdrive(p)
+    return p.startswith(system_dir_prefixes(drive))
@@ -0,0 +1,617 @@
+﻿import os
+import sys
+import stat
+import time
+import errno
+import queue
+import select
+import struct
+import threading
+
+# Imports that work both as package and as script
+try:
+    from .utils import attributes_from_stat
+    from .exclusions import ExclusionRules, PathTrie
+    from .index import FileIndex
+    from .catalog import loaded_catalog, drop_catalog
+except Exception:
+    from utils import attributes_from_stat  # type: ignore
+    from exclusions import ExclusionRules, PathTrie  # type: ignore
+    from index import FileIndex  # type: ignore
+    from catalog import loaded_catalog, drop_catalog  # type: ignore
+
+# Quiet time after the last event before a batch is applied, and the longest
+# a batch may wait while events keep coming (an unzip of 100k files is
+# applied every MAX_DELAY instead of once at the end)
+DEBOUNCE = 0.5
+MAX_DELAY = 2.0
+MAX_PENDING = 20000
+POLL_INTERVAL = 10.0
+# Directory mtimes only have a resolution of 1-2 s on some file systems
+OVERFLOW_SLACK = 2.0
+
+# Raw events from a backend: (kind, path, is_dir) with kind 'created',
+# 'deleted', 'modified' or 'rescan' (the listing of a folder may have changed
+# in ways the backend could not report; only that folder is read again).
+# is_dir is None when the backend does not know.
+
+
+class WatchLimitError(OSError):
+    pass
+
+
+def _walk_dirs(top: str, prune):
+    stack = [top]
+    while stack:
+        current = stack.pop()
+        yield current
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False) and not prune(entry.path, entry.name):
+                            stack.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+
+def changed_since(dirs, since: float) -> list[str]:
+    # Folders whose listing changed after `since`: the targets of a rescan
+    # after a lost event queue. Content-only writes to files in untouched
+    # folders cannot be recovered this way.
+    out = []
+    for path in dirs:
+        try:
+            if os.stat(path).st_mtime >= since - OVERFLOW_SLACK:
+                out.append(path)
+        except OSError:
+            continue
+    return out
+
+
+# inotify through libc: one watch per folder, added as folders appear. A
+# folder moved away keeps its watches, so they are removed by hand.
+class InotifyBackend:
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_DONT_FOLLOW = 0x02000000
+    IN_EXCL_UNLINK = 0x04000000
+    IN_ISDIR = 0x40000000
+    MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+            | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+    _HEADER = struct.Struct('iIII')
+
+    def __init__(self, prune):
+        import ctypes
+        import ctypes.util
+        self._prune = prune
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._get_errno = ctypes.get_errno
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(self._get_errno(), "inotify_init1")
+        self._wds: dict[int, str] = {}
+        self._paths: dict[str, int] = {}
+        self._read_at = time.time()
+
+    def _watch(self, path: str):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            err = self._get_errno()
+            if err == errno.ENOSPC:
+                raise WatchLimitError(err, "Límite de inotify alcanzado (fs.inotify.max_user_watches)")
+            return
+        self._wds[wd] = path
+        self._paths[path] = wd
+
+    def _watch_tree(self, top: str):
+        for path in _walk_dirs(top, self._prune):
+            self._watch(path)
+
+    def _unwatch_tree(self, top: str):
+        prefix = top.rstrip(os.sep) + os.sep
+        for path in [p for p in self._paths if p == top or p.startswith(prefix)]:
+            wd = self._paths.pop(path)
+            self._wds.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def add_root(self, root: str):
+        self._watch_tree(root)
+
+    def read(self, timeout: float) -> list[tuple]:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        since, self._read_at = self._read_at, time.time()
+        try:
+            data = os.read(self._fd, 1 << 18)
+        except BlockingIOError:
+            return []
+        events: list[tuple] = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = self._HEADER.unpack_from(data, offset)
+            raw = data[offset + self._HEADER.size:offset + self._HEADER.size + length]
+            offset += self._HEADER.size + length
+            if mask & self.IN_Q_OVERFLOW:
+                events.extend(('rescan', d, True) for d in changed_since(list(self._paths), since))
+                continue
+            if mask & self.IN_IGNORED:
+                path = self._wds.pop(wd, None)
+                if path is not None and self._paths.get(path) == wd:
+                    del self._paths[path]
+                continue
+            parent = self._wds.get(wd)
+            if parent is None or not raw:
+                continue
+            name = os.fsdecode(raw.rstrip(b'\0'))
+            path = os.path.join(parent, name)
+            is_dir = bool(mask & self.IN_ISDIR)
+            if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                if is_dir and not self._prune(path, name):
+                    try:
+                        self._watch_tree(path)
+                    except WatchLimitError:
+                        # Already watching what fits; the rest is picked up by later searches
+                        pass
+                events.append(('created', path, is_dir))
+            elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                if is_dir:
+                    self._unwatch_tree(path)
+                events.append(('deleted', path, is_dir))
+            else:
+                events.append(('modified', path, is_dir))
+        return events
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+# ReadDirectoryChangesW on one handle per root (bWatchSubtree), each read by
+# its own thread. Names come relative to the root; whether an entry is a
+# folder is not reported.
+class WindowsBackend:
+    FILTER = 0x1 | 0x2 | 0x4 | 0x8 | 0x10  # file name, dir name, attributes, size, last write
+    BUFFER = 64 * 1024  # the limit for network shares
+    _ACTIONS = {1: 'created', 2: 'deleted', 3: 'modified', 4: 'deleted', 5: 'created'}
+
+    def __init__(self, prune):
+        import ctypes
+        from ctypes import wintypes
+        self._ctypes = ctypes
+        self._wintypes = wintypes
+        self._prune = prune
+        k32 = self._k32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        k32.CreateFileW.restype = wintypes.HANDLE
+        k32.CreateFileW.argtypes = [wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, ctypes.c_void_p,
+                                    wintypes.DWORD, wintypes.DWORD, wintypes.HANDLE]
+        k32.ReadDirectoryChangesW.argtypes = [wintypes.HANDLE, ctypes.c_void_p, wintypes.DWORD, wintypes.BOOL,
+                                              wintypes.DWORD, ctypes.POINTER(wintypes.DWORD), ctypes.c_void_p,
+                                              ctypes.c_void_p]
+        k32.CancelIoEx.argtypes = [wintypes.HANDLE, ctypes.c_void_p]
+        k32.CloseHandle.argtypes = [wintypes.HANDLE]
+        self._events: queue.Queue = queue.Queue()
+        self._handles: list = []
+        self._closed = False
+
+    def add_root(self, root: str):
+        # FILE_LIST_DIRECTORY, shared for read/write/delete, OPEN_EXISTING, FILE_FLAG_BACKUP_SEMANTICS
+        handle = self._k32.CreateFileW(root, 0x1, 0x7, None, 3, 0x02000000, None)
+        if handle in (None, self._wintypes.HANDLE(-1).value):
+            raise self._ctypes.WinError(self._ctypes.get_last_error())
+        self._handles.append(handle)
+        threading.Thread(target=self._pump, args=(root, handle), name='watch-rdcw', daemon=True).start()
+
+    def _pump(self, root: str, handle):
+        ctypes = self._ctypes
+        buf = ctypes.create_string_buffer(self.BUFFER)
+        returned = self._wintypes.DWORD()
+        since = time.time()
+        while not self._closed:
+            ok = self._k32.ReadDirectoryChangesW(handle, buf, len(buf), True, self.FILTER,
+                                                 ctypes.byref(returned), None, None)
+            now = time.time()
+            if not ok:
+                break
+            if returned.value == 0:
+                # The system buffer overflowed: read again the folders changed since the last read
+                for d in changed_since(_walk_dirs(root, self._prune), since):
+                    self._events.put(('rescan', d, True))
+                since = now
+                continue
+            since = now
+            data = buf.raw[:returned.value]
+            offset = 0
+            while True:
+                next_offset, action, length = struct.unpack_from('III', data, offset)
+                name = data[offset + 12:offset + 12 + length].decode('utf-16-le')
+                kind = self._ACTIONS.get(action)
+                if kind is not None:
+                    self._events.put((kind, os.path.join(root, name), None))
+                if not next_offset:
+                    break
+                offset += next_offset
+
+    def read(self, timeout: float) -> list[tuple]:
+        try:
+            events = [self._events.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def close(self):
+        self._closed = True
+        for handle in self._handles:
+            self._k32.CancelIoEx(handle, None)
+            self._k32.CloseHandle(handle)
+        self._handles = []
+
+
+# Fallback without native notifications (or past the inotify watch limit):
+# folder mtimes are compared every POLL_INTERVAL and changed folders are
+# read again. Writes that do not touch a folder listing go unnoticed.
+class PollingBackend:
+    def __init__(self, prune, interval: float = POLL_INTERVAL):
+        self._prune = prune
+        self._interval = interval
+        self._mtimes: dict[str, float] = {}
+        self._next = time.monotonic() + interval
+
+    def _track(self, top: str) -> list[str]:
+        found = []
+        for path in _walk_dirs(top, self._prune):
+            try:
+                self._mtimes[path] = os.stat(path).st_mtime
+            except OSError:
+                continue
+            found.append(path)
+        return found
+
+    def add_root(self, root: str):
+        self._track(root)
+
+    def read(self, timeout: float) -> list[tuple]:
+        wait = self._next - time.monotonic()
+        if wait > 0:
+            time.sleep(min(wait, timeout))
+            return []
+        events: list[tuple] = []
+        for path, mtime in list(self._mtimes.items()):
+            if path not in self._mtimes:
+                continue
+            try:
+                current = os.stat(path).st_mtime
+            except OSError:
+                prefix = path.rstrip(os.sep) + os.sep
+                for gone in [p for p in self._mtimes if p == path or p.startswith(prefix)]:
+                    del self._mtimes[gone]
+                events.append(('deleted', path, True))
+                continue
+            if current == mtime:
+                continue
+            self._mtimes[path] = current
+            events.append(('rescan', path, True))
+            try:
+                with os.scandir(path) as it:
+                    fresh = [e.path for e in it
+                             if e.is_dir(follow_symlinks=False) and e.path not in self._mtimes
+                             and not self._prune(e.path, e.name)]
+            except OSError:
+                continue
+            for sub in fresh:
+                self._track(sub)
+                events.append(('created', sub, True))
+        self._next = time.monotonic() + self._interval
+        return events
+
+    def close(self):
+        self._mtimes.clear()
+
+
+def default_backend(prune):
+    if sys.platform.startswith('linux'):
+        return InotifyBackend(prune)
+    if os.name == 'nt':
+        return WindowsBackend(prune)
+    return PollingBackend(prune)
+
+
+def _meta(name: str, st: os.stat_result) -> tuple:
+    is_dir = stat.S_ISDIR(st.st_mode)
+    return is_dir, (0 if is_dir else st.st_size), st.st_mtime, attributes_from_stat(name, st)
+
+
+# The net effect of a batch of events, resolved against the disk when the
+# batch is applied: current metadata of every touched entry, the paths that
+# no longer exist, and full listings of the folders that were read again.
+class ChangeSet:
+    def __init__(self):
+        # path -> (is_dir, size, mtime, attrs)
+        self.upserts: dict[str, tuple] = {}
+        self.deleted: set[str] = set()
+        # folder -> (mtime, names it holds now)
+        self.listed: dict[str, tuple[float, set[str]]] = {}
+        self._gone: PathTrie | None = None
+
+    def __bool__(self) -> bool:
+        return bool(self.upserts or self.deleted or self.listed)
+
+    def __len__(self) -> int:
+        return len(self.upserts) + len(self.deleted)
+
+    def under(self, root: str) -> 'ChangeSet':
+        prefix = root.rstrip('\\/') + os.sep
+        out = ChangeSet()
+        out.upserts = {p: m for p, m in self.upserts.items() if p.startswith(prefix)}
+        out.deleted = {p for p in self.deleted if p.startswith(prefix)}
+        out.listed = {d: v for d, v in self.listed.items() if d == root or d.startswith(prefix)}
+        return out
+
+    def touches(self, path: str) -> bool:
+        # True when a held result for `path` is stale: gone, under a removed
+        # folder, missing from a re-read listing, or replaced by an upsert
+        if path in self.upserts:
+            return True
+        parent, name = os.path.split(path)
+        listing = self.listed.get(parent)
+        if listing is not None and name not in listing[1]:
+            return True
+        if not self.deleted:
+            return False
+        if self._gone is None:
+            self._gone = PathTrie(self.deleted)
+        return self._gone.covers(path)
+
+    def items(self) -> list[dict]:
+        # Upserts as result items (see SearchEngine._emit_record), with attrs for the filters
+        return [{'name': os.path.basename(p), 'path': p, 'is_dir': m[0], 'size': m[1], 'mtime': m[2], 'attrs': m[3]}
+                for p, m in self.upserts.items()]
+
+
+# Watches the roots of a search on its own thread, coalesces the events and
+# hands each debounced batch to on_changes(ChangeSet) without rescanning.
+class Watcher:
+    def __init__(self, roots: list[str], on_changes, rules: ExclusionRules | None = None, backend=None,
+                 on_status=None, debounce: float = DEBOUNCE, max_delay: float = MAX_DELAY, since: float | None = None):
+        self.roots = [r for r in roots if os.path.isdir(r)]
+        self._root_keys = frozenset(os.path.normcase(os.path.normpath(r)) for r in self.roots)
+        # Folders changed after `since` (e.g. the start of the search whose
+        # results are kept) are read again once the watches are in place
+        self.since = since
+        self.on_changes = on_changes
+        self.on_status = on_status or (lambda text: None)
+        self._rules = rules or ExclusionRules()
+        self._backend = backend
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.batches = 0
+        self.events = 0
+
+    def _prune(self, path: str, name: str) -> bool:
+        return bool(self._rules) and self._rules.prunes_dir(path, name)
+
+    def _skips(self, path: str, is_dir: bool) -> bool:
+        if not self._rules:
+            return False
+        name = os.path.basename(path)
+        if self._rules.prunes_dir(path, name) if is_dir else self._rules.skips_file(path, name):
+            return True
+        # Backends that watch a whole subtree (ReadDirectoryChangesW) also
+        # report entries of pruned folders such as node_modules
+        parent = os.path.dirname(path)
+        while os.path.normcase(parent) not in self._root_keys:
+            if self._rules.prunes_dir(parent, os.path.basename(parent)):
+                return True
+            up = os.path.dirname(parent)
+            if up == parent:
+                break
+            parent = up
+        return False
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name='watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self, wait: bool = True):
+        self._stop.set()
+        if wait and self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _open_backend(self):
+        backend = self._backend or default_backend(self._prune)
+        try:
+            for root in self.roots:
+                backend.add_root(root)
+        except WatchLimitError as e:
+            backend.close()
+            self.on_status(f"{e.strerror}; se vigila por sondeo cada {POLL_INTERVAL:.0f} s")
+            backend = PollingBackend(self._prune)
+            for root in self.roots:
+                backend.add_root(root)
+        return backend
+
+    def run(self):
+        try:
+            backend = self._open_backend()
+        except OSError as e:
+            self.on_status(f"No se pueden vigilar los cambios: {e}")
+            return
+        entries: dict[str, str] = {}
+        listings: set[str] = set()
+        first = last = 0.0
+        if self.since is not None:
+            for root in self.roots:
+                listings.update(changed_since(_walk_dirs(root, self._prune), self.since))
+        try:
+            while not self._stop.is_set():
+                events = backend.read(0.2)
+                now = time.monotonic()
+                if events:
+                    self.events += len(events)
+                    if not (entries or listings):
+                        first = now
+                    last = now
+                    for kind, path, _is_dir in events:
+                        if kind == 'rescan':
+                            listings.add(path)
+                        elif kind == 'modified' and entries.get(path) == 'created':
+                            continue
+                        else:
+                            entries[path] = kind
+                if (entries or listings) and (now - last >= self.debounce or now - first >= self.max_delay
+                                              or len(entries) >= MAX_PENDING):
+                    changes = self.resolve(entries, listings)
+                    entries, listings = {}, set()
+                    if changes and not self._stop.is_set():
+                        self.batches += 1
+                        self.on_changes(changes)
+        finally:
+            backend.close()
+
+    def _list(self, changes: ChangeSet, top: str, recursive: bool):
+        stack = [top]
+        while stack:
+            current = stack.pop()
+            try:
+                mtime = os.stat(current).st_mtime
+                names = set()
+                with os.scandir(current) as it:
+                    for entry in it:
+                        try:
+                            st = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        meta = _meta(entry.name, st)
+                        if self._skips(entry.path, meta[0]):
+                            continue
+                        names.add(entry.name)
+                        changes.upserts[entry.path] = meta
+                        if recursive and meta[0]:
+                            stack.append(entry.path)
+            except FileNotFoundError:
+                changes.deleted.add(current)
+                continue
+            except OSError:
+                continue
+            changes.listed[current] = (mtime, names)
+
+    def resolve(self, entries: dict[str, str], listings: set[str]) -> ChangeSet:
+        changes = ChangeSet()
+        trees = []
+        for path, kind in entries.items():
+            try:
+                st = os.lstat(path)
+            except OSError:
+                changes.deleted.add(path)
+                continue
+            meta = _meta(os.path.basename(path), st)
+            if self._skips(path, meta[0]):
+                continue
+            changes.upserts[path] = meta
+            if meta[0] and kind == 'created':
+                # A folder that appears (mkdir, move, unzip) may already hold entries
+                trees.append(path)
+        for path in listings:
+            self._list(changes, path, recursive=False)
+        for path in trees:
+            self._list(changes, path, recursive=True)
+        return changes
+
+
+def apply_to_refresh(refresh, changes: ChangeSet):
+    # Applies a ChangeSet through an index.IndexRefresh (and so to its
+    # catalog mirror), comparing against the indexed rows of each folder
+    known: dict[str, dict[str, tuple]] = {}
+
+    def children(parent: str) -> dict[str, tuple]:
+        rows = known.get(parent)
+        if rows is None:
+            rows = known[parent] = refresh.children(parent)
+        return rows
+
+    for path in sorted(changes.deleted):
+        parent, name = os.path.split(path)
+        old = children(parent).pop(name, None)
+        if old is not None:
+            refresh.remove(parent, name, old[0])
+    for folder, (_mtime, names) in changes.listed.items():
+        rows = children(folder)
+        for name in [n for n in rows if n not in names]:
+            refresh.remove(folder, name, rows.pop(name)[0])
+    for path, meta in changes.upserts.items():
+        parent, name = os.path.split(path)
+        rows = children(parent)
+        old = rows.get(name)
+        if old is None:
+            refresh.add(parent, name, *meta)
+        elif old != meta:
+            if old[0] != meta[0]:
+                refresh.remove(parent, name, old[0])
+                refresh.add(parent, name, *meta)
+            else:
+                refresh.update(parent, name, *meta)
+        rows[name] = meta
+    for folder, (mtime, _names) in changes.listed.items():
+        refresh.set_dir_mtime(folder, mtime)
+
+
+# Keeps the on-disk index (and any loaded catalog) of the watched roots in
+# step with a Watcher; roots that were never indexed are left alone
+class IndexSync:
+    def __init__(self, roots: list[str], rules: ExclusionRules | None = None, index_path: str | None = None):
+        self.roots = list(roots)
+        self._signature = (rules or ExclusionRules()).signature
+        self._index_path = index_path
+
+    def since(self) -> float | None:
+        # When the oldest indexed root was last brought up to date: a Watcher
+        # started with it reads again only the folders changed after that
+        index = FileIndex(self._index_path)
+        try:
+            stamps = [index.crawled_at(root, self._signature) for root in self.roots]
+        finally:
+            index.close()
+        stamps = [t for t in stamps if t is not None]
+        return min(stamps) if stamps else None
+
+    def apply(self, changes: ChangeSet) -> int:
+        applied = 0
+        index = FileIndex(self._index_path)
+        try:
+            for root in self.roots:
+                if index.crawled_at(root, self._signature) is None:
+                    continue
+                subset = changes.under(root)
+                if not subset:
+                    continue
+                refresh = index.refresher(root, mirror=loaded_catalog(index, root, self._signature))
+                try:
+                    with refresh.batch():
+                        apply_to_refresh(refresh, subset)
+                except Exception:
+                    refresh.abort()
+                    drop_catalog(index, root)
+                    raise
+                refresh.commit()
+                applied += refresh.added + refresh.removed + refresh.updated
+        finally:
+            index.close()
+        return applied
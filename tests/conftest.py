@@ -0,0 +1,43 @@
+﻿import os
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def app_data(tmp_path, monkeypatch):
+    # Index, caches and hit history of each test live in its own folder
+    data = tmp_path / 'appdata'
+    data.mkdir()
+    monkeypatch.setenv('LOCALAPPDATA', str(data))
+    monkeypatch.setenv('FILE_SEARCHER_NO_DAEMON', '1')
+    return data
+
+
+@pytest.fixture
+def make_tree(tmp_path):
+    # make_tree({'a/b.txt': 'text', 'empty/': None}) -> root path; sizes follow the text
+    def make(files: dict, name: str = 'tree') -> str:
+        root = tmp_path / name
+        root.mkdir()
+        for rel, text in files.items():
+            path = root / rel
+            if rel.endswith('/'):
+                path.mkdir(parents=True, exist_ok=True)
+                continue
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(text or '', encoding='utf-8')
+        return str(root)
+    return make
+
+
+@pytest.fixture
+def walk_paths():
+    # Every file and folder under root, from os.walk: the reference answer
+    def walk(root: str, include_dirs: bool = True) -> list[str]:
+        out = []
+        for current, dirs, files in os.walk(root):
+            out.extend(os.path.join(current, f) for f in files)
+            if include_dirs:
+                out.extend(os.path.join(current, d) for d in dirs)
+        return sorted(out)
+    return walk
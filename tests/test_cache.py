@@ -0,0 +1,129 @@
+﻿import os
+
+from file_searcher.cache import CachedQuery, QueryCache, folder_mtimes, query_key
+from file_searcher.engine import SearchEngine, SearchParams
+
+
+def entry(nbytes):
+    query = CachedQuery([], {})
+    query.nbytes = nbytes
+    return query
+
+
+def params(root, pattern='', **kwargs):
+    return SearchParams(pattern, 'contains', False, False, False, False, [root], **kwargs)
+
+
+def test_lru_eviction():
+    cache = QueryCache(max_bytes=300)
+    a, b, c, d = entry(100), entry(100), entry(100), entry(150)
+    cache.put('a', a)
+    cache.put('b', b)
+    cache.put('c', c)
+    assert len(cache) == 3 and cache.nbytes == 300
+    # Touching 'a' makes 'b' the least recently used
+    assert cache.get('a') is a
+    cache.put('d', d)
+    assert cache.get('b') is None
+    assert cache.get('c') is None
+    assert cache.get('a') is a and cache.get('d') is d
+    assert cache.nbytes == 250
+    assert cache.as_dict()['hits'] == 3 and cache.as_dict()['misses'] == 2
+
+
+def test_replace_discard_and_oversize():
+    cache = QueryCache(max_bytes=300)
+    cache.put('a', entry(100))
+    cache.put('a', entry(200))
+    assert len(cache) == 1 and cache.nbytes == 200
+    # Larger than the whole budget: not kept, and the old answer is gone too
+    cache.put('a', entry(301))
+    assert len(cache) == 0 and cache.nbytes == 0
+    cache.put('b', entry(50))
+    cache.discard('b')
+    cache.discard('missing')
+    assert cache.nbytes == 0
+    cache.put('c', entry(50))
+    cache.clear()
+    assert len(cache) == 0 and cache.nbytes == 0
+
+
+def test_query_key(tmp_path):
+    root = str(tmp_path)
+    assert query_key(params(root, 'a', workers=2)) == query_key(params(root + os.sep, 'a', workers=8))
+    assert query_key(params(root, 'a', extensions=['.b', '.a'])) == query_key(params(root, 'a', extensions=['.a', '.b']))
+    assert query_key(params(root, 'a')) != query_key(params(root, 'b'))
+    assert query_key(params(root, 'a')) != query_key(params(root, 'a', max_results=5))
+
+
+def test_changed_dirs(make_tree):
+    root = make_tree({'a/x.txt': 'x', 'b/y.txt': 'y'})
+    items = [{'name': n, 'path': os.path.join(root, d, n), 'is_dir': False, 'size': 1, 'mtime': 0.0}
+             for d, n in (('a', 'x.txt'), ('b', 'y.txt'))]
+    query = CachedQuery(items, folder_mtimes(items))
+    assert query.changed_dirs() == set()
+    with open(os.path.join(root, 'a', 'new.txt'), 'w') as f:
+        f.write('n')
+    bump(os.path.join(root, 'a'))
+    assert query.changed_dirs() == {os.path.join(root, 'a')}
+    os.rename(os.path.join(root, 'b'), os.path.join(root, 'c'))
+    assert query.changed_dirs() == {os.path.join(root, 'a'), os.path.join(root, 'b')}
+
+
+def bump(path):
+    # File system mtimes can be coarse: move it on explicitly
+    st = os.stat(path)
+    os.utime(path, (st.st_atime, st.st_mtime + 5))
+
+
+def run(cache, root, pattern='', **kwargs):
+    found, removed = [], []
+    engine = SearchEngine(params(root, pattern, use_cache=True, **kwargs), cache=cache,
+                          on_batch=found.extend, on_removed=removed.extend)
+    engine.run()
+    return engine, sorted(it['path'] for it in found), sorted(it['path'] for it in removed)
+
+
+def test_served_from_cache_and_rechecked_when_a_folder_changes(make_tree):
+    root = make_tree({'a/report.txt': 'r', 'a/report2.txt': 'rr', 'b/report.md': 'm', 'b/other.txt': 'o'})
+    cache = QueryCache()
+    _, first, _ = run(cache, root, 'report')
+    assert len(first) == 3 and len(cache) == 1
+    engine, again, _ = run(cache, root, 'report', cache_revalidate=False)
+    assert again == first
+    assert engine.cache_stats == {'hit': True, 'items': 3, 'changed_dirs': 0}
+    os.remove(os.path.join(root, 'a', 'report2.txt'))
+    bump(os.path.join(root, 'a'))
+    engine, served, _ = run(cache, root, 'report', cache_revalidate=False)
+    assert served == [p for p in first if not p.endswith('report2.txt')]
+    assert engine.cache_stats['changed_dirs'] == 1
+    # The patched answer replaced the old one
+    engine, _, _ = run(cache, root, 'report', cache_revalidate=False)
+    assert engine.cache_stats['changed_dirs'] == 0 and engine.cache_stats['items'] == 2
+
+
+def test_revalidation_sends_new_and_withdraws_gone(make_tree):
+    root = make_tree({'a/report.txt': 'r', 'b/report.md': 'm', 'b/deep/report.log': 'l'})
+    cache = QueryCache()
+    _, first, _ = run(cache, root, 'report')
+    with open(os.path.join(root, 'a', 'report_new.txt'), 'w') as f:
+        f.write('new')
+    # Not in a folder holding a cached result: only the walk can find it
+    os.makedirs(os.path.join(root, 'c'))
+    with open(os.path.join(root, 'c', 'report.bin'), 'w') as f:
+        f.write('c')
+    deep = os.path.join(root, 'b', 'deep', 'report.log')
+    os.remove(deep)
+    bump(os.path.join(root, 'a'))
+    bump(os.path.join(root, 'b', 'deep'))
+    # Rewritten in place: its folder looks unchanged, so the cached row is sent and later withdrawn
+    rewritten = os.path.join(root, 'b', 'report.md')
+    with open(rewritten, 'w') as f:
+        f.write('longer now')
+    bump(rewritten)
+    engine, found, removed = run(cache, root, 'report')
+    now = sorted(set(first) - {deep} | {os.path.join(root, 'a', 'report_new.txt'), os.path.join(root, 'c', 'report.bin')})
+    assert sorted(set(found)) == now
+    assert removed == [rewritten]
+    _, found, _ = run(cache, root, 'report', cache_revalidate=False)
+    assert found == now
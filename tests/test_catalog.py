@@ -0,0 +1,81 @@
+﻿import os
+
+import pytest
+
+from file_searcher.catalog import catalog_for, clear_catalogs
+from file_searcher.engine import SearchEngine, SearchParams
+from file_searcher.index import FileIndex
+
+
+@pytest.fixture
+def tree(make_tree):
+    files = {}
+    for i in range(120):
+        folder = f'part{i % 6}/sub{i % 4}'
+        ext = ('.txt', '.jpg', '.log', '.md')[i % 4]
+        files[f'{folder}/file_{i:03d}{ext}'] = 'x' * (i * 37 % 5000)
+    files['odd/Report [final].docx'] = 'report'
+    files['odd/a*b.txt'] = 'star'
+    files['odd/what?.md'] = 'question'
+    files['empty/'] = None
+    root = make_tree(files)
+    # Index it once so the searches below are answered from the catalog
+    collect(root, use_index=True)
+    clear_catalogs()
+    return root
+
+
+def run(root, pattern='', use_regex=False, use_wildcard=False, mode='contains', include_dirs=True, **kwargs):
+    found = []
+    params = SearchParams(pattern, mode, False, use_regex, use_wildcard, include_dirs, [root], **kwargs)
+    engine = SearchEngine(params, on_batch=lambda items: found.extend(it['path'] for it in items))
+    engine.run()
+    return engine, sorted(found)
+
+
+def collect(root, pattern='', **kwargs):
+    return run(root, pattern, **kwargs)[1]
+
+
+@pytest.mark.parametrize('pattern, kwargs', [
+    ('', {}),
+    ('file', {'include_dirs': False}),
+    ('file_01', {}),
+    ('FILE_01', {}),
+    ('[final]', {}),
+    ('a*b', {}),
+    ('what?', {}),
+    ('.jpg', {'mode': 'endswith'}),
+    ('sub1', {'mode': 'equals'}),
+    ('file_0*.txt', {'use_wildcard': True}),
+    ('*[0-3].md', {'use_wildcard': True}),
+    (r'_0[1-3]\d\.log$', {'use_regex': True}),
+    ('file_001;file_1', {}),
+    ('', {'extensions': ['.jpg', '.md']}),
+    ('', {'min_size': 1000, 'max_size': 3000}),
+    ('file', {'min_size': 4000, 'extensions': ['.txt']}),
+])
+def test_index_search_matches_walk(tree, pattern, kwargs):
+    walked = collect(tree, pattern, **kwargs)
+    engine, indexed = run(tree, pattern, use_index=True, **kwargs)
+    assert indexed == walked
+    assert engine.index_stats['entries'] == len(collect(tree))
+
+
+def test_catalog_remove_drops_subtree(tree):
+    index = FileIndex()
+    try:
+        rules = SearchEngine(SearchParams('', 'contains', False, False, False, True, [tree]))._rules.signature
+        catalog = catalog_for(index, tree, rules)
+        before = catalog.live
+        ids, _ = catalog.candidates(None)
+        paths = {os.path.join(p, n) for p, n, *_ in catalog.records(ids)}
+        gone = {p for p in paths if p.startswith(os.path.join(tree, 'part0') + os.sep)}
+        catalog.remove(tree, 'part0', True)
+        ids, _ = catalog.candidates(None)
+        left = {os.path.join(p, n) for p, n, *_ in catalog.records(ids)}
+    finally:
+        index.close()
+    assert left == paths - gone - {os.path.join(tree, 'part0')}
+    assert catalog.live == before - len(gone) - 1
+    assert catalog.find(tree, 'part0') is None
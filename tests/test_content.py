@@ -0,0 +1,114 @@
+﻿import os
+import threading
+
+import pytest
+
+from file_searcher import content
+from file_searcher.content import ContentMatcher, ContentPool
+
+
+@pytest.fixture
+def files(make_tree):
+    root = make_tree({
+        'plain.txt': 'alpha\nbeta\nNeedle here\n\nand a needle again\n',
+        'none.txt': 'nothing to see\n',
+        'empty.txt': '',
+        'first.txt': 'needle on the first line',
+    })
+    with open(os.path.join(root, 'binary.bin'), 'wb') as f:
+        f.write(b'needle\x00\x01\x02')
+    with open(os.path.join(root, 'utf8.txt'), 'wb') as f:
+        f.write('año\ncañón\n'.encode('utf-8'))
+    return root
+
+
+def test_first_hit_with_line_and_offset(files):
+    matcher = ContentMatcher('needle')
+    data = open(os.path.join(files, 'plain.txt'), 'rb').read()
+    assert matcher.scan(os.path.join(files, 'plain.txt')) == [[3, data.index(b'Needle')]]
+    assert matcher.scan(os.path.join(files, 'first.txt')) == [[1, 0]]
+    assert matcher.scan(os.path.join(files, 'none.txt')) is None
+    assert matcher.scan(os.path.join(files, 'empty.txt')) is None
+    assert matcher.scan(os.path.join(files, 'binary.bin')) is None
+    assert matcher.scan(os.path.join(files, 'missing.txt')) is None
+    stats = matcher.as_dict()
+    assert (stats['scanned'], stats['matched'], stats['binary'], stats['errors']) == (3, 2, 1, 1)
+
+
+def test_all_hits_case_and_regex(files):
+    path = os.path.join(files, 'plain.txt')
+    data = open(path, 'rb').read()
+    assert ContentMatcher('needle', all_hits=True).scan(path) == \
+        [[3, data.index(b'Needle')], [5, data.index(b'needle')]]
+    assert ContentMatcher('needle', match_case=True, all_hits=True).scan(path) == [[5, data.index(b'needle')]]
+    assert ContentMatcher(r'^b\w+$', use_regex=True).scan(path) is None
+    assert ContentMatcher(r'(?m)^b\w+$', use_regex=True).scan(path) == [[2, data.index(b'beta')]]
+    assert ContentMatcher('needle', all_hits=True, max_hits=1).scan(path) == [[3, data.index(b'Needle')]]
+    # Literal needles are escaped
+    assert ContentMatcher('a.b').scan(path) is None
+
+
+def test_utf8_needles(files):
+    path = os.path.join(files, 'utf8.txt')
+    assert ContentMatcher('cañón').scan(path) == [[2, len('año\n'.encode('utf-8'))]]
+
+
+def test_line_count_across_chunks(make_tree, monkeypatch):
+    monkeypatch.setattr(content, '_LINE_CHUNK', 7)
+    root = make_tree({'long.txt': 'x\n' * 50 + 'needle\n' + 'y\n' * 10 + 'needle'})
+    hits = ContentMatcher('needle', all_hits=True).scan(os.path.join(root, 'long.txt'))
+    assert [line for line, _ in hits] == [51, 62]
+
+
+class _BlockingMatcher:
+    def __init__(self):
+        self.release = threading.Event()
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def scan(self, path):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        self.release.wait(5)
+        with self._lock:
+            self.running -= 1
+        return [[1, 0]] if path.endswith('hit') else None
+
+
+def test_pool_bounds_the_queue():
+    matcher = _BlockingMatcher()
+    found = []
+    pool = ContentPool(matcher, found.append, workers=2)
+    submitted = []
+
+    def feed():
+        for i in range(20):
+            pool.submit({'path': f'f{i}' + ('hit' if i % 2 else '')})
+            submitted.append(i)
+
+    feeder = threading.Thread(target=feed)
+    feeder.start()
+    feeder.join(0.3)
+    # workers * 4 slots: the feeder waits instead of queueing the rest
+    assert feeder.is_alive()
+    assert len(submitted) == 8
+    matcher.release.set()
+    feeder.join(5)
+    pool.close()
+    assert len(submitted) == 20
+    assert matcher.peak <= 2
+    assert sorted(item['path'] for item in found) == sorted(f'f{i}hit' for i in range(1, 20, 2))
+    assert all(item['hits'] == [[1, 0]] for item in found)
+
+
+def test_pool_skips_work_once_cancelled():
+    matcher = _BlockingMatcher()
+    matcher.release.set()
+    found = []
+    pool = ContentPool(matcher, found.append, workers=1, is_cancelled=lambda: True)
+    for i in range(10):
+        pool.submit({'path': f'f{i}hit'})
+    pool.close()
+    assert found == [] and matcher.peak == 0
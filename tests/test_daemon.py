@@ -0,0 +1,186 @@
+﻿import os
+import threading
+import time
+from multiprocessing import Pipe
+
+import pytest
+
+from file_searcher import daemon
+from file_searcher.daemon import (DaemonServer, RemoteEngine, _Flight, _speaks_protocol, decode, encode,
+                                  item_to_row, make_engine, params_from_dict, params_to_dict, row_to_item)
+from file_searcher.engine import SearchEngine, SearchParams
+
+
+def params(root, pattern='', **kwargs):
+    return SearchParams(pattern, 'contains', False, False, False, True, [root], **kwargs)
+
+
+def test_frames_round_trip():
+    item = {'name': 'b\udcff.txt', 'path': '/a/b\udcff.txt', 'is_dir': False, 'size': 3, 'mtime': 1.5,
+            'hits': [[1, 0]]}
+    assert decode(encode({'t': 'page', 'rows': [item_to_row(item)]}))['rows'] == [item_to_row(item)]
+    assert row_to_item(decode(encode(item_to_row(item)))) == item
+    plain = dict(item)
+    del plain['hits']
+    assert len(item_to_row(plain)) == 4 and row_to_item(item_to_row(plain)) == plain
+    p = params('/data', 'x', extensions=['.pdf'], max_results=5)
+    back = params_from_dict(decode(encode(params_to_dict(p))))
+    assert params_to_dict(back) == params_to_dict(p)
+
+
+def serve(server):
+    client, served = Pipe()
+    thread = threading.Thread(target=server._serve_client, args=(served,), daemon=True)
+    thread.start()
+    return client, thread
+
+
+def answer_once(reply):
+    client, served = Pipe()
+
+    def reply_hello():
+        served.recv_bytes()
+        if reply is None:
+            served.close()
+        else:
+            served.send_bytes(encode(reply))
+    threading.Thread(target=reply_hello, daemon=True).start()
+    return client
+
+
+def test_version_check():
+    server = DaemonServer(address='unused', authkey=b'key')
+    client, _ = serve(server)
+    try:
+        assert _speaks_protocol(client)
+    finally:
+        client.close()
+    assert not _speaks_protocol(answer_once({'t': 'hello', 'protocol': daemon.PROTOCOL - 1}))
+    assert not _speaks_protocol(answer_once({'t': 'error', 'message': 'operación desconocida: hello'}))
+    assert not _speaks_protocol(answer_once(None))
+
+
+def test_unknown_operations_are_answered_with_an_error():
+    client, thread = serve(DaemonServer(address='unused', authkey=b'key'))
+    try:
+        client.send_bytes(encode({'op': 'nope'}))
+        assert decode(client.recv_bytes())['t'] == 'error'
+    finally:
+        client.close()
+    thread.join(5)
+    assert not thread.is_alive()
+
+
+@pytest.fixture
+def tree(make_tree):
+    return make_tree({f'd{i % 4}/file_{i:03d}.txt': 'x' * i for i in range(60)})
+
+
+def remote(server, p, **kwargs):
+    client, _ = serve(server)
+    found = []
+    engine = RemoteEngine(p, client, on_batch=found.extend, **kwargs)
+    engine.run()
+    return engine, found
+
+
+def test_remote_search_matches_local(tree):
+    server = DaemonServer(address='unused', authkey=b'key')
+    p = params(tree, 'file_0')
+    local = []
+    SearchEngine(p, on_batch=local.extend).run()
+    engine, found = remote(server, p)
+    assert sorted(it['path'] for it in found) == sorted(it['path'] for it in local)
+    assert not engine.cancelled and not engine.limit_reached
+    engine, found = remote(server, params(tree, 'file', max_results=5))
+    assert len(found) == 5 and engine.limit_reached
+
+
+def test_make_engine_falls_back_in_process(tree):
+    # FILE_SEARCHER_NO_DAEMON is set for every test
+    engine = make_engine(params(tree))
+    assert type(engine) is SearchEngine
+
+
+def test_service_over_a_listener(tree, tmp_path, monkeypatch):
+    address = os.path.join(str(tmp_path), 'd.sock')
+    if len(address) > 100:
+        pytest.skip("socket path too long")
+    monkeypatch.delenv('FILE_SEARCHER_NO_DAEMON')
+    monkeypatch.setenv('FILE_SEARCHER_DAEMON', address)
+    server = DaemonServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        deadline = time.monotonic() + 5
+        while not os.path.exists(address) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        found = []
+        engine = make_engine(params(tree, 'file_00'), on_batch=found.extend)
+        assert isinstance(engine, RemoteEngine)
+        engine.run()
+        assert len(found) == 10
+        assert daemon.ping()['searches'] == 1
+    finally:
+        assert daemon.stop_daemon()
+        thread.join(5)
+    assert not thread.is_alive()
+
+
+def push_all(flight, count):
+    for i in range(count):
+        flight.push({'t': 'page', 'n': i})
+
+
+def read_all(flight, reader):
+    frames, _, _, _ = flight.wait(reader, 0, 0)
+    return [decode(f)['n'] for f in frames]
+
+
+def test_flight_replays_from_the_start_until_frames_are_dropped():
+    flight = _Flight('k')
+    first = flight.join()
+    push_all(flight, 10)
+    # A late reader still gets every frame
+    second = flight.join()
+    assert read_all(flight, second) == list(range(10))
+    assert read_all(flight, first) == list(range(10))
+    push_all(flight, daemon.REPLAY_FRAMES + 50)
+    assert read_all(flight, first)[-1] == daemon.REPLAY_FRAMES + 49
+    # Only the frames both readers have are dropped, and REPLAY_FRAMES are kept
+    assert len(flight.frames) == daemon.REPLAY_FRAMES + 50 and flight.base == 10
+    assert read_all(flight, second)
+    # Both readers are past them: all but REPLAY_FRAMES are dropped and late joiners start a new search
+    assert len(flight.frames) == daemon.REPLAY_FRAMES
+    assert flight.base == 60 and flight.join() is None
+    flight.leave(first)
+    flight.leave(second)
+
+
+def test_flight_push_waits_for_the_slowest_reader(monkeypatch):
+    monkeypatch.setattr(daemon, 'MAX_BACKLOG', 4)
+    flight = _Flight('k')
+    fast, slow = flight.join(), flight.join()
+    pushed = []
+
+    def produce():
+        for i in range(10):
+            flight.push({'t': 'page', 'n': i})
+            pushed.append(i)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    time.sleep(0.3)
+    assert len(pushed) == 4
+    read_all(flight, fast)
+    time.sleep(0.3)
+    # The fast reader alone does not release it
+    assert len(pushed) == 4
+    assert read_all(flight, slow) == [0, 1, 2, 3]
+    time.sleep(0.3)
+    assert len(pushed) == 8
+    # A reader that leaves no longer holds it back
+    flight.leave(slow)
+    read_all(flight, fast)
+    producer.join(5)
+    assert pushed == list(range(10))
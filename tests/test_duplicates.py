@@ -0,0 +1,105 @@
+﻿import os
+
+import pytest
+
+from file_searcher.duplicates import PARTIAL_BLOCK, DuplicateFinder, HashCache
+
+LARGE = 3 * PARTIAL_BLOCK
+
+
+def item(path):
+    st = os.stat(path)
+    return {'name': os.path.basename(path), 'path': path, 'is_dir': False, 'size': st.st_size,
+            'mtime': st.st_mtime}
+
+
+@pytest.fixture
+def dupes(make_tree):
+    body = bytes(range(256)) * (LARGE // 256)
+    middle = bytearray(body)
+    middle[LARGE // 2] ^= 0xFF
+    start = bytearray(body)
+    start[0] ^= 0xFF
+    root = make_tree({
+        'small/a.txt': 'same text',
+        'small/b.txt': 'same text',
+        'small/c.txt': 'diff text',
+        'small/unique.txt': 'a size nobody else has',
+        'empty1.txt': '',
+        'empty2.txt': '',
+    })
+    for name, data in (('big1.bin', body), ('big2.bin', body), ('big_middle.bin', middle),
+                       ('big_start.bin', start)):
+        with open(os.path.join(root, name), 'wb') as f:
+            f.write(data)
+    return root
+
+
+def paths(root):
+    out = []
+    for current, _, files in os.walk(root):
+        out.extend(os.path.join(current, f) for f in files)
+    return sorted(out)
+
+
+def find(root, cache=None):
+    finder = DuplicateFinder(workers=2, cache=cache)
+    for path in paths(root):
+        finder.add(item(path))
+    return finder, [sorted(os.path.relpath(it['path'], root) for it in group) for group in finder.run()]
+
+
+def test_staged_grouping(dupes):
+    finder, groups = find(dupes)
+    # The most wasted space first; empty files are never duplicates
+    assert groups == [['big1.bin', 'big2.bin'], [os.path.join('small', 'a.txt'), os.path.join('small', 'b.txt')]]
+    stats = finder.as_dict()
+    # Unique sizes are never read; same-size small files go straight to the full hash
+    assert stats['files'] == 8
+    assert stats['partial_hashed'] == 4
+    # big_start differs in its first block, so only three large files are hashed in full
+    assert stats['full_hashed'] == 3 + 3
+    assert stats['errors'] == 0
+
+
+def test_group_items_carry_the_digest(dupes):
+    finder = DuplicateFinder(workers=1)
+    items = [item(p) for p in paths(dupes)]
+    for it in items:
+        finder.add(it)
+    for group in finder.run():
+        assert len({it['digest'] for it in group}) == 1
+
+
+def test_hash_cache_is_reused_until_a_file_changes(dupes, tmp_path):
+    cache = HashCache(str(tmp_path / 'hashes.sqlite'))
+    try:
+        first, groups = find(dupes, cache)
+        assert first.as_dict()['cache_hits'] == 0
+        second, again = find(dupes, cache)
+        assert again == groups
+        assert second.full_hashed == 0 and second.partial_hashed == 0
+        # A new mtime makes that file's digests stale; the others still come from the cache
+        changed = os.path.join(dupes, 'big2.bin')
+        st = os.stat(changed)
+        os.utime(changed, (st.st_atime, st.st_mtime + 10))
+        third, groups_after = find(dupes, cache)
+        assert groups_after == groups
+        assert third.partial_hashed == 1 and third.full_hashed == 1
+    finally:
+        cache.close()
+    reopened = HashCache(str(tmp_path / 'hashes.sqlite'))
+    try:
+        path = os.path.join(dupes, 'big2.bin')
+        st = os.stat(path)
+        assert reopened.get(path, 'full', st.st_size, st.st_mtime) is not None
+        assert reopened.get(path, 'full', st.st_size, st.st_mtime - 10) is None
+    finally:
+        reopened.close()
+
+
+def test_cancelled_run_returns_nothing(dupes):
+    finder = DuplicateFinder(workers=1, is_cancelled=lambda: True)
+    for path in paths(dupes):
+        finder.add(item(path))
+    assert finder.run() == []
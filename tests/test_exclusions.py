@@ -0,0 +1,82 @@
+﻿import os
+
+import pytest
+
+from file_searcher.engine import SearchEngine, SearchParams
+from file_searcher.exclusions import ExclusionRules, PathTrie, compile_name_globs
+
+
+def test_path_trie_covers_subtrees_only():
+    base = os.path.join(os.sep, 'data')
+    trie = PathTrie([os.path.join(base, 'skip'), os.path.join(base, 'a', 'b')])
+    assert trie.covers(os.path.join(base, 'skip'))
+    assert trie.covers(os.path.join(base, 'skip', 'x', 'y.txt'))
+    assert trie.covers(os.path.join(base, 'a', 'b', 'c'))
+    assert not trie.covers(os.path.join(base, 'skipped'))
+    assert not trie.covers(os.path.join(base, 'a'))
+    assert not trie.covers(base)
+    assert not PathTrie() and PathTrie([base])
+
+
+def test_name_globs():
+    rx = compile_name_globs(['node_modules', ' *.tmp.d ', '', '.git'])
+    assert rx.match('node_modules') and rx.match('NODE_MODULES')
+    assert rx.match('build.tmp.d') and rx.match('.git')
+    assert not rx.match('node_modules2') and not rx.match('my.git')
+    assert compile_name_globs(['', ' ']) is None
+
+
+def test_rules():
+    base = os.path.join(os.sep, 'data')
+    rules = ExclusionRules([os.path.join(base, 'private'), os.path.join(base, 'one.txt')], ['node_modules'])
+    assert rules.prunes_dir(os.path.join(base, 'x', 'node_modules'), 'node_modules')
+    assert rules.prunes_dir(os.path.join(base, 'private', 'sub'), 'sub')
+    assert not rules.prunes_dir(os.path.join(base, 'public'), 'public')
+    assert rules.skips_file(os.path.join(base, 'one.txt'), 'one.txt')
+    assert not rules.skips_file(os.path.join(base, 'two.txt'), 'two.txt')
+    assert not ExclusionRules()
+    # Same rules in another order: same signature, so the same index
+    assert rules.signature == ExclusionRules([os.path.join(base, 'one.txt'), os.path.join(base, 'private')],
+                                             ['node_modules', 'node_modules']).signature
+    assert rules.signature != ExclusionRules().signature
+
+
+@pytest.fixture
+def tree(make_tree):
+    return make_tree({
+        'src/app.py': 'a',
+        'src/node_modules/pkg/index.js': 'x',
+        'node_modules/other/lib.js': 'x',
+        'private/secret.txt': 's',
+        'private/deeper/more.txt': 'm',
+        'keep/skip.me': 'k',
+        'keep/ok.txt': 'o',
+    })
+
+
+@pytest.mark.parametrize('use_index', [False, True])
+@pytest.mark.parametrize('workers', [1, 4])
+def test_excluded_subtrees_are_never_listed(tree, monkeypatch, use_index, workers):
+    listed = []
+    scandir = os.scandir
+
+    def recording(path='.'):
+        listed.append(os.fspath(path))
+        return scandir(path)
+    monkeypatch.setattr(os, 'scandir', recording)
+    found = []
+    private = os.path.join(tree, 'private')
+    params = SearchParams('', 'contains', False, False, False, True, [tree], excluded_paths=[private],
+                          excluded_names=['node_modules', '*.me'], use_index=use_index, workers=workers)
+    SearchEngine(params, on_batch=lambda items: found.extend(it['path'] for it in items)).run()
+    assert not [p for p in listed if 'node_modules' in p or p.startswith(private)]
+    assert sorted(os.path.relpath(p, tree) for p in found) == sorted([
+        'src', os.path.join('src', 'app.py'), 'keep', os.path.join('keep', 'ok.txt')])
+
+
+def test_a_root_inside_an_exclusion_is_not_walked(tree):
+    private = os.path.join(tree, 'private')
+    found = []
+    params = SearchParams('', 'contains', False, False, False, True, [private], excluded_paths=[private])
+    SearchEngine(params, on_batch=found.extend).run()
+    assert found == []
@@ -0,0 +1,100 @@
+﻿import os
+import sqlite3
+
+import pytest
+
+from file_searcher import index as index_module
+from file_searcher.engine import SearchEngine, SearchParams
+from file_searcher.index import FileIndex
+
+FILES = {
+    'docs/report.pdf': 'x' * 100,
+    'docs/notes.txt': 'notes',
+    'docs/old/draft.docx': 'draft',
+    'photos/2024/a.jpg': 'a' * 50,
+    'photos/2024/b.jpg': 'b' * 60,
+    'photos/2025/': None,
+    'readme.md': 'hello',
+}
+
+
+def search(root: str, **kwargs) -> list[str]:
+    found = []
+    params = SearchParams('', 'contains', False, False, False, True, [root], **kwargs)
+    SearchEngine(params, on_batch=lambda items: found.extend(it['path'] for it in items)).run()
+    return sorted(found)
+
+
+def test_crawl_matches_walk(make_tree, walk_paths):
+    root = make_tree(FILES)
+    assert search(root, use_index=True) == walk_paths(root)
+    # Fresh index: answered from it without walking
+    assert search(root, use_index=True) == walk_paths(root)
+
+
+def test_refresh_after_add_remove_rename(make_tree, walk_paths):
+    root = make_tree(FILES)
+    search(root, use_index=True)
+    with open(os.path.join(root, 'docs', 'new.txt'), 'w') as f:
+        f.write('new')
+    os.remove(os.path.join(root, 'readme.md'))
+    os.rename(os.path.join(root, 'photos', '2024'), os.path.join(root, 'photos', 'y2024'))
+    os.rename(os.path.join(root, 'docs', 'old', 'draft.docx'), os.path.join(root, 'docs', 'old', 'final.docx'))
+    params = SearchParams('', 'contains', False, False, False, True, [root], use_index=True, index_max_age=0)
+    found = []
+    engine = SearchEngine(params, on_batch=lambda items: found.extend(it['path'] for it in items))
+    engine.run()
+    assert sorted(found) == walk_paths(root)
+    assert engine.refresh_stats['rescanned'] >= 3
+    assert engine.refresh_stats['added'] and engine.refresh_stats['removed']
+    # The refreshed index answers the next search on its own
+    assert search(root, use_index=True) == walk_paths(root)
+
+
+def indexed_paths(root: str) -> list[str]:
+    index = FileIndex()
+    try:
+        return sorted(os.path.join(parent, name) for parent, name, *_ in index.iter_entries(root))
+    finally:
+        index.close()
+
+
+def test_failed_refresh_keeps_previous_index(make_tree, monkeypatch):
+    root = make_tree(FILES)
+    search(root, use_index=True)
+    before = indexed_paths(root)
+    signature = SearchEngine(SearchParams('', 'contains', False, False, False, True, [root]))._rules.signature
+    index = FileIndex()
+    stamp = index.crawled_at(root, signature)
+    index.close()
+    os.remove(os.path.join(root, 'readme.md'))
+    with open(os.path.join(root, 'docs', 'new.txt'), 'w') as f:
+        f.write('new')
+
+    def broken_remove(self, *args):
+        raise sqlite3.OperationalError('disk I/O error')
+    monkeypatch.setattr(index_module.IndexRefresh, 'remove', broken_remove)
+    with pytest.raises(sqlite3.OperationalError):
+        search(root, use_index=True, index_max_age=0)
+    # Neither committed nor marked fresh
+    assert indexed_paths(root) == before
+    index = FileIndex()
+    try:
+        assert index.crawled_at(root, signature) == stamp
+    finally:
+        index.close()
+
+
+def test_overlapping_roots_keep_their_folders(make_tree):
+    root = make_tree(FILES)
+    inner = os.path.join(root, 'photos')
+    search(root, use_index=True)
+    search(inner, use_index=True)
+    index = FileIndex()
+    try:
+        index.forget(inner)
+        conn = index._conn
+        rows = conn.execute('SELECT path FROM dirs WHERE root = ?', (index_module.root_key(root),)).fetchall()
+    finally:
+        index.close()
+    assert os.path.normcase(os.path.join(inner, '2024')) in {os.path.normcase(r[0]) for r in rows}
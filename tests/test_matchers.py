@@ -0,0 +1,95 @@
+﻿import re
+
+import pytest
+
+from file_searcher.matchers import compile_name_matcher, split_patterns
+
+
+def matches(pattern, names, **kwargs):
+    match = compile_name_matcher(pattern, **kwargs)
+    return [n for n in names if match(n)]
+
+
+def test_split_patterns():
+    assert split_patterns(' a ; ;b;') == ['a', 'b']
+    assert compile_name_matcher(' ; ') is None
+
+
+@pytest.mark.parametrize('mode', ['contains', 'startswith', 'endswith', 'equals'])
+def test_brackets_are_literal_without_wildcard(mode):
+    names = ['[final]', 'Report [final].docx', 'f', 'final', 'i']
+    expected = {
+        'contains': ['[final]', 'Report [final].docx'],
+        'startswith': ['[final]'],
+        'endswith': ['[final]'],
+        'equals': ['[final]'],
+    }[mode]
+    assert matches('[final]', names, mode=mode) == expected
+    assert matches('[FINAL]', names, mode=mode) == expected
+    assert matches('[FINAL]', names, mode=mode, match_case=True) == []
+
+
+def test_star_and_question_mark_are_literal_without_wildcard():
+    names = ['a*b.txt', 'axb.txt', 'what?.md', 'whatx.md']
+    assert matches('a*b', names) == ['a*b.txt']
+    assert matches('what?', names) == ['what?.md']
+    assert matches('a*b;what?', names) == ['a*b.txt', 'what?.md']
+
+
+def test_wildcard_on():
+    names = ['a*b.txt', 'axb.txt', 'what?.md', 'whatx.md', 'b1.txt', 'bx.txt']
+    assert matches('a*b.txt', names, use_wildcard=True) == ['a*b.txt', 'axb.txt']
+    assert matches('what?.md', names, use_wildcard=True) == ['what?.md', 'whatx.md']
+    assert matches('b[0-9].txt', names, use_wildcard=True) == ['b1.txt']
+    # Anchored at the start of the name, like the file dialogs
+    assert matches('*.md', names, use_wildcard=True) == ['what?.md', 'whatx.md']
+    assert matches('x*', names, use_wildcard=True) == []
+    assert matches('*.MD', names, use_wildcard=True, match_case=True) == []
+
+
+def test_regex_on():
+    names = ['IMG_0001.jpg', 'img_2.png', 'notes.txt', '[final].txt']
+    assert matches(r'^img_\d+\.', names, use_regex=True) == ['IMG_0001.jpg', 'img_2.png']
+    assert matches(r'^img_\d+\.', names, use_regex=True, match_case=True) == ['img_2.png']
+    assert matches(r'\.txt$;\.png$', names, use_regex=True) == ['img_2.png', 'notes.txt', '[final].txt']
+    # Character classes are regex syntax here, not literal brackets
+    assert matches('[final]', names, use_regex=True) == names
+    # Terms whose groups cannot be merged into one alternation still work
+    assert matches(r'(a)\1;(t)\1', ['aa.bin', 'tt.bin', 'at.bin'], use_regex=True) == ['aa.bin', 'tt.bin']
+
+
+def test_mixed_list():
+    names = ['informe anual.docx', 'ventas.xlsx', 'ventas.xlsx.bak', 'INV-0042.pdf', 'inv-x.pdf', 'otro.txt']
+    # Regex terms, and the ones that do not compile read as wildcards
+    assert matches(r'informe;*.xlsx;^INV-\d+', names, use_regex=True) == \
+        ['informe anual.docx', 'ventas.xlsx', 'INV-0042.pdf']
+    assert matches(r'informe;*.xlsx;^INV-\d+', names, use_regex=True, match_case=True) == \
+        ['informe anual.docx', 'ventas.xlsx', 'INV-0042.pdf']
+    # With Wildcard, terms without wildcard characters stay literal
+    assert matches('informe;*.xlsx;[final]', names + ['f'], use_wildcard=True) == \
+        ['informe anual.docx', 'ventas.xlsx', 'f']
+    assert matches('anual;*.pdf', names, use_wildcard=True, mode='startswith') == \
+        ['INV-0042.pdf', 'inv-x.pdf']
+
+
+def test_invalid_regex_raises():
+    with pytest.raises(re.error):
+        compile_name_matcher('img_(', use_regex=True)
+    with pytest.raises(re.error):
+        compile_name_matcher('ok;(', use_regex=True)
+    # Without Regex the same text is just characters
+    assert matches('img_(', ['img_(1).jpg', 'img_1.jpg']) == ['img_(1).jpg']
+
+
+@pytest.mark.parametrize('pattern, kwargs', [
+    ('b', {}),
+    ('b;q', {}),
+    ('a*', {'use_wildcard': True}),
+    ('a*;q*', {'use_wildcard': True}),
+    ('^a', {'use_regex': True}),
+    ('^a;^q', {'use_regex': True}),
+])
+def test_matchers_return_bool(pattern, kwargs):
+    match = compile_name_matcher(pattern, **kwargs)
+    assert match('abc') is True
+    assert match('xyz') is False
@@ -0,0 +1,93 @@
+﻿import os
+
+import pytest
+
+from file_searcher.engine import SearchEngine, SearchParams
+from file_searcher.ranking import TopK
+
+
+def entry(name, size=0, mtime=0.0):
+    return {'name': name, 'path': '/r/' + name, 'is_dir': False, 'size': size, 'mtime': mtime}
+
+
+def test_topk_keeps_the_largest_in_order():
+    top = TopK(3)
+    sizes = [5, 1, 9, 7, 3, 9, 2, 8]
+    for i, size in enumerate(sizes):
+        top.add(entry(f'f{i}', size))
+    assert [it['size'] for it in top.ranked()] == [9, 9, 8]
+    assert len(top) == 3
+    assert top.offered == len(sizes)
+    assert top.floor() == 8
+
+
+def test_topk_by_mtime():
+    top = TopK(2, 'mtime')
+    for i, mtime in enumerate([10.0, 30.0, 20.0]):
+        top.add(entry(f'f{i}', mtime=mtime))
+    assert [it['name'] for it in top.ranked()] == ['f1', 'f2']
+
+
+def test_topk_ties_keep_the_first_found():
+    top = TopK(2)
+    for name in ('a', 'b', 'c', 'd'):
+        top.add(entry(name, 4))
+    assert [it['name'] for it in top.ranked()] == ['a', 'b']
+    assert not top.add(entry('e', 4))
+    assert top.add(entry('f', 5))
+    assert [it['name'] for it in top.ranked()] == ['f', 'a']
+
+
+def test_topk_would_keep():
+    top = TopK(2)
+    assert top.would_keep(0)
+    assert top.floor() is None
+    top.add(entry('a', 10))
+    assert top.would_keep(1)
+    top.add(entry('b', 20))
+    assert not top.would_keep(10)
+    assert not top.would_keep(5)
+    assert top.would_keep(11)
+
+
+def test_topk_rejects_unknown_keys():
+    with pytest.raises(ValueError):
+        TopK(3, 'name')
+    assert TopK(0).k == 1
+
+
+@pytest.fixture
+def sized_tree(make_tree):
+    files = {f'd{i % 3}/f{i:02d}.bin': 'x' * (i * 10) for i in range(30)}
+    return make_tree(files)
+
+
+def run(root, **kwargs):
+    found = []
+    params = SearchParams('', 'contains', False, False, False, False, [root], **kwargs)
+    engine = SearchEngine(params, on_batch=found.extend)
+    engine.run()
+    return engine, found
+
+
+@pytest.mark.parametrize('use_index', [False, True])
+def test_max_results_stops_the_search(sized_tree, use_index):
+    if use_index:
+        run(sized_tree, use_index=True)
+    engine, found = run(sized_tree, max_results=7, use_index=use_index)
+    assert len(found) == 7
+    assert engine.limit_reached
+    engine, found = run(sized_tree, max_results=100, use_index=use_index)
+    assert len(found) == 30
+    assert not engine.limit_reached
+
+
+@pytest.mark.parametrize('top_by', ['size', 'mtime'])
+def test_engine_top_k(sized_tree, top_by):
+    for i, name in enumerate(sorted(os.listdir(os.path.join(sized_tree, 'd0')))):
+        os.utime(os.path.join(sized_tree, 'd0', name), (1000 + i, 1000 + i))
+    engine, found = run(sized_tree, top_k=4, top_by=top_by)
+    _, everything = run(sized_tree)
+    best = sorted(everything, key=lambda it: it[top_by], reverse=True)[:4]
+    assert [it[top_by] for it in found] == [it[top_by] for it in best]
+    assert not engine.limit_reached
@@ -0,0 +1,88 @@
+﻿import pytest
+
+from file_searcher.engine import SearchEngine, SearchParams
+from file_searcher.refine import is_refinement_of, record_filter
+
+ROOTS = ['/data']
+
+
+def params(pattern='', mode='contains', match_case=False, use_regex=False, use_wildcard=False, roots=ROOTS,
+           **kwargs):
+    return SearchParams(pattern, mode, match_case, use_regex, use_wildcard, True, roots, **kwargs)
+
+
+@pytest.mark.parametrize('old, new', [
+    (params(), params('rep')),
+    (params('rep'), params('report')),
+    (params('rep'), params('prep')),
+    (params('rep', 'startswith'), params('repo', 'startswith')),
+    (params('.pdf', 'endswith'), params('x.pdf', 'endswith')),
+    (params('REP'), params('report')),
+    (params('Rep', match_case=True), params('Report', match_case=True)),
+    (params('*.pdf', use_wildcard=True), params('*.pdf', use_wildcard=True)),
+    (params(), params(extensions=['.pdf'])),
+    (params(extensions=['.pdf', '.doc']), params(extensions=['.pdf'])),
+    (params(min_size=10), params(min_size=20, max_size=30)),
+    (params(max_size=100), params(min_size=5, max_size=90)),
+    (params(date_from=100), params(date_from=150, date_to=200)),
+])
+def test_refinements(old, new):
+    assert is_refinement_of(new, old)
+
+
+@pytest.mark.parametrize('old, new', [
+    (None, params('rep')),
+    (params('report'), params('rep')),
+    (params('rep'), params('xyz')),
+    (params('rep', 'startswith'), params('prep', 'startswith')),
+    (params('rep'), params('report', 'startswith')),
+    (params('rep'), params('report', match_case=True)),
+    (params('Rep', match_case=True), params('rep', match_case=True)),
+    (params('rep;doc'), params('report;doc')),
+    (params('rep*', use_wildcard=True), params('repo*', use_wildcard=True)),
+    (params('rep', use_regex=True), params('report', use_regex=True)),
+    (params('rep'), params('report', roots=['/other'])),
+    (params(extensions=['.pdf']), params()),
+    (params(extensions=['.pdf']), params(extensions=['.pdf', '.doc'])),
+    (params(min_size=10), params()),
+    (params(min_size=10), params(min_size=5)),
+    (params(date_to=100), params(date_to=150)),
+    (params(), params(exclude_hidden=True)),
+    (params(), params(content='needle')),
+    (params(), params(find_duplicates=True)),
+    (params(), params('rep', max_results=10)),
+    (params(), params('rep', top_k=10)),
+    (params(), params(rollup=True)),
+    (params(rollup=True), params('rep')),
+])
+def test_not_refinements(old, new):
+    assert not is_refinement_of(new, old)
+
+
+def collect(root, **kwargs):
+    found = []
+    SearchEngine(params(roots=[root], **kwargs), on_batch=found.extend).run()
+    return found
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'pattern': 'report'},
+    {'pattern': 'REPORT_2'},
+    {'extensions': ['.pdf']},
+    {'pattern': 'rep', 'min_size': 100, 'max_size': 1000},
+])
+def test_narrowing_in_memory_matches_a_new_walk(make_tree, kwargs):
+    root = make_tree({
+        'report_1.pdf': 'x' * 50,
+        'report_2.pdf': 'x' * 500,
+        'Report_2.doc': 'x' * 5000,
+        'notes/rep.txt': 'x' * 200,
+        'notes/report_old/': None,
+        'other.pdf': 'x' * 300,
+    })
+    before = collect(root, pattern='rep' if 'pattern' in kwargs else '')
+    new = params(roots=[root], **kwargs)
+    assert is_refinement_of(new, params('rep' if 'pattern' in kwargs else '', roots=[root]))
+    keep = record_filter(new)
+    narrowed = [it for it in before if keep(it['path'], it['name'], it['is_dir'], it['size'], it['mtime'])]
+    assert sorted(it['path'] for it in narrowed) == sorted(it['path'] for it in collect(root, **kwargs))
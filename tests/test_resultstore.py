@@ -0,0 +1,71 @@
+﻿import os
+
+from file_searcher.resultstore import ResultStore
+
+
+def item(path, name=None, is_dir=False, size=0, mtime=0.0, **extra):
+    out = {'name': os.path.basename(path) if name is None else name, 'path': path, 'is_dir': is_dir,
+           'size': size, 'mtime': mtime}
+    out.update(extra)
+    return out
+
+
+ITEMS = [
+    item('/data/docs/a.txt', size=10, mtime=1.5),
+    item('/data/docs/b.txt', size=20, mtime=2.5),
+    item('/data/docs/old', is_dir=True, mtime=3.0),
+    item('/data/docs/old/c.txt', size=30, mtime=4.0, hits=[(1, 'needle')]),
+    item('/data/photos/d.jpg', size=None, mtime=None),
+    item('/data/e.bin', size=5, group=1, digest='abc'),
+    item('/', name='/', is_dir=True),
+    item('/top.txt', size=1),
+    # Path not ending in its name
+    item('/data/links/shortcut', name='target.txt', size=7),
+    # Doubled and trailing separators are kept verbatim
+    item('/data//twice.txt', name='twice.txt'),
+    item('/data/docs/a.txt', size=10, mtime=1.5),
+]
+
+
+def expected(it):
+    out = dict(it)
+    out['size'] = int(it['size'] or 0)
+    out['mtime'] = float(it['mtime'] or 0)
+    return out
+
+
+def test_round_trip():
+    store = ResultStore.from_items(ITEMS)
+    assert len(store) == len(ITEMS)
+    assert list(store) == [expected(it) for it in ITEMS]
+    assert [store.path(i) for i in range(len(store))] == [it['path'] for it in ITEMS]
+    assert [store.is_dir(i) for i in range(len(store))] == [it['is_dir'] for it in ITEMS]
+    assert ResultStore.from_items(store) is store
+
+
+def test_folders_are_shared():
+    store = ResultStore.from_items(ITEMS)
+    assert store.dir_id('/data/docs') == store.dir_id('/data/docs')
+    assert store.dir_path(store.dir_id('/data/docs/old')) == '/data/docs/old'
+    assert store.dir_ids[0] == store.dir_ids[1] == store.dir_ids[-1]
+    assert '/data/docs' in store.used_dir_paths()
+    assert store.nbytes() > 0
+
+
+def test_retain():
+    store = ResultStore.from_items(ITEMS)
+    kept = [1, 3, 5, 6, 8]
+    out = store.retain(kept)
+    assert len(out) == len(kept)
+    assert list(out) == [expected(ITEMS[i]) for i in kept]
+    # The original is left alone
+    assert list(store) == [expected(it) for it in ITEMS]
+    assert len(store.retain([])) == 0
+
+
+def test_append_after_retain():
+    store = ResultStore.from_items(ITEMS)
+    out = store.retain([0, 8])
+    out.append(item('/data/new/f.txt', size=3))
+    assert [it['path'] for it in out] == ['/data/docs/a.txt', '/data/links/shortcut', '/data/new/f.txt']
+    assert list(store) == [expected(it) for it in ITEMS]
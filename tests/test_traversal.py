@@ -0,0 +1,103 @@
+﻿import os
+import threading
+
+import pytest
+
+from file_searcher.scheduling import ORDERS, make_order
+from file_searcher.traversal import ParallelWalker
+
+FILES = {f'p{i}/q{j}/f{k}.txt': 'x' for i in range(4) for j in range(3) for k in range(5)}
+FILES.update({'p0/q0/deep/er/still/f.txt': 'x', 'empty/': None, 'top.txt': 'x'})
+
+
+# visit() over os.scandir that records what it listed and which ctx it was given
+class Lister:
+    def __init__(self, fail=None):
+        self.fail = fail or {}
+        self.seen = []
+        self.ctx = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, path, ctx):
+        error = self.fail.get(os.path.basename(path))
+        if error is not None:
+            raise error
+        subdirs, entries = [], 0
+        found = []
+        with os.scandir(path) as it:
+            for entry in it:
+                entries += 1
+                found.append(entry.path)
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+        with self.lock:
+            self.seen.extend(found)
+            self.ctx[path] = ctx
+        return subdirs, entries
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+@pytest.mark.parametrize('order', ORDERS)
+def test_walk_matches_os_walk(make_tree, walk_paths, workers, order):
+    root = make_tree(FILES)
+    lister = Lister()
+    stats = ParallelWalker(lister, workers, order=make_order(order)).run([(root, 'ctx')])
+    assert sorted(lister.seen) == walk_paths(root)
+    assert stats.entries == len(walk_paths(root))
+    assert stats.dirs == len(walk_paths(root)) - len(walk_paths(root, include_dirs=False)) + 1
+    assert set(lister.ctx.values()) == {'ctx'}
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_several_roots_keep_their_context(make_tree, workers):
+    root = make_tree(FILES)
+    lister = Lister()
+    roots = [(os.path.join(root, f'p{i}'), i) for i in range(4)]
+    ParallelWalker(lister, workers).run(roots)
+    for path, ctx in lister.ctx.items():
+        assert os.path.relpath(path, root).split(os.sep)[0] == f'p{ctx}'
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_cancel_stops_the_workers(make_tree, workers):
+    root = make_tree(FILES)
+    listed = []
+    cancel = threading.Event()
+
+    def visit(path, ctx):
+        listed.append(path)
+        if len(listed) >= 3:
+            cancel.set()
+        return Lister()(path, ctx)
+
+    walker = ParallelWalker(visit, workers, is_cancelled=cancel.is_set)
+    done = threading.Thread(target=walker.run, args=([(root, None)],), daemon=True)
+    done.start()
+    done.join(5)
+    assert not done.is_alive()
+    assert len(listed) < 3 + workers
+    assert not any(t.name.startswith('walker-') for t in threading.enumerate())
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_unreadable_folders_are_skipped(make_tree, walk_paths, workers):
+    root = make_tree(FILES)
+    lister = Lister(fail={'p1': PermissionError(13, 'denied'), 'q2': FileNotFoundError(2, 'gone')})
+    ParallelWalker(lister, workers).run([(root, None)])
+    kept = [p for p in walk_paths(root)
+            if not os.path.relpath(p, root).startswith('p1' + os.sep)
+            and os.sep + 'q2' + os.sep not in p]
+    assert sorted(lister.seen) == kept
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_other_errors_stop_the_walk(make_tree, workers):
+    root = make_tree(FILES)
+    lister = Lister(fail={'q1': ValueError('broken visit')})
+    with pytest.raises(ValueError, match='broken visit'):
+        ParallelWalker(lister, workers).run([(root, None)])
+    assert not any(t.name.startswith('walker-') for t in threading.enumerate())
+
+
+def test_no_roots():
+    assert ParallelWalker(Lister(), 4).run([]).dirs == 0
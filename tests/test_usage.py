@@ -0,0 +1,97 @@
+﻿import os
+
+import pytest
+
+from file_searcher.engine import SearchEngine, SearchParams
+from file_searcher.usage import UsageTree
+
+
+def by_path(records):
+    return {r['path']: r for r in records}
+
+
+def test_rollup_sums_up_to_the_root():
+    root = os.path.join(os.sep, 'data')
+    tree = UsageTree([root])
+    tree.add(os.path.join(root, 'a.txt'), 1, 10.0)
+    tree.add(os.path.join(root, 'x', 'b.txt'), 10, 30.0)
+    tree.add(os.path.join(root, 'x', 'y', 'z', 'c.txt'), 100, 20.0)
+    tree.add(os.path.join(root, 'x', 'y', 'z', 'd.txt'), 1000, 5.0)
+    records = tree.rollup()
+    rows = by_path(records)
+    # Folders with no files of their own still appear between a root and its files
+    assert set(rows) == {root, os.path.join(root, 'x'), os.path.join(root, 'x', 'y'),
+                         os.path.join(root, 'x', 'y', 'z')}
+    assert [r['size'] for r in records] == [1111, 1110, 1100, 1100]
+    assert rows[root]['files'] == 4 and rows[root]['own_files'] == 1 and rows[root]['own_size'] == 1
+    assert rows[root]['mtime'] == 30.0
+    assert rows[os.path.join(root, 'x', 'y')]['own_size'] == 0
+    assert rows[os.path.join(root, 'x', 'y', 'z')]['mtime'] == 20.0
+    assert (tree.files, tree.bytes, len(tree)) == (4, 1111, 3)
+
+
+def test_rollup_stops_at_each_root():
+    outer = os.path.join(os.sep, 'data')
+    inner = os.path.join(outer, 'sub', 'inner')
+    tree = UsageTree([outer, inner])
+    tree.add(os.path.join(inner, 'f'), 5, 1.0)
+    tree.add(os.path.join(outer, 'g'), 7, 1.0)
+    rows = by_path(tree.rollup())
+    assert rows[inner]['size'] == 5
+    assert rows[outer]['size'] == 7
+    assert os.path.join(outer, 'sub') not in rows
+
+
+def test_empty_rollup():
+    assert UsageTree(['/data']).rollup() == []
+
+
+def reference(root, keep=lambda name: True):
+    # Bytes and file count of every folder, from a plain walk, for folders with a kept file below
+    totals = {}
+    for current, dirs, files in os.walk(root):
+        for name in files:
+            if not keep(name):
+                continue
+            size = os.path.getsize(os.path.join(current, name))
+            folder = current
+            while True:
+                acc = totals.setdefault(folder, [0, 0])
+                acc[0] += size
+                acc[1] += 1
+                if folder == root:
+                    break
+                folder = os.path.dirname(folder)
+    return {folder: tuple(acc) for folder, acc in totals.items()}
+
+
+@pytest.fixture
+def usage_tree(make_tree):
+    return make_tree({
+        'a.txt': 'x' * 10,
+        'docs/b.txt': 'x' * 200,
+        'docs/c.log': 'x' * 3000,
+        'docs/deep/er/d.txt': 'x' * 40,
+        'media/e.jpg': 'x' * 5000,
+        'media/raw/': None,
+        'empty/': None,
+    })
+
+
+@pytest.mark.parametrize('use_index', [False, True])
+def test_engine_rollup_matches_walk(usage_tree, use_index):
+    records = []
+    params = SearchParams('', 'contains', False, False, False, True, [usage_tree], rollup=True,
+                          use_index=use_index)
+    SearchEngine(params, on_batch=records.extend).run()
+    assert {r['path']: (r['size'], r['files']) for r in records} == reference(usage_tree)
+    assert all(r['is_dir'] for r in records)
+
+
+def test_engine_rollup_applies_filters(usage_tree):
+    records = []
+    params = SearchParams('', 'contains', False, False, False, True, [usage_tree], rollup=True,
+                          extensions=['.txt'], max_results=1)
+    SearchEngine(params, on_batch=records.extend).run()
+    assert {r['path']: (r['size'], r['files']) for r in records} == \
+        reference(usage_tree, lambda name: name.endswith('.txt'))
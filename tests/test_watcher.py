@@ -0,0 +1,192 @@
+﻿import os
+import threading
+import time
+
+import pytest
+
+from file_searcher.engine import SearchEngine, SearchParams
+from file_searcher.exclusions import ExclusionRules
+from file_searcher.index import FileIndex
+from file_searcher.watcher import ChangeSet, IndexSync, Watcher
+
+
+# Backend fed by the test: read() hands over whatever was queued since the last call
+class ScriptedBackend:
+    def __init__(self):
+        self.queued = []
+        self.lock = threading.Lock()
+        self.roots = []
+        self.closed = False
+
+    def push(self, *events):
+        with self.lock:
+            self.queued.extend(events)
+
+    def add_root(self, root):
+        self.roots.append(root)
+
+    def read(self, timeout):
+        with self.lock:
+            events, self.queued = self.queued, []
+        if not events:
+            time.sleep(min(timeout, 0.01))
+        return events
+
+    def close(self):
+        self.closed = True
+
+
+def start(root, backend, **kwargs):
+    batches = []
+    watcher = Watcher([root], batches.append, backend=backend, **kwargs)
+    watcher.start()
+    return watcher, batches
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_events_are_coalesced_into_one_debounced_batch(make_tree):
+    root = make_tree({'keep.txt': 'k', 'gone.txt': 'g'})
+    backend = ScriptedBackend()
+    watcher, batches = start(root, backend, debounce=0.15, max_delay=5.0)
+    try:
+        new = os.path.join(root, 'new.txt')
+        with open(new, 'w') as f:
+            f.write('new')
+        temp = os.path.join(root, 'temp.txt')
+        gone = os.path.join(root, 'gone.txt')
+        os.remove(gone)
+        backend.push(('created', new, False), ('modified', new, False), ('created', temp, False))
+        time.sleep(0.05)
+        backend.push(('modified', new, False), ('deleted', temp, False), ('deleted', gone, False))
+        assert wait_for(lambda: batches)
+        time.sleep(0.3)
+    finally:
+        watcher.stop()
+    assert backend.closed
+    assert len(batches) == 1 and watcher.batches == 1 and watcher.events == 6
+    changes = batches[0]
+    assert set(changes.upserts) == {new}
+    assert changes.upserts[new][:2] == (False, 3)
+    # temp.txt came and went within the batch; it is resolved against the disk
+    assert changes.deleted == {temp, gone}
+
+
+def test_a_steady_stream_is_applied_every_max_delay(make_tree):
+    root = make_tree({'f.txt': 'f'})
+    backend = ScriptedBackend()
+    watcher, batches = start(root, backend, debounce=0.2, max_delay=0.3)
+    try:
+        end = time.monotonic() + 1.0
+        while time.monotonic() < end:
+            backend.push(('modified', os.path.join(root, 'f.txt'), False))
+            time.sleep(0.05)
+        streamed = len(batches)
+    finally:
+        watcher.stop()
+    assert streamed >= 2
+
+
+def test_nothing_is_sent_for_excluded_entries(make_tree):
+    root = make_tree({'node_modules/x.js': 'x', 'src/a.py': 'a'})
+    rules = ExclusionRules(name_globs=['node_modules'])
+    backend = ScriptedBackend()
+    batches = []
+    watcher = Watcher([root], batches.append, rules=rules, backend=backend, debounce=0.05)
+    watcher.start()
+    try:
+        backend.push(('modified', os.path.join(root, 'node_modules', 'x.js'), False),
+                     ('created', os.path.join(root, 'node_modules'), True))
+        time.sleep(0.3)
+        backend.push(('modified', os.path.join(root, 'src', 'a.py'), False))
+        assert wait_for(lambda: batches)
+    finally:
+        watcher.stop()
+    assert [set(b.upserts) for b in batches] == [{os.path.join(root, 'src', 'a.py')}]
+
+
+def test_resolve_lists_new_folders_and_rescans(make_tree):
+    root = make_tree({'a/old.txt': 'o', 'a/stays.txt': 's'})
+    watcher = Watcher([root], lambda changes: None)
+    os.makedirs(os.path.join(root, 'b', 'c'))
+    with open(os.path.join(root, 'b', 'c', 'deep.txt'), 'w') as f:
+        f.write('deep')
+    os.remove(os.path.join(root, 'a', 'old.txt'))
+    changes = watcher.resolve({os.path.join(root, 'b'): 'created'}, {os.path.join(root, 'a')})
+    assert set(changes.upserts) == {os.path.join(root, 'b'), os.path.join(root, 'b', 'c'),
+                                    os.path.join(root, 'b', 'c', 'deep.txt'), os.path.join(root, 'a', 'stays.txt')}
+    assert changes.listed[os.path.join(root, 'a')][1] == {'stays.txt'}
+    assert changes.touches(os.path.join(root, 'a', 'old.txt'))
+    assert not changes.touches(os.path.join(root, 'x', 'untouched.txt'))
+    assert [it['path'] for it in changes.items() if it['name'] == 'deep.txt'] == \
+        [os.path.join(root, 'b', 'c', 'deep.txt')]
+
+
+def test_changeset_under_and_deleted_folders():
+    changes = ChangeSet()
+    changes.deleted = {os.path.join(os.sep, 'r', 'gone')}
+    changes.upserts = {os.path.join(os.sep, 'other', 'x'): (False, 1, 1.0, 0)}
+    assert changes.touches(os.path.join(os.sep, 'r', 'gone', 'deep', 'file'))
+    assert not changes.touches(os.path.join(os.sep, 'r', 'gone2'))
+    subset = changes.under(os.path.join(os.sep, 'r'))
+    assert subset.deleted == changes.deleted and not subset.upserts
+    assert not changes.under(os.path.join(os.sep, 'nowhere'))
+    assert len(changes) == 2
+
+
+def indexed_paths(root):
+    index = FileIndex()
+    try:
+        return sorted(os.path.join(parent, name) for parent, name, *_ in index.iter_entries(root))
+    finally:
+        index.close()
+
+
+def test_index_sync_applies_changes(make_tree, walk_paths):
+    root = make_tree({'a/one.txt': '1', 'a/two.txt': '2', 'b/three.txt': '3', 'b/sub/four.txt': '4'})
+    SearchEngine(SearchParams('', 'contains', False, False, False, True, [root], use_index=True)).run()
+    assert indexed_paths(root) == walk_paths(root)
+    sync = IndexSync([root])
+    stamp = sync.since()
+    assert stamp is not None and stamp <= time.time()
+    with open(os.path.join(root, 'a', 'one.txt'), 'w') as f:
+        f.write('longer')
+    os.remove(os.path.join(root, 'a', 'two.txt'))
+    os.rename(os.path.join(root, 'b', 'sub'), os.path.join(root, 'b', 'moved'))
+    os.makedirs(os.path.join(root, 'c'))
+    with open(os.path.join(root, 'c', 'five.txt'), 'w') as f:
+        f.write('5')
+    watcher = Watcher([root], lambda changes: None)
+    changes = watcher.resolve({
+        os.path.join(root, 'a', 'one.txt'): 'modified',
+        os.path.join(root, 'a', 'two.txt'): 'deleted',
+        os.path.join(root, 'b', 'sub'): 'deleted',
+        os.path.join(root, 'b', 'moved'): 'created',
+        os.path.join(root, 'c'): 'created',
+    }, set())
+    applied = sync.apply(changes)
+    assert indexed_paths(root) == walk_paths(root)
+    # one.txt updated; two.txt, sub and sub/four.txt removed; moved, moved/four.txt, c and five.txt added
+    assert applied == 8
+    index = FileIndex()
+    try:
+        rows = {os.path.join(p, n): size for p, n, _, size, _, _ in index.iter_entries(root)}
+    finally:
+        index.close()
+    assert rows[os.path.join(root, 'a', 'one.txt')] == 6
+    # Nothing more to do the second time
+    assert sync.apply(changes) == 0
+
+
+def test_index_sync_leaves_unindexed_roots_alone(make_tree):
+    root = make_tree({'a.txt': 'a'})
+    sync = IndexSync([root])
+    assert sync.since() is None
+    changes = Watcher([root], lambda c: None).resolve({os.path.join(root, 'a.txt'): 'modified'}, set())
+    assert sync.apply(changes) == 0
+    assert indexed_paths(root) == []